@@ -0,0 +1,250 @@
+"""
+ap_index.py
+
+Uniform-grid spatial index of access points for the coverage analyzers.
+
+`assign_channels` used to score every AP against every earlier AP with
+math.hypot over a list of dicts, i.e. O(n^2) work. `APGrid` buckets AP centres
+into square cells; with a cell size of at least twice the largest coverage
+radius (2 * MAX_RADIUS), two coverage disks can only overlap when their
+centres are in the same or adjacent cells, so a query only looks at the 3x3
+block of cells around a point.
+
+The grid owns the AP positions and radii in growable NumPy arrays; an AP's id
+is its slot in those arrays and stays valid until it is removed.
+
+Dependencies:
+- numpy
+"""
+
+import math
+import numpy as np
+
+
+class APGrid:
+    """Access points bucketed by position into square cells of `cell_size`."""
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.radius = np.zeros(0)
+        self.alive = np.zeros(0, dtype=bool)
+        self.cells = {}            # (cx, cy) -> list of AP ids
+        self.max_radius = 0.0      # largest radius ever inserted
+        self._free = []
+
+    @classmethod
+    def from_arrays(cls, x, y, radius, cell_size=None):
+        """Index the APs (x[i], y[i], radius[i]) at once; their ids are 0..n-1."""
+        radius = np.asarray(radius, dtype=np.float64)
+        if cell_size is None:
+            # no radii (or only zero radii) would give zero-sized cells
+            cell_size = 2.0 * radius.max() if len(radius) and radius.max() > 0 else 1.0
+        grid = cls(cell_size)
+        grid.x = np.array(x, dtype=np.float64)
+        grid.y = np.array(y, dtype=np.float64)
+        grid.radius = radius.copy()
+        grid.alive = np.ones(len(radius), dtype=bool)
+        grid.max_radius = float(radius.max()) if len(radius) else 0.0
+        cx, cy = grid._cell(grid.x, grid.y)
+        for i, key in enumerate(zip(cx.tolist(), cy.tolist())):
+            grid.cells.setdefault(key, []).append(i)
+        return grid
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def _cell(self, x, y):
+        return np.floor_divide(x, self.cell_size).astype(np.int64), np.floor_divide(y, self.cell_size).astype(np.int64)
+
+    def _key(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    # ---------------- edits ------------------
+    def insert(self, x, y, radius):
+        """Add an AP and return its id."""
+        if not self._free:
+            old = len(self.alive)
+            extra = max(old, 16)
+            self.x = np.concatenate([self.x, np.zeros(extra)])
+            self.y = np.concatenate([self.y, np.zeros(extra)])
+            self.radius = np.concatenate([self.radius, np.zeros(extra)])
+            self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+            self._free.extend(range(old + extra - 1, old - 1, -1))
+        i = self._free.pop()
+        self.x[i], self.y[i], self.radius[i] = x, y, radius
+        self.alive[i] = True
+        self.max_radius = max(self.max_radius, float(radius))
+        self.cells.setdefault(self._key(x, y), []).append(i)
+        return i
+
+    def remove(self, i):
+        """Drop AP `i`; its id may be reused by a later insert."""
+        key = self._key(self.x[i], self.y[i])
+        bucket = self.cells[key]
+        bucket.remove(i)
+        if not bucket:
+            del self.cells[key]
+        self.alive[i] = False
+        self._free.append(i)
+
+    def move(self, i, x, y, radius=None):
+        """Move (and optionally resize) AP `i`, keeping its id."""
+        old, new = self._key(self.x[i], self.y[i]), self._key(x, y)
+        if old != new:
+            bucket = self.cells[old]
+            bucket.remove(i)
+            if not bucket:
+                del self.cells[old]
+            self.cells.setdefault(new, []).append(i)
+        self.x[i], self.y[i] = x, y
+        if radius is not None:
+            self.radius[i] = radius
+            self.max_radius = max(self.max_radius, float(radius))
+
+    # ---------------- queries ------------------
+    def candidates(self, x, y, reach):
+        """Ids of the APs in every cell within `reach` of (x, y) (a superset)."""
+        k = int(math.ceil(reach / self.cell_size))
+        cx, cy = self._key(x, y)
+        ids = []
+        for gx in range(cx - k, cx + k + 1):
+            for gy in range(cy - k, cy + k + 1):
+                bucket = self.cells.get((gx, gy))
+                if bucket:
+                    ids.extend(bucket)
+        return np.array(ids, dtype=np.int64)
+
+    def overlapping(self, x, y, radius, exclude=None):
+        """
+        APs whose coverage disk overlaps the disk (x, y, radius), as
+        (ids, overlap) where overlap = radius + r_j - distance > 0.
+        """
+        ids = self.candidates(x, y, radius + self.max_radius)
+        if exclude is not None:
+            ids = ids[ids != exclude]
+        d = np.hypot(self.x[ids] - x, self.y[ids] - y)
+        overlap = radius + self.radius[ids] - d
+        hit = overlap > 0
+        return ids[hit], overlap[hit]
+
+    def within(self, x0, y0, x1, y1):
+        """Ids of the APs whose centre lies in the rectangle [x0, x1] x [y0, y1]."""
+        (gx0, gy0), (gx1, gy1) = self._key(x0, y0), self._key(x1, y1)
+        ids = []
+        for gx in range(gx0, gx1 + 1):
+            for gy in range(gy0, gy1 + 1):
+                bucket = self.cells.get((gx, gy))
+                if bucket:
+                    ids.extend(bucket)
+        ids = np.array(ids, dtype=np.int64)
+        inside = (self.x[ids] >= x0) & (self.x[ids] <= x1) & (self.y[ids] >= y0) & (self.y[ids] <= y1)
+        return ids[inside]
+
+    def strongest(self, px, py, max_pairs=1 << 22):
+        """
+        For many points at once, the AP whose coverage disk contains the point
+        with the smallest distance / radius, i.e. the strongest signal when
+        received power is anchored at the coverage radius. Returns (ids, q)
+        with q = (d / radius)^2; ids is -1 (q inf) where no disk contains the
+        point.
+
+        The points are sorted by query cells of max_radius / 2, row-major,
+        so the points in the cells of one row under an AP's bounding box are
+        one contiguous run. (AP, point) pairs are expanded from those runs,
+        `max_pairs` at a time, and the best AP per point is kept with one
+        np.minimum.at over packed (q, id) keys.
+        """
+        px = np.asarray(px, dtype=np.float64)
+        py = np.asarray(py, dtype=np.float64)
+        best_id = np.full(len(px), -1, dtype=np.int64)
+        best_q = np.full(len(px), np.inf)
+        ids = np.flatnonzero(self.alive)
+        if not len(ids) or not len(px):
+            return best_id, best_q
+        size = max(self.max_radius, 1e-9) / 2.0
+        key = np.floor_divide(py, size).astype(np.int64) * 2 ** 32 + np.floor_divide(px, size).astype(np.int64)
+        order = np.argsort(key, kind='stable')
+        sorted_key, sx, sy = key[order], px[order], py[order]
+
+        # One run of points per AP and cell row of its bounding box (rows past
+        # the box of a smaller AP are empty runs)
+        x, y, r = self.x[ids], self.y[ids], self.radius[ids]
+        col0, col1 = np.floor_divide(x - r, size).astype(np.int64), np.floor_divide(x + r, size).astype(np.int64)
+        row0, row1 = np.floor_divide(y - r, size).astype(np.int64), np.floor_divide(y + r, size).astype(np.int64)
+        rows = row0[:, None] + np.arange(5)
+        lo = np.searchsorted(sorted_key, (rows * 2 ** 32 + col0[:, None]).ravel(), 'left')
+        hi = np.searchsorted(sorted_key, (rows * 2 ** 32 + col1[:, None]).ravel(), 'right')
+        hi[(rows > row1[:, None]).ravel()] = lo[(rows > row1[:, None]).ravel()]
+        run_ap = np.repeat(ids, 5)
+        count = hi - lo
+        ends = np.cumsum(count)
+
+        packed = np.full(len(px), np.iinfo(np.int64).max)
+        start = 0
+        while start < len(count):
+            # Runs [start, stop) hold at most max_pairs pairs (or one run)
+            base = ends[start - 1] if start else 0
+            stop = max(int(np.searchsorted(ends, base + max_pairs, 'right')), start + 1)
+            c = count[start:stop]
+            total = int(c.sum())
+            if total:
+                ap = np.repeat(run_ap[start:stop], c)
+                pt = np.repeat(lo[start:stop] - (np.cumsum(c) - c), c) + np.arange(total)
+                q = np.square(sx[pt] - self.x[ap])
+                q += np.square(sy[pt] - self.y[ap])
+                q /= np.square(self.radius[ap])
+                inside = q < 1.0
+                # q in [0, 1) in the high bits, the AP id in the low 32
+                np.minimum.at(packed, pt[inside], (q[inside] * 2 ** 31).astype(np.int64) * 2 ** 32 + ap[inside])
+            start = stop
+
+        served = packed != np.iinfo(np.int64).max
+        ap = packed[served] & 0xFFFFFFFF
+        pos = order[served]
+        best_id[pos] = ap
+        best_q[pos] = (np.square(px[pos] - self.x[ap]) + np.square(py[pos] - self.y[ap])) / np.square(self.radius[ap])
+        return best_id, best_q
+
+    def overlap_pairs(self):
+        """
+        Every overlapping pair of APs at once, as (i, j, overlap) arrays with
+        i < j. Pairs are found by joining each cell with its neighbour cells
+        over the cell-sorted AP order, without a Python loop over APs.
+        """
+        ids = np.flatnonzero(self.alive)
+        empty = np.zeros(0, dtype=np.int64)
+        if len(ids) < 2:
+            return empty, empty, np.zeros(0)
+        cx, cy = self._cell(self.x[ids], self.y[ids])
+        k = int(math.ceil(2.0 * self.max_radius / self.cell_size))
+        # Cell keys as one int64, with enough room for the neighbour offsets
+        span = int(cy.max() - cy.min()) + 2 * k + 1
+        base_y = cy.min() - k
+        key = (cx - cx.min() + k) * span + (cy - base_y)
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        sorted_ids = ids[order]
+
+        pi, pj = [], []
+        for dx in range(-k, k + 1):
+            for dy in range(-k, k + 1):
+                target = key + dx * span + dy
+                lo = np.searchsorted(sorted_key, target, 'left')
+                hi = np.searchsorted(sorted_key, target, 'right')
+                count = hi - lo
+                if not count.any():
+                    continue
+                left = np.repeat(ids, count)
+                starts = np.repeat(lo - np.cumsum(count) + count, count)
+                right = sorted_ids[np.arange(count.sum()) + starts]
+                keep = left < right
+                pi.append(left[keep])
+                pj.append(right[keep])
+        if not pi:
+            return empty, empty, np.zeros(0)
+        i, j = np.concatenate(pi), np.concatenate(pj)
+        overlap = self.radius[i] + self.radius[j] - np.hypot(self.x[i] - self.x[j], self.y[i] - self.y[j])
+        hit = overlap > 0
+        return i[hit], j[hit], overlap[hit]
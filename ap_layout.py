@@ -0,0 +1,240 @@
+"""
+ap_layout.py
+
+Streaming import / export of AP layouts.
+
+A layout is one structured NumPy array of AP_DTYPE (x, y, radius, channel,
+tx_power): 18 bytes per AP instead of a dict per AP. Files are read and
+written in chunks of `chunk_rows` rows, so a survey with tens of thousands of
+APs is never held as per-row Python objects:
+
+- .csv   header line naming the columns, then one AP per line; every line's
+         field count is checked, then a chunk of lines is parsed with a
+         single np.loadtxt
+- .jsonl one JSON object per line; a chunk is decoded as one JSON array and
+         turned into columns, each row checked for the required fields and
+         every value for being a JSON number (not a bool, string or null)
+- .npy   a saved AP_DTYPE array, opened memory-mapped (no parse at all)
+
+`channel` and `tx_power` may be missing from a file (or, in JSON lines, from
+single rows); they default to 0 (unplanned) and DEFAULT_TX_POWER. Every value
+must be finite and fit its AP_DTYPE field: channels are integers within int16,
+the other fields within float32. A malformed row raises ValueError naming its
+file and line as "path:line: ...".
+
+Dependencies:
+- numpy
+"""
+
+import json
+import os
+import numpy as np
+
+AP_DTYPE = np.dtype([('x', np.float32), ('y', np.float32), ('radius', np.float32),
+                     ('channel', np.int16), ('tx_power', np.float32)])
+FIELDS = AP_DTYPE.names
+REQUIRED = ('x', 'y', 'radius')
+DEFAULT_TX_POWER = 20.0    # dBm
+CHUNK_ROWS = 65536
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+CHANNEL_RANGE = (int(np.iinfo(np.int16).min), int(np.iinfo(np.int16).max))
+
+
+def from_arrays(x, y, radius, channel=None, tx_power=None):
+    """An AP_DTYPE layout from column arrays."""
+    aps = np.zeros(len(x), dtype=AP_DTYPE)
+    aps['x'], aps['y'], aps['radius'] = x, y, radius
+    aps['channel'] = 0 if channel is None else channel
+    aps['tx_power'] = DEFAULT_TX_POWER if tx_power is None else tx_power
+    return aps
+
+
+def _format(path, fmt):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in ('csv', 'jsonl', 'npy'):
+        raise ValueError('unknown layout format %r (use .csv, .jsonl or .npy)' % fmt)
+    return fmt
+
+
+def _columns(names, path):
+    missing = [name for name in REQUIRED if name not in names]
+    if missing:
+        raise ValueError('%s: missing column(s) %s' % (path, ', '.join(missing)))
+
+
+def _check(values, name, numbers, path, raw=None):
+    """
+    Raise a ValueError naming the first line whose `name` value (float64
+    column `values`, read from `raw` if given) does not fit AP_DTYPE.
+    """
+    if name == 'channel':
+        low, high = CHANNEL_RANGE
+        # NaN fails every comparison, so it is caught here too
+        bad = ~((values >= low) & (values <= high) & (values == np.floor(values)))
+        reason = 'channel must be an integer in [%d, %d]' % (low, high)
+    else:
+        bad = ~(np.abs(values) <= FLOAT32_MAX)
+        reason = '%s must be a finite float32 number' % name
+    if bad.any():
+        i = int(np.argmax(bad))
+        got = json.dumps(raw[i]) if raw is not None else repr(float(values[i]))
+        raise ValueError('%s:%d: %s, got %s' % (path, numbers[i], reason, got))
+
+
+# ---------------- Reading ------------------
+def iter_layout(path, chunk_rows=CHUNK_ROWS, fmt=None):
+    """Yield the layout in `path` as AP_DTYPE chunks of up to `chunk_rows` APs."""
+    fmt = _format(path, fmt)
+    if fmt == 'npy':
+        aps = load_layout(path, fmt='npy')
+        for lo in range(0, len(aps), chunk_rows):
+            yield aps[lo:lo + chunk_rows]
+        return
+    with open(path) as f:
+        yield from (_iter_csv if fmt == 'csv' else _iter_jsonl)(f, path, chunk_rows)
+
+
+def _lines(f, chunk_rows, first=1):
+    """Non-empty lines of f in lists of up to chunk_rows, with their line numbers (counting from `first`)."""
+    chunk, numbers = [], []
+    for number, line in enumerate(f, first):
+        if line.strip():
+            chunk.append(line)
+            numbers.append(number)
+            if len(chunk) == chunk_rows:
+                yield chunk, numbers
+                chunk, numbers = [], []
+    if chunk:
+        yield chunk, numbers
+
+
+def _iter_csv(f, path, chunk_rows):
+    header = f.readline()
+    names = [name.strip().lower() for name in header.split(',')]
+    _columns(names, path)
+    known = [(i, name) for i, name in enumerate(names) if name in FIELDS]
+    for lines, numbers in _lines(f, chunk_rows, first=2):
+        # A short row followed by a long one must not shift values between
+        # records, so the field count is checked line by line before parsing
+        fields = np.array([line.count(',') for line in lines]) + 1
+        bad = np.flatnonzero(fields != len(names))
+        if len(bad):
+            raise ValueError('%s:%d: %d fields, expected %d'
+                             % (path, numbers[bad[0]], fields[bad[0]], len(names)))
+        try:
+            table = np.loadtxt(lines, delimiter=',', ndmin=2)
+        except ValueError as error:
+            _bad_csv(lines, numbers, names, path, error)
+        chunk = from_arrays(*(np.zeros(len(lines)),) * 3)
+        for i, name in known:
+            _check(table[:, i], name, numbers, path)
+            chunk[name] = table[:, i]
+        yield chunk
+
+
+def _bad_csv(lines, numbers, names, path, error):
+    """Raise a ValueError naming the first field of a chunk that is not a number."""
+    for line, number in zip(lines, numbers):
+        for name, field in zip(names, line.split(',')):
+            try:
+                float(field)
+            except ValueError:
+                raise ValueError('%s:%d: %s must be a number, got %r' % (path, number, name, field.strip())) from None
+    raise ValueError('%s: malformed value between line %d and %d (%s)'
+                     % (path, numbers[0], numbers[-1], error)) from None
+
+
+def _iter_jsonl(f, path, chunk_rows):
+    for lines, numbers in _lines(f, chunk_rows):
+        try:
+            rows = json.loads('[' + ','.join(lines) + ']')
+        except ValueError:
+            rows = None
+        if rows is None or len(rows) != len(lines) or not all(type(r) is dict for r in rows):
+            _bad_json(lines, numbers, path)
+        # json builds a dict per object; the columns are pulled straight out of
+        # them. Optional fields are filled per row: absent on one line, the default
+        try:
+            columns = [[r[name] for r in rows] for name in REQUIRED]
+        except KeyError:
+            i = next(i for i, r in enumerate(rows) if not r.keys() >= set(REQUIRED))
+            raise ValueError('%s:%d: missing field(s) %s'
+                             % (path, numbers[i], ', '.join(n for n in REQUIRED if n not in rows[i]))) from None
+        columns += [[r.get(name, default) for r in rows]
+                    for name, default in (('channel', 0), ('tx_power', DEFAULT_TX_POWER))]
+        chunk = np.zeros(len(rows), dtype=AP_DTYPE)
+        for name, column in zip(FIELDS, columns):
+            chunk[name] = _json_column(column, name, numbers, path)
+        yield chunk
+
+
+def _json_column(column, name, numbers, path):
+    """The float64 values of one JSON field, checked to be numbers that fit AP_DTYPE."""
+    # bool is a subclass of int, so the exact type is checked: true is not 1
+    if not set(map(type, column)) <= {int, float}:
+        i = next(i for i, v in enumerate(column) if type(v) not in (int, float))
+        raise ValueError('%s:%d: %s must be a number, got %s' % (path, numbers[i], name, json.dumps(column[i])))
+    try:
+        values = np.array(column, dtype=np.float64)
+    except OverflowError:
+        # An integer beyond float64; it fits no field, so it becomes inf
+        values = np.array([v if abs(v) <= FLOAT32_MAX else np.inf for v in column])
+    _check(values, name, numbers, path, column)
+    return values
+
+
+def _bad_json(lines, numbers, path):
+    """Raise a ValueError naming the first line of a chunk that is not exactly one JSON object."""
+    for line, number in zip(lines, numbers):
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValueError('%s:%d: not valid JSON' % (path, number)) from None
+        if type(row) is not dict:
+            raise ValueError('%s:%d: not a JSON object' % (path, number))
+    raise ValueError('%s: malformed rows between line %d and %d' % (path, numbers[0], numbers[-1]))
+
+
+def load_layout(path, chunk_rows=CHUNK_ROWS, fmt=None):
+    """
+    The whole layout in `path` as one AP_DTYPE array. A .npy file is
+    memory-mapped read-only; CSV and JSON-lines files are streamed.
+    """
+    fmt = _format(path, fmt)
+    if fmt == 'npy':
+        aps = np.load(path, mmap_mode='r')
+        if aps.dtype != AP_DTYPE:
+            if aps.dtype.names is None:
+                raise ValueError('%s: expected an AP_DTYPE array, got %s' % (path, aps.dtype))
+            _columns(aps.dtype.names, path)
+            converted = from_arrays(aps['x'], aps['y'], aps['radius'])
+            for name in ('channel', 'tx_power'):
+                if name in aps.dtype.names:
+                    converted[name] = aps[name]
+            aps = converted
+        return aps
+    chunks = list(iter_layout(path, chunk_rows, fmt))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=AP_DTYPE)
+
+
+# ---------------- Writing ------------------
+def save_layout(path, aps, chunk_rows=CHUNK_ROWS, fmt=None):
+    """Write an AP_DTYPE layout (or anything with its fields) to `path`."""
+    fmt = _format(path, fmt)
+    aps = np.asarray(aps)
+    if aps.dtype != AP_DTYPE:
+        aps = from_arrays(*(aps[name] for name in REQUIRED),
+                          *(aps[name] if name in aps.dtype.names else None for name in ('channel', 'tx_power')))
+    if fmt == 'npy':
+        np.save(path, aps)
+        return
+    with open(path, 'w') as f:
+        if fmt == 'csv':
+            f.write(','.join(FIELDS) + '\n')
+            row = '%.9g,%.9g,%.9g,%d,%.9g\n'
+        else:
+            row = '{"x": %.9g, "y": %.9g, "radius": %.9g, "channel": %d, "tx_power": %.9g}\n'
+        for lo in range(0, len(aps), chunk_rows):
+            chunk = aps[lo:lo + chunk_rows]
+            columns = [chunk[name].tolist() for name in FIELDS]
+            f.write(''.join(row % values for values in zip(*columns)))
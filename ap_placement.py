@@ -0,0 +1,298 @@
+"""
+ap_placement.py
+
+AP placement optimizer for the coverage analyzers.
+
+Given a floor raster (True = floor that needs coverage) and a target
+coverage fraction, propose AP positions and radii:
+
+1. greedy set cover: candidate APs on a grid of positions and a few radii,
+   picked lazily by newly covered floor (gains only shrink, so a stale gain
+   is re-evaluated only when it reaches the top of the heap) until the
+   target is met
+2. k-means refinement: every floor pixel goes to its nearest AP, each AP
+   moves to the centroid of its pixels and takes the radius that covers
+   COVER_QUANTILE of them (kept only if it lowers the layout cost)
+3. annealing: jitter, resize or drop single APs, scored by `layout_cost`
+
+`layout_cost` is the objective shared by every step: one unit per AP, plus
+the channel plan cost of channel_planner.plan_channels (overlap r_i + r_j - d
+weighted by channel penalty, summed over overlapping APs), plus a large penalty per
+percent of coverage below the target. Coverage is counted on packed bitsets
+(coverage_bits.disk_masks) at `cell` units per pixel.
+
+`optimize_placement` runs independent restarts (different seeds) in a
+ProcessPoolExecutor. The floor raster is placed in one
+multiprocessing.shared_memory block that every worker maps instead of
+receiving a pickled copy.
+
+Run:
+    python3 ap_placement.py 900 700 --target 0.95 --restarts 8 --out layout.csv
+
+Dependencies:
+- numpy
+- ap_layout.py, channel_planner.py, coverage_bits.py
+"""
+
+import argparse
+import heapq
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import ap_layout
+import channel_planner
+import coverage_bits
+
+MIN_RADIUS = 60
+MAX_RADIUS = 220
+CELL = 4.0                  # floor units per raster pixel
+INTERFERENCE_WEIGHT = 0.002  # layout cost per unit of weighted overlap (500 units ~ one AP)
+SHORTFALL_WEIGHT = 10.0     # layout cost per percent of coverage below target
+COVER_QUANTILE = 0.98
+PLAN_MOVES = 20             # annealing moves per AP of each channel plan
+
+
+# ---------------- Coverage on the floor raster ------------------
+def pack_floor(floor):
+    """Floor raster (rows = y) packed like coverage_bits masks: (rows, words) uint64."""
+    floor = np.asarray(floor, dtype=bool)
+    words = -(-floor.shape[1] // coverage_bits.WORD_BITS)
+    padded = np.zeros((floor.shape[0], words * coverage_bits.WORD_BITS), dtype=bool)
+    padded[:, :floor.shape[1]] = floor
+    return np.packbits(padded, axis=1, bitorder='little').view(np.uint64)
+
+
+def covered_bits(masks, packed_floor):
+    """OR of the masks, restricted to the floor."""
+    covered = np.zeros_like(packed_floor)
+    for mask in masks:
+        if mask is not None:
+            y0, w0, bits = mask
+            covered[y0:y0 + bits.shape[0], w0:w0 + bits.shape[1]] |= bits
+    return covered & packed_floor
+
+
+def layout_masks(x, y, radius, floor_shape, cell=CELL):
+    """Bitset masks of the APs (x, y, radius in floor units) on the raster."""
+    height, width = floor_shape
+    return coverage_bits.disk_masks(np.asarray(x) / cell, np.asarray(y) / cell, np.asarray(radius) / cell,
+                                    width, height)
+
+
+def layout_cost(x, y, radius, packed_floor, floor_count, target, floor_shape, cell=CELL,
+                channels=channel_planner.TWO_GHZ_CHANNELS, masks=None, rng=np.random):
+    """(cost, coverage, channel numbers) of a layout; see the module docstring."""
+    n = len(x)
+    if masks is None:
+        masks = layout_masks(x, y, radius, floor_shape, cell)
+    coverage = coverage_bits.popcount(covered_bits(masks, packed_floor)) / max(floor_count, 1)
+    if n:
+        plan, interference = channel_planner.plan_channels(x, y, radius, channels, budget_ms=1000.0,
+                                                           max_moves=PLAN_MOVES * n, rng=rng)
+    else:
+        plan, interference = np.zeros(0, dtype=np.int64), 0.0
+    shortfall = max(0.0, target - coverage) * 100.0
+    return n + INTERFERENCE_WEIGHT * interference + SHORTFALL_WEIGHT * shortfall, coverage, plan
+
+
+# ---------------- 1. Greedy set cover ------------------
+def greedy_cover(floor, target, cell=CELL, spacing=None, radii=None, rng=np.random):
+    """
+    Pick candidate APs by largest newly covered floor area until `target`
+    of the floor is covered. Returns (x, y, radius) arrays in floor units.
+    """
+    height, width = floor.shape
+    radii = np.asarray(radii if radii is not None else (MAX_RADIUS, 0.5 * (MIN_RADIUS + MAX_RADIUS), MIN_RADIUS), dtype=np.float64)
+    spacing = spacing or MIN_RADIUS
+    # Candidate centres on a jittered grid (the jitter differs per restart)
+    gx = np.arange(0.0, width * cell, spacing) + rng.uniform(0, spacing)
+    gy = np.arange(0.0, height * cell, spacing) + rng.uniform(0, spacing)
+    cx, cy, cr = (a.ravel() for a in np.meshgrid(gx, gy, radii, indexing='ij'))
+    masks = layout_masks(cx, cy, cr, floor.shape, cell)
+    packed = pack_floor(floor)
+    need = target * coverage_bits.popcount(packed)
+    uncovered_floor = packed.copy()
+
+    def gain(i):
+        mask = masks[i]
+        if mask is None:
+            return 0
+        y0, w0, bits = mask
+        return coverage_bits.popcount(bits & uncovered_floor[y0:y0 + bits.shape[0], w0:w0 + bits.shape[1]])
+
+    # Ties prefer the larger radius (fewer APs), then a random order
+    heap = [(-gain(i), -cr[i], rng.random_sample(), i) for i in range(len(cx))]
+    heapq.heapify(heap)
+    chosen = []
+    total = 0
+    while heap and total < need:
+        _, r, tie, i = heapq.heappop(heap)
+        fresh = gain(i)
+        if fresh == 0:
+            continue
+        if heap and -fresh > heap[0][0]:
+            heapq.heappush(heap, (-fresh, r, tie, i))   # stale: back in with its current gain
+            continue
+        y0, w0, bits = masks[i]
+        uncovered_floor[y0:y0 + bits.shape[0], w0:w0 + bits.shape[1]] &= ~bits
+        total += fresh
+        chosen.append(i)
+    chosen = np.array(chosen, dtype=np.int64)
+    return cx[chosen], cy[chosen], cr[chosen]
+
+
+# ---------------- 2. k-means refinement ------------------
+def floor_points(floor, cell=CELL):
+    """Centres of the floor pixels, in floor units."""
+    py, px = np.nonzero(floor)
+    return (px + 0.5) * cell, (py + 0.5) * cell
+
+
+def refine_kmeans(x, y, radius, px, py, iterations=5, chunk=65536):
+    """Lloyd iterations: APs move to the centroid of their nearest floor points and resize to cover them."""
+    x, y, radius = (np.array(a, dtype=np.float64) for a in (x, y, radius))
+    k = len(x)
+    if not k or not len(px):
+        return x, y, radius
+    for _ in range(iterations):
+        owner = np.empty(len(px), dtype=np.int64)
+        dist = np.empty(len(px))
+        for lo in range(0, len(px), chunk):
+            d2 = np.square(px[lo:lo + chunk, None] - x) + np.square(py[lo:lo + chunk, None] - y)
+            owner[lo:lo + chunk] = d2.argmin(axis=1)
+            dist[lo:lo + chunk] = np.sqrt(d2[np.arange(len(d2)), owner[lo:lo + chunk]])
+        count = np.bincount(owner, minlength=k)
+        used = count > 0
+        x[used] = np.bincount(owner, px, k)[used] / count[used]
+        y[used] = np.bincount(owner, py, k)[used] / count[used]
+        order = np.lexsort((dist, owner))
+        starts = np.cumsum(count) - count
+        for i in np.flatnonzero(used).tolist():
+            q = dist[order[starts[i] + int(COVER_QUANTILE * (count[i] - 1))]]
+            radius[i] = min(max(q, MIN_RADIUS), MAX_RADIUS)
+    return x, y, radius
+
+
+# ---------------- 3. Annealing ------------------
+def anneal_layout(x, y, radius, floor, target, budget_ms=300.0, cell=CELL,
+                  channels=channel_planner.TWO_GHZ_CHANNELS, rng=np.random):
+    """
+    Improve a layout by moving, resizing or dropping one AP at a time under
+    `layout_cost`, until `budget_ms` is spent. Returns the best layout as
+    (x, y, radius, channel numbers, cost, coverage).
+    """
+    packed = pack_floor(floor)
+    floor_count = coverage_bits.popcount(packed)
+    x, y, radius = (np.array(a, dtype=np.float64) for a in (x, y, radius))
+    masks = layout_masks(x, y, radius, floor.shape, cell)
+    cost, coverage, plan = layout_cost(x, y, radius, packed, floor_count, target, floor.shape, cell, channels, masks, rng)
+    best = (x.copy(), y.copy(), radius.copy(), plan, cost, coverage)
+    step = 0.5 * MIN_RADIUS
+    t0 = 0.5
+    deadline = time.perf_counter() + budget_ms / 1000.0
+    while len(x) and time.perf_counter() < deadline:
+        temperature = t0 * max(deadline - time.perf_counter(), 0.0) / (budget_ms / 1000.0) + 1e-6
+        i = rng.randint(len(x))
+        nx, ny, nr = x.copy(), y.copy(), radius.copy()
+        nmasks = list(masks)
+        move = rng.randint(3)
+        if move == 2 and len(x) > 1:
+            keep = np.arange(len(x)) != i
+            nx, ny, nr = nx[keep], ny[keep], nr[keep]
+            del nmasks[i]
+        else:
+            if move == 0:
+                nx[i] = min(max(nx[i] + rng.normal(0.0, step), 0.0), floor.shape[1] * cell)
+                ny[i] = min(max(ny[i] + rng.normal(0.0, step), 0.0), floor.shape[0] * cell)
+            else:
+                nr[i] = min(max(nr[i] + rng.normal(0.0, 0.25 * step), MIN_RADIUS), MAX_RADIUS)
+            nmasks[i] = layout_masks(nx[i:i + 1], ny[i:i + 1], nr[i:i + 1], floor.shape, cell)[0]
+        ncost, ncoverage, nplan = layout_cost(nx, ny, nr, packed, floor_count, target, floor.shape, cell,
+                                              channels, nmasks, rng)
+        if ncost <= cost or rng.random_sample() < math.exp((cost - ncost) / temperature):
+            x, y, radius, masks, cost, coverage, plan = nx, ny, nr, nmasks, ncost, ncoverage, nplan
+            if cost < best[4]:
+                best = (x.copy(), y.copy(), radius.copy(), plan, cost, coverage)
+    return best
+
+
+# ---------------- Parallel restarts ------------------
+def place_aps(floor, target=0.95, seed=0, budget_ms=300.0, cell=CELL, channels=channel_planner.TWO_GHZ_CHANNELS):
+    """One restart: greedy cover, k-means refinement, annealing. Returns anneal_layout's tuple."""
+    rng = np.random.RandomState(seed)
+    x, y, radius = greedy_cover(floor, target, cell, rng=rng)
+    px, py = floor_points(floor, cell)
+    refined = refine_kmeans(x, y, radius, px, py)
+    packed = pack_floor(floor)
+    floor_count = coverage_bits.popcount(packed)
+    costs = [layout_cost(*layout, packed, floor_count, target, floor.shape, cell, channels, rng=rng)[0]
+             for layout in ((x, y, radius), refined)]
+    if costs[1] < costs[0]:
+        x, y, radius = refined
+    return anneal_layout(x, y, radius, floor, target, budget_ms, cell, channels, rng)
+
+
+_shared = None   # (SharedMemory, floor view) inside a worker
+
+
+def _attach(name, shape):
+    global _shared
+    shm = shared_memory.SharedMemory(name=name)
+    _shared = (shm, np.ndarray(shape, dtype=bool, buffer=shm.buf))
+
+
+def _restart(seed, target, budget_ms, cell, channels):
+    return place_aps(_shared[1], target, seed, budget_ms, cell, channels)
+
+
+def optimize_placement(floor, target=0.95, restarts=8, workers=None, budget_ms=300.0, cell=CELL,
+                       channels=channel_planner.TWO_GHZ_CHANNELS, seed=0):
+    """
+    Best of `restarts` placements of `floor` (bool raster, rows = y, `cell`
+    units per pixel), run on `workers` processes (default: all cores).
+    Returns (x, y, radius, channel numbers, cost, coverage) in floor units.
+    """
+    floor = np.ascontiguousarray(floor, dtype=bool)
+    shm = shared_memory.SharedMemory(create=True, size=max(floor.nbytes, 1))
+    try:
+        np.ndarray(floor.shape, dtype=bool, buffer=shm.buf)[:] = floor
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_attach,
+                                 initargs=(shm.name, floor.shape)) as pool:
+            futures = [pool.submit(_restart, seed + k, target, budget_ms, cell, channels) for k in range(restarts)]
+            results = [f.result() for f in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+    return min(results, key=lambda r: r[4])
+
+
+def rectangle_floor(width, height, cell=CELL):
+    """Floor raster of a plain width x height rectangle."""
+    return np.ones((int(math.ceil(height / cell)), int(math.ceil(width / cell))), dtype=bool)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Propose AP positions and radii for a rectangular floor.')
+    parser.add_argument('width', type=float)
+    parser.add_argument('height', type=float)
+    parser.add_argument('--target', type=float, default=0.95, help='coverage fraction to reach')
+    parser.add_argument('--restarts', type=int, default=8)
+    parser.add_argument('--workers', type=int, help='processes (default: all cores)')
+    parser.add_argument('--budget-ms', type=float, default=300.0, help='annealing budget per restart')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the layout (.csv, .jsonl or .npy)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    x, y, radius, channel, cost, coverage = optimize_placement(
+        rectangle_floor(args.width, args.height), args.target, args.restarts, args.workers, args.budget_ms, seed=args.seed)
+    print('%d APs  coverage %.1f%%  cost %.2f  (%.1f s)' % (len(x), 100.0 * coverage, cost, time.perf_counter() - start))
+    if args.out:
+        ap_layout.save_layout(args.out, ap_layout.from_arrays(x, y, radius, channel))
+
+
+if __name__ == '__main__':
+    main()
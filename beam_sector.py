@@ -0,0 +1,82 @@
+"""
+beam_sector.py
+
+Azimuth index for the radar scanners' beam.
+
+A rotating beam only illuminates the targets inside its sector, angle +- beam
+width. `AzimuthIndex` keeps target ids sorted by azimuth around the radar at
+the origin, so the ids inside a sector are one (or, across 0 degrees, two)
+contiguous runs found with two binary searches: a frame costs O(log n + k)
+for the k targets in the beam instead of O(n).
+
+Moving targets drift away from the azimuth they were indexed at. The index
+can be built with their velocities; it then widens every query by the most
+any target can have turned since (`drift`), and the caller filters the
+candidates by their current azimuth. Rebuilding (an argsort) is only needed
+once the drift gets large, e.g. once per revolution; new points are
+inserted into the sorted arrays in between.
+
+Dependencies:
+- numpy
+"""
+
+import numpy as np
+
+DRIFT_MARGIN = 2.0   # safety factor on the fastest angular rate at build time
+
+
+def azimuth(x, y):
+    """Azimuth in degrees, [0, 360), of points around the origin."""
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def angle_diff(a, b):
+    """Absolute difference of angles in degrees, in [0, 180]."""
+    return np.abs((np.asarray(a) - b + 180.0) % 360.0 - 180.0)
+
+
+class AzimuthIndex:
+    """Ids of points sorted by azimuth, queried by angular sector."""
+
+    def __init__(self, x, y, ids=None, vx=None, vy=None):
+        self.build(x, y, ids, vx, vy)
+
+    def build(self, x, y, ids=None, vx=None, vy=None):
+        """Index the points (x, y) (ids default to 0..n-1), moving with (vx, vy) per frame."""
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        az = azimuth(x, y)
+        order = np.argsort(az, kind='stable')
+        self.azimuth = az[order]
+        self.ids = (np.arange(len(x)) if ids is None else np.asarray(ids))[order]
+        self.drift = 0.0   # degrees a point may have turned since the build
+        self.rate = 0.0    # bound on degrees turned per frame
+        if vx is not None and len(x):
+            speed = np.hypot(vx, vy)
+            self.rate = DRIFT_MARGIN * float(np.degrees((speed / np.maximum(np.hypot(x, y), 1.0)).max()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def insert(self, ids, x, y):
+        """Add points at their current azimuth (an O(n) array insert, no re-sort)."""
+        az = azimuth(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        order = np.argsort(az, kind='stable')
+        at = np.searchsorted(self.azimuth, az[order])
+        self.azimuth = np.insert(self.azimuth, at, az[order])
+        self.ids = np.insert(self.ids, at, np.asarray(ids)[order])
+
+    def age(self, dt=1.0):
+        """Let `dt` frames pass: queries widen by the possible drift."""
+        self.drift += self.rate * dt
+
+    def sector(self, center, half_width):
+        """Ids indexed within half_width (+ drift) degrees of the azimuth `center`."""
+        width = half_width + self.drift
+        if width >= 180.0:
+            return self.ids
+        lo, hi = (center - width) % 360.0, (center + width) % 360.0
+        a = np.searchsorted(self.azimuth, lo, 'left')
+        b = np.searchsorted(self.azimuth, hi, 'right')
+        if lo <= hi:
+            return self.ids[a:b]
+        return np.concatenate([self.ids[a:], self.ids[:b]])
@@ -0,0 +1,233 @@
+"""
+channel_planner.py
+
+Graph-colouring channel planner for the coverage analyzers.
+
+The old `assign_channels` was a single greedy pass: each AP took the channel
+with the lowest interference score against the APs before it, so the result
+depended on AP order and early choices were never revisited. The planner
+works on the AP overlap graph instead:
+
+- one vertex per AP, one edge per pair of overlapping coverage disks, weighted
+  with the overlap factor r_i + r_j - d
+- an edge costs weight * penalty[c_i, c_j]; by default 1.0 for co-channel and
+  0.4 for different channels, as the old greedy pass weighted them
+- DSATUR builds a first plan, then simulated annealing improves it until a
+  time budget (or move budget) is spent, keeping the best plan seen
+
+Every vertex keeps a row `conflict[v, c]`: the cost of its edges if it used
+channel c. A move is priced in O(1) from that row and applied in O(degree), so
+nothing is ever rescored from scratch. Any channel list works, e.g. the 5 GHz
+plan FIVE_GHZ_CHANNELS.
+
+Dependencies:
+- numpy
+- ap_index.py
+"""
+
+import heapq
+import math
+import time
+import numpy as np
+import ap_index
+
+TWO_GHZ_CHANNELS = [1, 6, 11]
+FIVE_GHZ_CHANNELS = [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128, 132, 136, 140, 149, 153, 157, 161, 165]
+
+
+def default_penalty(count, co_channel=1.0, other=0.4):
+    """Channel penalties: co_channel on the diagonal, other elsewhere."""
+    return np.full((count, count), other) + (co_channel - other) * np.eye(count)
+
+
+class ChannelPlanner:
+    """Channel plan over an AP overlap graph with per-vertex conflict rows."""
+
+    def __init__(self, channels=TWO_GHZ_CHANNELS, penalty=None):
+        self.channels = list(channels)
+        count = len(self.channels)
+        self.penalty = default_penalty(count) if penalty is None else np.asarray(penalty, dtype=np.float64)
+        self.nbr = []      # per vertex: neighbour ids (int64 array)
+        self.weight = []   # per vertex: edge weights (float64 array)
+        self.chan = np.zeros(0, dtype=np.int64)            # channel index per vertex, -1 = unassigned
+        self.conflict = np.zeros((0, count))
+
+    @classmethod
+    def from_aps(cls, x, y, radius, channels=TWO_GHZ_CHANNELS, penalty=None):
+        """Build the overlap graph of the APs (x[i], y[i], radius[i])."""
+        planner = cls(channels, penalty)
+        grid = ap_index.APGrid.from_arrays(x, y, radius)
+        planner.set_graph(len(grid.alive), *grid.overlap_pairs())
+        return planner
+
+    def __len__(self):
+        return len(self.chan)
+
+    def set_graph(self, n, i, j, weight):
+        """Replace the graph with n vertices and undirected edges (i, j, weight)."""
+        if n == 0:
+            self.nbr, self.weight = [], []
+            self.chan = np.zeros(0, dtype=np.int64)
+            self.conflict = np.zeros((0, len(self.channels)))
+            return
+        src = np.concatenate([i, j])
+        dst = np.concatenate([j, i])
+        w = np.concatenate([weight, weight]).astype(np.float64)
+        order = np.argsort(src, kind='stable')
+        bounds = np.searchsorted(src[order], np.arange(n + 1))
+        self.nbr = np.split(dst[order], bounds[1:-1])
+        self.weight = np.split(w[order], bounds[1:-1])
+        self.chan = np.full(n, -1, dtype=np.int64)
+        self.conflict = np.zeros((n, len(self.channels)))
+
+    def resize(self, n):
+        """Grow the graph to n vertices; new vertices have no edges and no channel."""
+        extra = n - len(self)
+        if extra <= 0:
+            return
+        empty_i, empty_w = np.zeros(0, dtype=np.int64), np.zeros(0)
+        self.nbr.extend(empty_i for _ in range(extra))
+        self.weight.extend(empty_w for _ in range(extra))
+        self.chan = np.concatenate([self.chan, np.full(extra, -1, dtype=np.int64)])
+        self.conflict = np.concatenate([self.conflict, np.zeros((extra, len(self.channels)))])
+
+    def set_edges(self, v, nbr, weight):
+        """Replace the edges of vertex v, keeping its channel and every conflict row consistent."""
+        c = self.chan[v]
+        self.assign(v, -1)
+        for n in self.nbr[v].tolist():
+            keep = self.nbr[n] != v
+            self.nbr[n] = self.nbr[n][keep]
+            self.weight[n] = self.weight[n][keep]
+        nbr = np.asarray(nbr, dtype=np.int64)
+        weight = np.asarray(weight, dtype=np.float64)
+        for n, w in zip(nbr.tolist(), weight.tolist()):
+            self.nbr[n] = np.append(self.nbr[n], v)
+            self.weight[n] = np.append(self.weight[n], w)
+        self.nbr[v], self.weight[v] = nbr, weight
+        used = self.chan[nbr]
+        known = used >= 0
+        self.conflict[v] = (weight[known, None] * self.penalty[used[known]]).sum(axis=0)
+        self.assign(v, c)
+
+    # ---------------- assignment ------------------
+    def assign(self, v, c):
+        """Give vertex v channel index c (or -1 to unassign), updating its neighbours' rows."""
+        old = self.chan[v]
+        if old == c:
+            return
+        nbr = self.nbr[v]
+        if len(nbr):
+            row = np.zeros(len(self.channels))
+            if old >= 0:
+                row -= self.penalty[old]
+            if c >= 0:
+                row += self.penalty[c]
+            self.conflict[nbr] += self.weight[v][:, None] * row
+        self.chan[v] = c
+
+    def delta(self, v, c):
+        """Change of the plan cost if vertex v switched to channel index c."""
+        return self.conflict[v, c] - self.conflict[v, self.chan[v]]
+
+    def cost(self):
+        """Total weighted interference of the plan (each edge counted once)."""
+        done = np.flatnonzero(self.chan >= 0)
+        return 0.5 * float(self.conflict[done, self.chan[done]].sum())
+
+    def plan(self):
+        """Channel number of every vertex."""
+        return np.asarray(self.channels)[self.chan]
+
+    # ---------------- DSATUR ------------------
+    def dsatur(self, vertices=None):
+        """
+        Colour `vertices` (default: all) with weighted DSATUR, keeping every
+        other vertex's channel fixed. The vertex whose neighbours already use
+        the most distinct channels goes next (ties: heavier total overlap),
+        taking its cheapest channel.
+        """
+        vertices = np.arange(len(self)) if vertices is None else np.asarray(vertices, dtype=np.int64)
+        for v in vertices.tolist():
+            self.assign(v, -1)
+        pending = set(vertices.tolist())
+        strength = [float(w.sum()) for w in self.weight]
+        saturation = {}
+        for v in pending:
+            nbr = self.nbr[v]
+            used = self.chan[nbr]
+            saturation[v] = set(used[used >= 0].tolist())
+        heap = [(-len(saturation[v]), -strength[v], v) for v in pending]
+        heapq.heapify(heap)
+        while heap:
+            sat, _, v = heapq.heappop(heap)
+            if v not in pending or -sat != len(saturation[v]):
+                continue
+            pending.discard(v)
+            c = int(np.argmin(self.conflict[v]))
+            self.assign(v, c)
+            for n in self.nbr[v].tolist():
+                if n in pending and c not in saturation[n]:
+                    saturation[n].add(c)
+                    heapq.heappush(heap, (-len(saturation[n]), -strength[n], n))
+
+    # ---------------- simulated annealing ------------------
+    def anneal(self, budget_ms=50.0, max_moves=None, vertices=None, rng=np.random):
+        """
+        Improve the plan by simulated annealing over `vertices` (default: all)
+        until `budget_ms` or `max_moves` (default 100 per vertex) runs out.
+        Leaves the best plan seen in place and returns its cost.
+        """
+        vertices = np.arange(len(self)) if vertices is None else np.asarray(vertices, dtype=np.int64)
+        count = len(self.channels)
+        best_cost = self.cost()
+        if not len(vertices) or count < 2:
+            return best_cost
+        if max_moves is None:
+            max_moves = 100 * len(vertices)
+        weights = [self.weight[v] for v in vertices.tolist()]
+        mean_weight = float(np.mean(np.concatenate(weights))) if any(len(w) for w in weights) else 0.0
+        if mean_weight == 0.0:
+            return best_cost
+        spread = float(self.penalty.max() - self.penalty.min()) or 1.0
+        t0 = 0.5 * mean_weight * spread
+        best = self.chan[vertices].copy()
+        cost = best_cost
+
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        batch = 256
+        moves = 0
+        while moves < max_moves:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            progress = max(moves / max_moves, 1.0 - (deadline - now) * 1000.0 / budget_ms) if budget_ms > 0 else 1.0
+            temperature = t0 * (1.0 - progress) + 1e-9
+            picks = vertices[rng.randint(0, len(vertices), batch)].tolist()
+            shifts = rng.randint(1, count, batch).tolist()
+            draws = rng.random_sample(batch).tolist()
+            for v, shift, u in zip(picks, shifts, draws):
+                c = (self.chan[v] + shift) % count
+                d = self.delta(v, c)
+                if d <= 0.0 or u < math.exp(-d / temperature):
+                    self.assign(v, c)
+                    cost += d
+            # Snapshot at batch ends only, so keeping the best plan stays O(n / batch) per move
+            if cost < best_cost - 1e-9:
+                best_cost = cost
+                best = self.chan[vertices].copy()
+            moves += batch
+        for v, c in zip(vertices.tolist(), best.tolist()):
+            self.assign(v, c)
+        return best_cost
+
+
+def plan_channels(x, y, radius, channels=TWO_GHZ_CHANNELS, budget_ms=50.0, penalty=None, max_moves=None, rng=np.random):
+    """
+    Plan channels for the APs (x[i], y[i], radius[i]): DSATUR, then annealing
+    for up to `budget_ms`. Returns (channel numbers, plan cost).
+    """
+    planner = ChannelPlanner.from_aps(x, y, radius, channels, penalty)
+    planner.dsatur()
+    cost = planner.anneal(budget_ms, max_moves, rng=rng)
+    return planner.plan(), cost
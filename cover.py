@@ -7,9 +7,10 @@ Uses the Mid-Point Circle Algorithm (MPCA) for rendering all circular visuals.
 Features:
 - Multiple Access Points (APs) with radius visualized using MPCA
 - Real-screen coordinates (0..WIDTH, 0..HEIGHT) with center at (WIDTH//2, HEIGHT//2)
-- Simple channel assignment heuristic to reduce interference
-- Toggleable interference heatmap (alpha-blended concentric circles)
-- Keyboard controls: Space=regen APs, +/- = change AP count, H=toggle heatmap, M=toggle MPCA/poly, I=toggle instructions
+- Channel planning (DSATUR + annealing over the AP overlap graph) to reduce interference
+- Toggleable interference heatmap (alpha-blended filled MPCA annulus bands)
+- Walls (G): coverage attenuated by a PNG / .npy floor plan (WALL_FILE, else a sample office), obstacle_loss.py
+- Keyboard controls: Space=regen APs, +/- = change AP count, H=toggle heatmap, G=walls, M=toggle MPCA/poly, I=toggle instructions
 - Real-time CPU usage display (local laptop resource utilization)
 
 Dependencies:
@@ -27,62 +28,38 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
+import os
 import random
 import numpy as np
+import channel_planner
 import psutil
+import mpca_gl
+import obstacle_loss
+import sinr_heatmap
 
 # ------------------------ Configuration ------------------------
 WIDTH, HEIGHT = 900, 700
 AP_COUNT = 10
 MIN_RADIUS = 60
 MAX_RADIUS = 220
-CHANNELS = [1, 6, 11]
+CHANNELS = channel_planner.TWO_GHZ_CHANNELS  # or channel_planner.FIVE_GHZ_CHANNELS
+PLAN_BUDGET_MS = 50  # time budget of the channel planner's annealing
 SHOW_HEATMAP = True
 USE_MPCA = True
+SHOW_WALLS = False
+WALL_FILE = 'walls.png'  # .png or .npy; the sample office floor when missing
 
 # state
 aps = []
+heat_rings = None  # retained span VBO for the filled heatmap bands
+ap_rings = None  # retained VBO for the AP coverage outlines
 show_instructions = True
 cpu_usage = 0.0
-
-# ---------------- Mid-Point Circle Algorithm ------------------
-def midpoint_circle_points(xc, yc, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    pts = []
-    while x >= y:
-        pts.extend([
-            (xc + x, yc + y), (xc - x, yc + y),
-            (xc + x, yc - y), (xc - x, yc - y),
-            (xc + y, yc + x), (xc - y, yc + x),
-            (xc + y, yc - x), (xc - y, yc - x),
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    unique = []
-    s = set()
-    for px, py in pts:
-        ix, iy = int(round(px)), int(round(py))
-        if (ix, iy) not in s and 0 <= ix < WIDTH and 0 <= iy < HEIGHT:
-            unique.append((ix, iy))
-            s.add((ix, iy))
-    return unique
+obstacles = None  # obstacle_loss.ObstacleMap, loaded when walls are first shown
+wall_heat = None  # textures of the wall-attenuated SINR and of the walls
+wall_image = None
 
 # -------------- Utility: draw circle -------------
-def draw_circle_mpca(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5)):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glPointSize(1)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(int(round(xc)), int(round(yc)), int(round(radius))):
-        glVertex2i(x, y)
-    glEnd()
-
 def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=64):
     r, g, b, a = color
     glColor4f(r, g, b, a)
@@ -96,27 +73,15 @@ def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=64):
     glEnd()
 
 # -------------------- Interference / Channel Heuristic --------------------
-def interference_score(x, y, radius, channel, other_aps):
-    score = 0.0
-    for ap in other_aps:
-        d = math.hypot(x - ap['x'], y - ap['y'])
-        if d < (radius + ap['radius']):
-            overlap_factor = (radius + ap['radius'] - d)
-            chan_penalty = 1.0 if channel == ap['channel'] else 0.4
-            score += overlap_factor * chan_penalty
-    return score
-
 def assign_channels(aps_list):
-    for i, ap in enumerate(aps_list):
-        best_c = CHANNELS[0]
-        best_score = float('inf')
-        for ch in CHANNELS:
-            ap['channel'] = ch
-            s = interference_score(ap['x'], ap['y'], ap['radius'], ch, aps_list[:i])
-            if s < best_score:
-                best_score = s
-                best_c = ch
-        ap['channel'] = best_c
+    # DSATUR followed by simulated annealing over the AP overlap graph, with
+    # overlap (r_i + r_j - d) weighted 1.0 co-channel / 0.4 otherwise (channel_planner.py)
+    if not aps_list:
+        return
+    channels, _ = channel_planner.plan_channels([ap['x'] for ap in aps_list], [ap['y'] for ap in aps_list],
+                                                [ap['radius'] for ap in aps_list], CHANNELS, PLAN_BUDGET_MS)
+    for ap, ch in zip(aps_list, channels.tolist()):
+        ap['channel'] = ch
 
 # -------------------- Generate APs --------------------
 def generate_aps(count=AP_COUNT):
@@ -129,37 +94,76 @@ def generate_aps(count=AP_COUNT):
         y = random.uniform(margin + radius, HEIGHT - margin - radius)
         aps.append({'x': x, 'y': y, 'radius': radius, 'channel': random.choice(CHANNELS)})
     assign_channels(aps)
+    update_walls()
+
+# -------------------- Walls --------------------
+def update_walls():
+    # AP i keeps its cached ray march while its disk stays the same
+    global obstacles, wall_heat, wall_image
+    if not SHOW_WALLS:
+        return
+    if obstacles is None:
+        walls = obstacle_loss.load_walls(WALL_FILE) if os.path.exists(WALL_FILE) else obstacle_loss.demo_walls(WIDTH, HEIGHT)
+        obstacles = obstacle_loss.ObstacleMap(walls, WIDTH / walls.shape[1])
+        wall_heat, wall_image = mpca_gl.TextureImage(), mpca_gl.TextureImage()
+        wall_image.set_image(obstacles.rgba())
+    best, sinr = obstacles.field(range(len(aps)), [ap['x'] for ap in aps], [ap['y'] for ap in aps],
+                                 [ap['radius'] for ap in aps], [ap['channel'] for ap in aps])
+    with np.errstate(divide='ignore'):
+        wall_heat.set_image(sinr_heatmap.colorize(sinr_heatmap.EDGE_DBM + 10.0 * np.log10(best), sinr))
+
+def draw_walls():
+    wall_heat.draw(0, 0, obstacles.cell)
+    wall_image.draw(0, 0, obstacles.cell)
 
 # -------------------- Rendering --------------------
+CHANNEL_PALETTE = [(0.2, 0.6, 1.0), (0.4, 1.0, 0.2), (1.0, 0.6, 0.2), (0.9, 0.3, 0.9), (1.0, 1.0, 0.3), (0.3, 1.0, 0.9)]
+
+def heatmap_color(channel, alpha):
+    return CHANNEL_PALETTE[CHANNELS.index(channel) % len(CHANNEL_PALETTE)] + (alpha,)
+
 def draw_heatmap():
+    rings = 8
+    if not USE_MPCA:
+        for ap in aps:
+            for i in range(rings, 0, -1):
+                frac = i / rings
+                draw_circle_poly(ap['x'], ap['y'], ap['radius'] * frac, heatmap_color(ap['channel'], 0.18 * frac))
+        return
+
+    # Each AP is filled with `rings` gapless MPCA annulus bands; all bands of all
+    # APs live in one span VBO that is only re-uploaded when the APs (or the
+    # window size) change, and is drawn with a single call
+    global heat_rings
+    bands, colors = [], []
     for ap in aps:
-        cx, cy, r = ap['x'], ap['y'], ap['radius']
-        rings = 8
         for i in range(rings, 0, -1):
-            frac = i / rings
-            alpha = 0.18 * frac
-            if ap['channel'] == CHANNELS[0]: color = (0.2, 0.6, 1.0, alpha)
-            elif ap['channel'] == CHANNELS[1]: color = (0.4, 1.0, 0.2, alpha)
-            else: color = (1.0, 0.6, 0.2, alpha)
-            if USE_MPCA:
-                draw_circle_mpca(cx, cy, r * frac, color)
-            else:
-                draw_circle_poly(cx, cy, r * frac, color)
+            inner = round(ap['radius'] * (i - 1) / rings) + 1 if i > 1 else 0
+            bands.append((ap['x'], ap['y'], inner, round(ap['radius'] * i / rings)))
+            colors.append(heatmap_color(ap['channel'], 0.18 * i / rings))
+    if heat_rings is None:
+        heat_rings = mpca_gl.SpanBatch()
+    heat_rings.set_annuli(bands, colors, WIDTH, HEIGHT)
+    heat_rings.draw()
 
 def draw_aps():
+    global ap_rings
     glPointSize(6)
     glBegin(GL_POINTS)
     for ap in aps:
-        if ap['channel'] == CHANNELS[0]: glColor3f(0.2, 0.6, 1.0)
-        elif ap['channel'] == CHANNELS[1]: glColor3f(0.4, 1.0, 0.2)
-        else: glColor3f(1.0, 0.6, 0.2)
+        glColor4f(*heatmap_color(ap['channel'], 1.0))
         glVertex2f(ap['x'], ap['y'])
     glEnd()
 
-    for ap in aps:
-        color = (0.8, 0.8, 0.8, 0.9)
-        if USE_MPCA: draw_circle_mpca(ap['x'], ap['y'], ap['radius'], color)
-        else: draw_circle_poly(ap['x'], ap['y'], ap['radius'], color)
+    color = (0.8, 0.8, 0.8, 0.9)
+    if USE_MPCA:
+        # One batch for every outline; re-uploaded only when an AP moves
+        if ap_rings is None:
+            ap_rings = mpca_gl.CircleBatch()
+        ap_rings.set_circles([(ap['x'], ap['y'], ap['radius']) for ap in aps], color, WIDTH, HEIGHT)
+        ap_rings.draw(point_size=1)
+    else:
+        for ap in aps: draw_circle_poly(ap['x'], ap['y'], ap['radius'], color)
     glColor3f(1.0, 1.0, 1.0)
     for ap in aps: draw_text(int(ap['x']) + 6, int(ap['y']) + 6, f"CH:{ap['channel']}")
 
@@ -184,7 +188,8 @@ def display():
     for y in range(0, HEIGHT, step): glVertex2f(0,y); glVertex2f(WIDTH,y)
     glEnd()
 
-    if SHOW_HEATMAP: draw_heatmap()
+    if SHOW_WALLS: draw_walls()
+    elif SHOW_HEATMAP: draw_heatmap()
     draw_aps()
 
     # CPU usage display
@@ -194,7 +199,7 @@ def display():
     if show_instructions:
         glColor3f(1.0,1.0,1.0)
         lines = [
-            "Controls: Space=regen APs  +/-=change AP count  H=toggle heatmap",
+            "Controls: Space=regen APs  +/-=change AP count  H=toggle heatmap  G=walls",
             "M=toggle MPCA/poly  I=toggle instructions  Q/Esc=quit",
         ]
         y = HEIGHT - 20
@@ -212,12 +217,13 @@ def reshape(w, h):
     glMatrixMode(GL_MODELVIEW)
 
 def keyboard(key, x, y):
-    global AP_COUNT, SHOW_HEATMAP, USE_MPCA, show_instructions
+    global AP_COUNT, SHOW_HEATMAP, SHOW_WALLS, USE_MPCA, show_instructions
     k = key.decode('utf-8') if isinstance(key, bytes) else key
     if k == ' ': generate_aps(AP_COUNT)
     elif k == '+': AP_COUNT+=1; generate_aps(AP_COUNT)
     elif k == '-': AP_COUNT=max(1,AP_COUNT-1); generate_aps(AP_COUNT)
     elif k in ('h','H'): SHOW_HEATMAP=not SHOW_HEATMAP
+    elif k in ('g','G'): SHOW_WALLS=not SHOW_WALLS; update_walls()
     elif k in ('m','M'): USE_MPCA=not USE_MPCA
     elif k in ('i','I'): show_instructions=not show_instructions
     elif k in ('q','Q','\x1b'): glutLeaveMainLoop()
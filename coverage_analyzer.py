@@ -7,9 +7,22 @@ Uses the Mid-Point Circle Algorithm (MPCA) for rendering all circular visuals.
 Features:
 - Multiple Access Points (APs) with radius visualized using MPCA
 - Real-screen coordinates (0..WIDTH, 0..HEIGHT)
-- Simple channel assignment heuristic to reduce interference
-- Toggleable interference heatmap (alpha-blended concentric circles)
-- Keyboard controls: Space=regen APs, +/- = change AP count, H=toggle heatmap, M=toggle MPCA/poly, I=toggle instructions
+- Channel planning (DSATUR + annealing over the AP overlap graph) to reduce interference
+- Toggleable interference heatmap: per-pixel SINR field (one texture), quadtree-tiled multi-resolution
+  SINR tiles (computed lazily per zoom level, LRU-cached) or alpha-blended filled MPCA annulus bands
+- Pan (arrow keys) and zoom (mouse wheel over empty floor, 0 = reset view)
+- Mouse editing: drag an AP to move it, click empty floor to add one, right-click to remove, wheel to resize
+  (channels and heatmap are only updated around the edited AP)
+- Client stations (C): a clustered population associates to the strongest AP; per-AP station count and
+  airtime, co-channel medium load and uncovered clients are shown (station_sim.py)
+- Coverage stats panel (P): % area covered, k-coverage and co-channel overlap, counted with
+  packed uint64 bitsets of the MPCA disks (coverage_bits.py)
+- Placement optimizer (O): greedy set cover, k-means and annealing restarts on all cores (ap_placement.py)
+- AP layouts loaded from / written to CSV, JSON-lines or .npy files (ap_layout.py, streamed in chunks)
+- Walls (G): a floor plan from a PNG or .npy material raster (WALL_FILE, else a sample office) attenuates
+  coverage per material along rays from every AP (obstacle_loss.py); B toggles a concrete pillar at the cursor
+- Keyboard controls: Space=regen APs, +/- = add/remove an AP, H=toggle heatmap, N=SINR/band heatmap, T=tiled heatmap,
+  C=client stations, P=stats panel, G=walls, B=pillar, O=optimize placement, L/W = load/write LAYOUT_FILE, M=toggle MPCA/poly, I=toggle instructions
 - Fake resource usage bar for visual effect (no external packages)
 
 Dependencies:
@@ -18,6 +31,9 @@ Dependencies:
 
 Run:
     python3 coverage_analyzer.py
+    python3 coverage_analyzer.py --layout site.csv
+    python3 coverage_analyzer.py --walls floor.png
+    python3 coverage_analyzer.py --headless 100 [--dump frames/] [--seed 1]
 
 """
 
@@ -25,186 +41,333 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
+import os
 import random
+import sys
+import time
 import numpy as np
+import ap_layout
+import ap_placement
+import channel_planner
+import render_backend
+import station_sim
+import coverage_bits
+import coverage_model
+import coverage_tiles
+import obstacle_loss
+import sinr_heatmap
 
 # ------------------------ Configuration ------------------------
 WIDTH, HEIGHT = 900, 700
 AP_COUNT = 10
 MIN_RADIUS = 60
 MAX_RADIUS = 220
-CHANNELS = [1, 6, 11]
+CHANNELS = channel_planner.TWO_GHZ_CHANNELS  # or channel_planner.FIVE_GHZ_CHANNELS
+PLAN_BUDGET_MS = 50  # time budget of the channel planner's annealing
 SHOW_HEATMAP = True
+SINR_HEATMAP = True  # per-pixel SINR field instead of the MPCA band heatmap
+TILED_HEATMAP = False  # SINR field as quadtree tiles at the zoom level's resolution
+TILE_CACHE_DIR = None  # e.g. '.coverage_tiles' to keep computed tiles on disk
+LAYOUT_FILE = 'ap_layout.csv'  # L/W keys; .csv, .jsonl or .npy
+OPT_TARGET = 0.95  # coverage the placement optimizer aims for
+OPT_RESTARTS = 4
+SHOW_STATIONS = False
+SHOW_STATS = True
+STATION_COUNT = 2000
+SHOW_WALLS = False
+WALL_FILE = 'walls.png'  # G key; .png or .npy, the sample office floor when missing
+PILLAR = 12  # side of the pillar B places
+WALL_BUDGET_MS = 100  # per frame, for marching the rays of APs new to the wall view
 USE_MPCA = True
 
 # state
 aps = []
+backend = None  # render_backend.GLBackend, or SoftwareBackend when run headless
+model = None  # coverage_model.CoverageModel: APs, channel plan and SINR heatmap
+dragged = None  # id of the AP being moved with the mouse
+tiles = None  # coverage_tiles.CoverageTiles of the current site
+stations = None  # station_sim.StationSim, created when first shown
+station_stats = None  # StationSim.stats() of the current layout
+coverage = None  # coverage_bits.CoverageBits of the current APs
+coverage_stats = None  # CoverageBits.stats()
+view_x, view_y, zoom = 0.0, 0.0, 1.0  # world point at the window's bottom-left, pixels per unit
 show_instructions = True
 frame_counter = 0
-
-# ---------------- Mid-Point Circle Algorithm ------------------
-def midpoint_circle_points(xc, yc, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    pts = []
-    while x >= y:
-        pts.extend([
-            (xc + x, yc + y), (xc - x, yc + y),
-            (xc + x, yc - y), (xc - x, yc - y),
-            (xc + y, yc + x), (xc - y, yc + x),
-            (xc + y, yc - x), (xc - y, yc - x),
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    unique = []
-    s = set()
-    for px, py in pts:
-        ix, iy = int(round(px)), int(round(py))
-        if (ix, iy) not in s and 0 <= ix < WIDTH and 0 <= iy < HEIGHT:
-            unique.append((ix, iy))
-            s.add((ix, iy))
-    return unique
+layout_arg = None  # --layout file to start from instead of random APs
+obstacles = None  # obstacle_loss.ObstacleMap of the loaded floor plan
+wall_rgba = None  # walls as an image, and the wall-attenuated SINR heatmap
+wall_heat = None
+wall_heat_version = 0
+wall_covered = 0.0  # area fraction covered with wall loss
+wall_pending = 0  # APs still to march before the wall heatmap is rebuilt
 
 # -------------- Utility: draw circle -------------
-def draw_circle_mpca(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5)):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glPointSize(1)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(int(round(xc)), int(round(yc)), int(round(radius))):
-        glVertex2i(x, y)
-    glEnd()
-
 def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=64):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glBegin(GL_TRIANGLE_FAN)
-    glVertex2f(xc, yc)
-    for i in range(segments + 1):
-        theta = 2.0 * math.pi * float(i) / float(segments)
-        x = xc + math.cos(theta) * radius
-        y = yc + math.sin(theta) * radius
-        glVertex2f(x, y)
-    glEnd()
-
-# -------------------- Interference / Channel Heuristic --------------------
-def interference_score(x, y, radius, channel, other_aps):
-    score = 0.0
-    for ap in other_aps:
-        d = math.hypot(x - ap['x'], y - ap['y'])
-        if d < (radius + ap['radius']):
-            overlap_factor = (radius + ap['radius'] - d)
-            chan_penalty = 1.0 if channel == ap['channel'] else 0.4
-            score += overlap_factor * chan_penalty
-    return score
-
-def assign_channels(aps_list):
-    for i, ap in enumerate(aps_list):
-        best_c = CHANNELS[0]
-        best_score = float('inf')
-        for ch in CHANNELS:
-            ap['channel'] = ch
-            s = interference_score(ap['x'], ap['y'], ap['radius'], ch, aps_list[:i])
-            if s < best_score:
-                best_score = s
-                best_c = ch
-        ap['channel'] = best_c
-
-# -------------------- Generate APs --------------------
-def generate_aps(count=AP_COUNT):
-    global aps
-    aps = []
+    backend.polygon(render_backend.circle_polygon(xc, yc, radius, segments), color)
+
+# -------------------- Generate / Edit APs --------------------
+def sync_aps():
+    # Dict view of the model's APs for the drawing code
+    global aps, AP_COUNT
+    x, y, radius, channel = model.arrays()
+    aps = [{'id': i, 'x': xi, 'y': yi, 'radius': ri, 'channel': ch}
+           for i, xi, yi, ri, ch in zip(model.ids().tolist(), x.tolist(), y.tolist(), radius.tolist(), channel.tolist())]
+    AP_COUNT = len(aps)
+    update_stations()
+    update_coverage_stats()
+    update_walls()
+
+def update_coverage_stats():
+    # Only the masks of added / moved / resized APs are rasterized again
+    global coverage, coverage_stats
+    if not SHOW_STATS:
+        return
+    if coverage is None or (coverage.width, coverage.height) != (WIDTH, HEIGHT):
+        coverage = coverage_bits.CoverageBits(WIDTH, HEIGHT)
+    coverage.set_aps(model.ids(), *model.arrays())
+    coverage_stats = coverage.stats()
+
+def load_walls(path=None):
+    # The raster is stretched over the window width
+    global obstacles, wall_rgba
+    walls = obstacle_loss.load_walls(path) if path and os.path.exists(path) else obstacle_loss.demo_walls(WIDTH, HEIGHT)
+    obstacles = obstacle_loss.ObstacleMap(walls, WIDTH / walls.shape[1])
+    wall_rgba = obstacles.rgba()
+
+def update_walls():
+    # Only APs that moved march their rays again (a painted pillar re-marches
+    # the rays through it in paint()). New APs are marched within
+    # WALL_BUDGET_MS per frame; display() calls back until none is left.
+    global wall_heat, wall_heat_version, wall_covered, wall_pending
+    if not SHOW_WALLS:
+        return
+    if obstacles is None:
+        load_walls(WALL_FILE)
+    ids = model.ids()
+    x, y, radius, channel = model.arrays()
+    pending = obstacles.pending(ids, x, y, radius)
+    deadline = time.perf_counter() + WALL_BUDGET_MS / 1000.0
+    wall_pending = len(pending)
+    for k in pending:
+        obstacles.signal(ids[k], x[k], y[k], radius[k])
+        wall_pending -= 1
+        if time.perf_counter() > deadline:
+            break
+    if wall_pending:
+        return
+    best, sinr = obstacles.field(ids, x, y, radius, channel)
+    with np.errstate(divide='ignore'):
+        wall_heat = sinr_heatmap.colorize(sinr_heatmap.EDGE_DBM + 10.0 * np.log10(best), sinr)
+    wall_heat_version += 1
+    wall_covered = float((best >= 1.0).mean())
+
+def toggle_pillar(wx, wy):
+    global wall_rgba
+    c = obstacles.cell
+    col, row = int(wx // c), int(wy // c)
+    if not (0 <= col < obstacles.width and 0 <= row < obstacles.height):
+        return
+    material = 0 if obstacles.walls[row, col] else obstacle_loss.CONCRETE
+    obstacles.paint(wx - PILLAR / 2, wy - PILLAR / 2, wx + PILLAR / 2, wy + PILLAR / 2, material)
+    wall_rgba = obstacles.rgba()
+    update_walls()
+
+def update_stations():
+    # Re-associate the stations around edited APs and refresh the per-AP load
+    global stations, station_stats
+    if not SHOW_STATIONS:
+        return
+    if stations is None:
+        stations = station_sim.StationSim(*station_sim.generate_stations(STATION_COUNT, WIDTH, HEIGHT))
+    stations.update(model.grid)
+    station_stats = stations.stats(model.grid, model.planner.chan)
+
+def random_ap():
     margin = 30
-    for _ in range(count):
-        radius = random.uniform(MIN_RADIUS, MAX_RADIUS)
-        x = random.uniform(margin + radius, WIDTH - margin - radius)
-        y = random.uniform(margin + radius, HEIGHT - margin - radius)
-        aps.append({'x': x, 'y': y, 'radius': radius, 'channel': random.choice(CHANNELS)})
-    assign_channels(aps)
+    radius = random.uniform(MIN_RADIUS, MAX_RADIUS)
+    x = random.uniform(margin + radius, WIDTH - margin - radius)
+    y = random.uniform(margin + radius, HEIGHT - margin - radius)
+    return x, y, radius
+
+def generate_aps(count=AP_COUNT):
+    global model
+    x, y, radius = np.array([random_ap() for _ in range(count)], dtype=np.float64).reshape(-1, 3).T
+    # Channels are planned by DSATUR + annealing over the AP overlap graph
+    # (channel_planner.py); later edits only re-plan their neighbourhood
+    model = coverage_model.CoverageModel.from_aps(WIDTH, HEIGHT, x, y, radius, CHANNELS, MAX_RADIUS, PLAN_BUDGET_MS)
+    sync_aps()
+
+def load_aps(path):
+    # Channels from the file are kept when they are all in CHANNELS, else re-planned
+    global model
+    layout = ap_layout.load_layout(path)
+    max_radius = max(MAX_RADIUS, float(layout['radius'].max())) if len(layout) else MAX_RADIUS
+    model = coverage_model.CoverageModel.from_aps(WIDTH, HEIGHT, layout['x'], layout['y'], layout['radius'], CHANNELS,
+                                                  max_radius, PLAN_BUDGET_MS, channel=layout['channel'])
+    sync_aps()
+
+def optimize_aps():
+    # Replace the layout with the best of OPT_RESTARTS optimizer runs over the window floor
+    global model
+    floor = ap_placement.rectangle_floor(WIDTH, HEIGHT)
+    x, y, radius, channel, cost, cover = ap_placement.optimize_placement(floor, OPT_TARGET, OPT_RESTARTS, channels=CHANNELS)
+    model = coverage_model.CoverageModel.from_aps(WIDTH, HEIGHT, x, y, radius, CHANNELS, MAX_RADIUS, PLAN_BUDGET_MS,
+                                                  channel=channel)
+    sync_aps()
+    print(f"Placement: {len(x)} APs, coverage {cover:.1%}, cost {cost:.2f}")
+
+def save_aps(path):
+    ap_layout.save_layout(path, ap_layout.from_arrays(*model.arrays()))
 
 # -------------------- Rendering --------------------
+CHANNEL_PALETTE = [(0.2, 0.6, 1.0), (0.4, 1.0, 0.2), (1.0, 0.6, 0.2), (0.9, 0.3, 0.9), (1.0, 1.0, 0.3), (0.3, 1.0, 0.9)]
+
+def heatmap_color(channel, alpha):
+    return CHANNEL_PALETTE[CHANNELS.index(channel) % len(CHANNEL_PALETTE)] + (alpha,)
+
+def draw_tiles():
+    # Only the tiles in view, at the level matching the zoom; edits drop just
+    # the cached tiles within reach of the changed APs
+    global tiles
+    if tiles is None or (tiles.width, tiles.height) != (WIDTH, HEIGHT):
+        tiles = coverage_tiles.CoverageTiles(WIDTH, HEIGHT, cache_dir=TILE_CACHE_DIR)
+    tiles.set_aps(*model.arrays())
+    left, right, bottom, top = view_rect()
+    for slot, version, rgba, x, y, units in tiles.visible(left, bottom, right, top, zoom):
+        backend.image('tile%d' % slot, rgba, x, y, version, None, units)
+
 def draw_heatmap():
+    if SHOW_WALLS:
+        if wall_heat is not None:
+            backend.image('walls_sinr', wall_heat, 0, 0, wall_heat_version, None, obstacles.cell)
+        return
+    if TILED_HEATMAP:
+        draw_tiles()
+        return
+    if SINR_HEATMAP:
+        # Per-pixel SINR of the AP set as one texture; edits update the field
+        # incrementally and only the changed box is re-uploaded
+        model.set_size(WIDTH, HEIGHT)
+        heat = model.heatmap
+        backend.image('sinr', heat.rgba, 0, 0, heat.version, heat.take_dirty())
+        return
+
+    rings = 8
+    if not USE_MPCA:
+        for ap in aps:
+            for i in range(rings, 0, -1):
+                frac = i / rings
+                draw_circle_poly(ap['x'], ap['y'], ap['radius'] * frac, heatmap_color(ap['channel'], 0.18 * frac))
+        return
+
+    # Each AP is filled with `rings` gapless MPCA annulus bands; all bands of all
+    # APs are retained by the backend (one span VBO under OpenGL) and only
+    # re-rasterized when the APs or the window size change
+    bands, colors = [], []
     for ap in aps:
-        cx, cy, r = ap['x'], ap['y'], ap['radius']
-        rings = 8
         for i in range(rings, 0, -1):
-            frac = i / rings
-            alpha = 0.18 * frac
-            if ap['channel'] == CHANNELS[0]: color = (0.2, 0.6, 1.0, alpha)
-            elif ap['channel'] == CHANNELS[1]: color = (0.4, 1.0, 0.2, alpha)
-            else: color = (1.0, 0.6, 0.2, alpha)
-            if USE_MPCA:
-                draw_circle_mpca(cx, cy, r * frac, color)
-            else:
-                draw_circle_poly(cx, cy, r * frac, color)
+            inner = round(ap['radius'] * (i - 1) / rings) + 1 if i > 1 else 0
+            bands.append((ap['x'], ap['y'], inner, round(ap['radius'] * i / rings)))
+            colors.append(heatmap_color(ap['channel'], 0.18 * i / rings))
+    backend.annuli('heatmap', bands, colors, WIDTH, HEIGHT)
+
+STATION_UNCOVERED = (1.0, 0.2, 0.2)
+
+def draw_stations():
+    # One point per station in its AP's channel colour, uncovered ones in red
+    palette = np.array(CHANNEL_PALETTE + [STATION_UNCOVERED])
+    served = stations.ap >= 0
+    index = np.full(len(stations), len(CHANNEL_PALETTE))
+    index[served] = model.planner.chan[stations.ap[served]] % len(CHANNEL_PALETTE)
+    colors = np.concatenate([palette[index], np.full((len(stations), 1), 0.6)], axis=1)
+    backend.points(np.stack([stations.x, stations.y], axis=1), colors, 2)
 
 def draw_aps():
-    glPointSize(6)
-    glBegin(GL_POINTS)
-    for ap in aps:
-        if ap['channel'] == CHANNELS[0]: glColor3f(0.2, 0.6, 1.0)
-        elif ap['channel'] == CHANNELS[1]: glColor3f(0.4, 1.0, 0.2)
-        else: glColor3f(1.0, 0.6, 0.2)
-        glVertex2f(ap['x'], ap['y'])
-    glEnd()
-
-    for ap in aps:
-        color = (0.8, 0.8, 0.8, 0.9)
-        if USE_MPCA: draw_circle_mpca(ap['x'], ap['y'], ap['radius'], color)
-        else: draw_circle_poly(ap['x'], ap['y'], ap['radius'], color)
-    glColor3f(1.0, 1.0, 1.0)
+    if aps:
+        backend.points([(ap['x'], ap['y']) for ap in aps],
+                       [heatmap_color(ap['channel'], 1.0) for ap in aps], 6)
+
+    color = (0.8, 0.8, 0.8, 0.9)
+    if USE_MPCA:
+        # Every outline in one retained batch, re-rasterized only when an AP changes
+        backend.circles('ap_rings', [(ap['x'], ap['y'], ap['radius']) for ap in aps], color,
+                        WIDTH, HEIGHT, point_size=max(1, int(round(zoom))))
+    else:
+        for ap in aps: draw_circle_poly(ap['x'], ap['y'], ap['radius'], color)
     for ap in aps: draw_text(int(ap['x']) + 6, int(ap['y']) + 6, f"CH:{ap['channel']}")
+    if SHOW_STATIONS:
+        for ap in aps:
+            i = ap['id']
+            draw_text(int(ap['x']) + 6, int(ap['y']) - 8,
+                      f"{station_stats['stations'][i]} sta  air {station_stats['airtime'][i]:.0%}  medium {station_stats['medium'][i]:.0%}",
+                      (0.8, 0.8, 0.8))
 
 # -------------------- Text helper --------------------
-def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_12):
-    glRasterPos2i(x, y)
-    for ch in text: glutBitmapCharacter(font, ord(ch))
+def draw_text(x, y, text, color=(1.0, 1.0, 1.0), font=GLUT_BITMAP_HELVETICA_12):
+    backend.text(x, y, text, color, font)
+
+# -------------------- View --------------------
+def view_rect():
+    return view_x, view_x + WIDTH / zoom, view_y, view_y + HEIGHT / zoom
+
+def to_world(x, y):
+    # GLUT window coordinates (origin top-left) to world coordinates
+    return view_x + x / zoom, view_y + (HEIGHT - y) / zoom
+
+def zoom_at(x, y, factor):
+    # Zoom about the window point (x, y), keeping it over the same world point
+    global view_x, view_y, zoom
+    wx, wy = to_world(x, y)
+    zoom = min(max(zoom * factor, 1.0 / 64), 4.0)
+    view_x, view_y = wx - x / zoom, wy - (HEIGHT - y) / zoom
 
 # -------------------- Display / Callbacks --------------------
 def display():
     global frame_counter
     frame_counter += 1
+    if SHOW_WALLS and wall_pending: update_walls()
 
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    glLoadIdentity()
+    backend.clear((0.06, 0.06, 0.06, 1.0))
+    backend.set_view(*view_rect())
 
     # grid
-    glColor3f(0.12, 0.12, 0.12)
-    glBegin(GL_LINES)
     step = 50
-    for x in range(0, WIDTH, step): glVertex2f(x,0); glVertex2f(x,HEIGHT)
-    for y in range(0, HEIGHT, step): glVertex2f(0,y); glVertex2f(WIDTH,y)
-    glEnd()
+    grid = [v for x in range(0, WIDTH, step) for v in ((x, 0), (x, HEIGHT))]
+    grid += [v for y in range(0, HEIGHT, step) for v in ((0, y), (WIDTH, y))]
+    backend.lines(grid, (0.12, 0.12, 0.12))
 
     if SHOW_HEATMAP: draw_heatmap()
+    if SHOW_WALLS: backend.image('walls', wall_rgba, 0, 0, obstacles.version, None, obstacles.cell)
+    if SHOW_STATIONS: draw_stations()
     draw_aps()
+    backend.set_view(0, WIDTH, 0, HEIGHT)
 
     # Fake resource usage bar (animated)
     usage = 50 + 30 * math.sin(frame_counter * 0.1)
-    glColor3f(1.0,0.8,0.2)
-    glBegin(GL_QUADS)
-    glVertex2f(10, 20)
-    glVertex2f(10 + usage*2, 20)
-    glVertex2f(10 + usage*2, 25)
-    glVertex2f(10, 25)
-    glEnd()
-    draw_text(10, 28, f"Laptop Resource Bar (simulated)")
+    backend.quads([[(10, 20), (10 + usage*2, 20), (10 + usage*2, 25), (10, 25)]], (1.0, 0.8, 0.2))
+    draw_text(10, 28, f"Laptop Resource Bar (simulated)", (1.0, 0.8, 0.2))
+    if SHOW_STATS:
+        k = coverage_stats['k_coverage']
+        draw_text(10, 60, f"Coverage: {k[0]:.1%}  >=2 APs: {k[1]:.1%}  >=3 APs: {k[2]:.1%}"
+                          f"  co-channel overlap: {coverage_stats['co_channel']:.1%}"
+                          + (f"  with walls: {wall_covered:.1%}" if SHOW_WALLS else "")
+                          + (f"  (marching rays, {wall_pending} APs left)" if SHOW_WALLS and wall_pending else ""),
+                  (0.6, 0.9, 1.0))
+    if SHOW_STATIONS:
+        total = len(stations)
+        busiest = station_stats['medium'][model.ids()].max() if len(aps) else 0.0
+        draw_text(10, 44, f"Stations: {total}  uncovered: {station_stats['uncovered']} ({station_stats['uncovered'] / total:.1%})"
+                          f"  busiest medium: {busiest:.0%}", STATION_UNCOVERED)
 
     if show_instructions:
-        glColor3f(1.0,1.0,1.0)
         lines = [
-            "Controls: Space=regen APs  +/-=change AP count  H=toggle heatmap",
-            "M=toggle MPCA/poly  I=toggle instructions  Q/Esc=quit",
+            "Controls: Space=regen APs  +/-=add/remove AP  H=toggle heatmap  Mouse: drag/add/remove/wheel-resize",
+            "N=SINR/band heatmap  T=tiled heatmap  C=stations  P=stats  G=walls  B=pillar  O=optimize  L/W=load/write layout  Arrows=pan  Wheel=zoom  0=reset view  M=toggle MPCA/poly  I=toggle instructions  Q/Esc=quit",
         ]
         y = HEIGHT - 20
         for ln in lines: draw_text(10, y, ln); y -= 16
 
-    glutSwapBuffers()
+    backend.present()
 
 def reshape(w, h):
     global WIDTH, HEIGHT
@@ -216,27 +379,91 @@ def reshape(w, h):
     glMatrixMode(GL_MODELVIEW)
 
 def keyboard(key, x, y):
-    global AP_COUNT, SHOW_HEATMAP, USE_MPCA, show_instructions
+    global AP_COUNT, SHOW_HEATMAP, SINR_HEATMAP, TILED_HEATMAP, SHOW_STATIONS, SHOW_STATS, SHOW_WALLS, USE_MPCA, show_instructions, view_x, view_y, zoom
     k = key.decode('utf-8') if isinstance(key, bytes) else key
     if k == ' ': generate_aps(AP_COUNT)
-    elif k == '+': AP_COUNT+=1; generate_aps(AP_COUNT)
-    elif k == '-': AP_COUNT=max(1,AP_COUNT-1); generate_aps(AP_COUNT)
+    elif k == '+': model.add_ap(*random_ap()); sync_aps()
+    elif k == '-' and len(aps) > 1: model.remove_ap(aps[-1]['id']); sync_aps()
     elif k in ('h','H'): SHOW_HEATMAP=not SHOW_HEATMAP
+    elif k in ('n','N'): SINR_HEATMAP=not SINR_HEATMAP
+    elif k in ('t','T'): TILED_HEATMAP=not TILED_HEATMAP
+    elif k in ('c','C'): SHOW_STATIONS=not SHOW_STATIONS; update_stations()
+    elif k in ('p','P'): SHOW_STATS=not SHOW_STATS; update_coverage_stats()
+    elif k in ('g','G'): SHOW_WALLS=not SHOW_WALLS; update_walls()
+    elif k in ('b','B') and SHOW_WALLS: toggle_pillar(*to_world(x, y))
+    elif k in ('l','L') and os.path.exists(LAYOUT_FILE): load_aps(LAYOUT_FILE)
+    elif k in ('w','W'): save_aps(LAYOUT_FILE)
+    elif k in ('o','O'): optimize_aps()
+    elif k == '0': view_x, view_y, zoom = 0.0, 0.0, 1.0
     elif k in ('m','M'): USE_MPCA=not USE_MPCA
     elif k in ('i','I'): show_instructions=not show_instructions
     elif k in ('q','Q','\x1b'): glutLeaveMainLoop()
     glutPostRedisplay()
 
+def special(key, x, y):
+    # Arrow keys pan by 50 window pixels
+    global view_x, view_y
+    step = 50 / zoom
+    if key == GLUT_KEY_LEFT: view_x -= step
+    elif key == GLUT_KEY_RIGHT: view_x += step
+    elif key == GLUT_KEY_UP: view_y += step
+    elif key == GLUT_KEY_DOWN: view_y -= step
+    glutPostRedisplay()
+
+def mouse(button, state, x, y):
+    # Left: drag an AP, or add one on empty floor; right: remove;
+    # wheel: resize the AP under the cursor, or zoom over empty floor
+    global dragged
+    wx, wy = to_world(x, y)
+    hit = model.ap_at(wx, wy)
+    if button == GLUT_LEFT_BUTTON:
+        if state == GLUT_DOWN:
+            dragged = hit
+            if hit is None:
+                model.add_ap(wx, wy, random.uniform(MIN_RADIUS, MAX_RADIUS))
+        else:
+            dragged = None
+    elif state == GLUT_DOWN and hit is None and button in (3, 4):
+        zoom_at(x, y, 1.25 if button == 3 else 0.8)
+    elif state == GLUT_DOWN and hit is not None:
+        if button == GLUT_RIGHT_BUTTON and len(aps) > 1:
+            model.remove_ap(hit)
+        elif button in (3, 4):
+            step = 10 if button == 3 else -10
+            model.resize_ap(hit, min(MAX_RADIUS, max(MIN_RADIUS, model.grid.radius[hit] + step)))
+    sync_aps()
+    glutPostRedisplay()
+
+def motion(x, y):
+    if dragged is not None:
+        model.move_ap(dragged, *to_world(x, y))
+        sync_aps()
+        glutPostRedisplay()
+
 def timer(value):
     glutPostRedisplay()
     glutTimerFunc(33, timer, 0)
 
+def start_aps():
+    if layout_arg: load_aps(layout_arg)
+    else: generate_aps(AP_COUNT)
+
+# -------------------- Headless --------------------
+def run_headless(frames, dump_dir=None):
+    """Run the analyzer offscreen into a software framebuffer."""
+    global backend
+    backend = render_backend.SoftwareBackend(WIDTH, HEIGHT)
+    start_aps()
+    render_backend.run_frames(backend, display, frames, dump_dir)
+
 # -------------------- Main --------------------
 def main():
+    global backend
     glutInit()
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGBA | GLUT_ALPHA)
     glutInitWindowSize(WIDTH, HEIGHT)
     glutCreateWindow(b"Coverage Analyzer - MPCA")
+    backend = render_backend.GLBackend()
     glClearColor(0.06, 0.06, 0.06, 1.0)
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
@@ -246,11 +473,14 @@ def main():
     gluOrtho2D(0, WIDTH, 0, HEIGHT)
     glMatrixMode(GL_MODELVIEW)
 
-    generate_aps(AP_COUNT)
+    start_aps()
 
     glutDisplayFunc(display)
     glutReshapeFunc(reshape)
     glutKeyboardFunc(keyboard)
+    glutMouseFunc(mouse)
+    glutMotionFunc(motion)
+    glutSpecialFunc(special)
     glutTimerFunc(33, timer, 0)
     try:
         glutMainLoop()
@@ -258,4 +488,17 @@ def main():
         print('Exiting:', e)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if '--layout' in sys.argv:
+        i = sys.argv.index('--layout')
+        layout_arg = LAYOUT_FILE = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+    if '--walls' in sys.argv:
+        i = sys.argv.index('--walls')
+        WALL_FILE = sys.argv[i + 1]
+        SHOW_WALLS = True
+        del sys.argv[i:i + 2]
+    args = render_backend.parse_headless_args(sys.argv)
+    if args:
+        run_headless(args.headless, args.dump)
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+coverage_bits.py
+
+Coverage statistics over packed bitset masks.
+
+Every AP's filled MPCA coverage disk (mpca.annulus_spans_batch) is turned
+into a bitset: one bit per pixel, 64 pixels per uint64 word, stored only for
+the rows and words of the disk's bounding box. Pixel x of a row is bit x % 64
+of word x // 64. Statistics are then word-wide bitwise operations plus a
+popcount, instead of per-pixel float rasters:
+
+- covered area: OR of all masks
+- k-coverage (area served by at least k APs): "at least j" planes updated per
+  mask as A_j |= A_(j-1) & m, for j = k_max .. 1
+- co-channel overlap: the "at least 2" plane of every channel's masks, ORed
+
+Masks are cached per AP id and only rebuilt for APs that changed.
+
+Dependencies:
+- numpy
+- mpca.py
+"""
+
+import numpy as np
+import mpca
+
+WORD_BITS = 64
+_ALL = np.uint64(0xFFFFFFFFFFFFFFFF)
+_BYTE_COUNTS = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """Number of set bits in a uint64 array."""
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):     # numpy >= 2.0
+        return int(np.bitwise_count(words).sum(dtype=np.int64))
+    return int(_BYTE_COUNTS[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+def _low_bits(n):
+    """uint64 words with the lowest n bits set, n in [0, 64]."""
+    n = np.asarray(n, dtype=np.int64)
+    low = (np.uint64(1) << np.minimum(n, 63).astype(np.uint64)) - np.uint64(1)
+    return np.where(n >= WORD_BITS, _ALL, low)
+
+
+def disk_masks(x, y, radius, width, height):
+    """
+    Bitset masks of the filled MPCA disks (x[i], y[i], radius[i]) clipped to
+    the width x height raster, as a list of (y0, w0, bits) with bits a
+    (rows, words) uint64 block whose top-left is row y0, word w0 (None for a
+    disk entirely outside the raster).
+    """
+    rings = np.stack([x, y, np.zeros(len(x)), radius], axis=1)
+    spans, offsets = mpca.annulus_spans_batch(rings, width, height)
+    counts = np.diff(offsets)
+    owner = np.repeat(np.arange(len(x)), counts)
+    sy, sx0, sx1 = (spans[:, i].astype(np.int64) for i in range(3))
+
+    # Bounding box of every disk in rows and words
+    has = counts > 0
+    y0 = np.full(len(x), 0, dtype=np.int64)
+    y1, w0, w1 = y0.copy(), y0.copy(), y0.copy()
+    starts = offsets[:-1][has]
+    y0[has] = np.minimum.reduceat(sy, starts)
+    y1[has] = np.maximum.reduceat(sy, starts) + 1
+    w0[has] = np.minimum.reduceat(sx0, starts) // WORD_BITS
+    w1[has] = np.maximum.reduceat(sx1, starts) // WORD_BITS + 1
+    rows, words = y1 - y0, w1 - w0
+    sizes = np.where(has, rows * words, 0)
+    base = np.cumsum(sizes) - sizes
+    flat = np.zeros(int(sizes.sum()), dtype=np.uint64)
+
+    # One word per (span, word of its disk's box)
+    per_span = words[owner]
+    span = np.repeat(np.arange(len(spans)), per_span)
+    word = w0[owner[span]] + np.arange(int(per_span.sum())) - np.repeat(np.cumsum(per_span) - per_span, per_span)
+    lo = np.clip(sx0[span] - word * WORD_BITS, 0, WORD_BITS)
+    hi = np.clip(sx1[span] + 1 - word * WORD_BITS, 0, WORD_BITS)
+    bits = _low_bits(hi) & ~_low_bits(lo)
+    o = owner[span]
+    np.bitwise_or.at(flat, base[o] + (sy[span] - y0[o]) * words[o] + (word - w0[o]), bits)
+
+    return [(int(y0[i]), int(w0[i]), flat[base[i]:base[i] + sizes[i]].reshape(rows[i], words[i])) if has[i] else None
+            for i in range(len(x))]
+
+
+class CoverageBits:
+    """Per-AP coverage bitsets of a width x height raster and the statistics over them."""
+
+    def __init__(self, width, height, k_max=3):
+        self.width = width
+        self.height = height
+        self.words = -(-width // WORD_BITS)
+        self.k_max = k_max
+        self.masks = {}      # AP id -> (y0, w0, bits) or None
+        self.channel = {}    # AP id -> channel
+        self._disks = {}     # AP id -> (x, y, radius) its mask was built from
+
+    def set_aps(self, ids, x, y, radius, channel):
+        """Use the APs (ids, x, y, radius, channel); only new or changed disks are rasterized."""
+        ids = np.asarray(ids).tolist()
+        disks = dict(zip(ids, zip(np.asarray(x).tolist(), np.asarray(y).tolist(), np.asarray(radius).tolist())))
+        for i in set(self._disks) - set(disks):
+            del self.masks[i], self._disks[i], self.channel[i]
+        changed = [i for i in ids if self._disks.get(i) != disks[i]]
+        if changed:
+            cx, cy, cr = (np.array(v) for v in zip(*(disks[i] for i in changed)))
+            for i, mask in zip(changed, disk_masks(cx, cy, cr, self.width, self.height)):
+                self.masks[i] = mask
+                self._disks[i] = disks[i]
+        self.channel = dict(zip(ids, np.asarray(channel).tolist()))
+
+    def _planes(self, ids, count):
+        """'At least j' planes (j = 1..count) of the masks of `ids`."""
+        planes = [np.zeros((self.height, self.words), dtype=np.uint64) for _ in range(count)]
+        for i in ids:
+            mask = self.masks[i]
+            if mask is None:
+                continue
+            y0, w0, bits = mask
+            window = (slice(y0, y0 + bits.shape[0]), slice(w0, w0 + bits.shape[1]))
+            for j in range(count - 1, 0, -1):
+                planes[j][window] |= planes[j - 1][window] & bits
+            planes[0][window] |= bits
+        return planes
+
+    def stats(self):
+        """
+        Area fractions of the raster: 'covered', 'k_coverage' (list, index
+        k - 1 = served by at least k APs, k = 1..k_max) and 'co_channel'
+        (served by two or more APs on the same channel).
+        """
+        area = float(self.width * self.height)
+        planes = self._planes(list(self.masks), self.k_max)
+        k_coverage = [popcount(p) / area for p in planes]
+        co = np.zeros((self.height, self.words), dtype=np.uint64)
+        for ch in set(self.channel.values()):
+            co |= self._planes([i for i, c in self.channel.items() if c == ch], 2)[1]
+        return {'covered': k_coverage[0], 'k_coverage': k_coverage, 'co_channel': popcount(co) / area}
@@ -0,0 +1,183 @@
+"""
+coverage_model.py
+
+Editable AP layout with incremental channel planning and heatmap updates.
+
+Before, any change to the APs re-ran generate_aps: every AP was regenerated,
+channels were assigned from scratch and the whole heatmap was recomputed.
+`CoverageModel` keeps the pieces alive between edits instead:
+
+- ap_index.APGrid holds the positions and radii (an AP's id is its grid slot)
+- channel_planner.ChannelPlanner holds the overlap graph and channel plan
+- sinr_heatmap.IncrementalSinr holds the per-pixel field and coloured image
+
+add_ap / move_ap / resize_ap / remove_ap relink only the edited AP in the
+overlap graph and keep every other AP's channel: the edited AP takes its
+cheapest channel, and only it and the neighbours left on the same channel
+are annealed. Removing an AP only lowers its neighbours' interference, so it
+re-plans nothing. The heatmap is updated by taking the edited AP (and any
+neighbour whose channel changed) out of the stored field and putting it back,
+each within its reach rectangle. Only the bounding box of the pixels whose
+colour changed is marked dirty for the texture upload.
+
+Dependencies:
+- numpy
+- ap_index.py, channel_planner.py, sinr_heatmap.py
+"""
+
+import numpy as np
+import ap_index
+import channel_planner
+import sinr_heatmap
+
+EDIT_BUDGET_MS = 5.0       # annealing budget of a neighbourhood re-plan
+
+
+class CoverageModel:
+    """APs, their channel plan and SINR heatmap, updated locally on every edit."""
+
+    def __init__(self, width, height, channels=channel_planner.TWO_GHZ_CHANNELS, max_radius=220.0,
+                 budget_ms=EDIT_BUDGET_MS):
+        self.grid = ap_index.APGrid(2.0 * max_radius)
+        self.planner = channel_planner.ChannelPlanner(channels)
+        self.heatmap = sinr_heatmap.IncrementalSinr(width, height, len(self.planner.channels))
+        self.budget_ms = budget_ms
+
+    @classmethod
+    def from_aps(cls, width, height, x, y, radius, channels=channel_planner.TWO_GHZ_CHANNELS,
+                 max_radius=220.0, budget_ms=50.0, rng=np.random, channel=None):
+        """
+        Plan and render a whole layout at once (ids are 0..n-1). A given
+        `channel` array keeps its channels when they all come from `channels`;
+        otherwise the layout is planned from scratch.
+        """
+        model = cls(width, height, channels, max_radius)
+        model.grid = ap_index.APGrid.from_arrays(x, y, radius, 2.0 * max_radius)
+        planner = model.planner
+        planner.set_graph(len(model.grid.alive), *model.grid.overlap_pairs())
+        if channel is not None and np.isin(channel, planner.channels).all():
+            index = {ch: k for k, ch in enumerate(planner.channels)}
+            for v, ch in enumerate(np.asarray(channel).tolist()):
+                planner.assign(v, index[ch])
+        else:
+            planner.dsatur()
+            planner.anneal(budget_ms, rng=rng)
+        model.refresh()
+        return model
+
+    # ---------------- views ------------------
+    def ids(self):
+        """Ids of the live APs."""
+        return np.flatnonzero(self.grid.alive)
+
+    def __len__(self):
+        return len(self.grid)
+
+    def channel(self, i):
+        return self.planner.channels[self.planner.chan[i]]
+
+    def arrays(self, ids=None):
+        """(x, y, radius, channel) arrays of the APs `ids` (default: all live APs)."""
+        ids = self.ids() if ids is None else ids
+        channels = np.asarray(self.planner.channels)[self.planner.chan[ids]]
+        return self.grid.x[ids], self.grid.y[ids], self.grid.radius[ids], channels
+
+    def ap_at(self, x, y):
+        """Id of the AP closest to (x, y) whose coverage disk contains it, or None."""
+        ids, overlap = self.grid.overlapping(x, y, 0.0)
+        if not len(ids):
+            return None
+        return int(ids[np.argmax(overlap - self.grid.radius[ids])])
+
+    # ---------------- edits ------------------
+    def add_ap(self, x, y, radius):
+        """Add an AP, give it (and its neighbourhood) channels and return its id."""
+        i = self.grid.insert(x, y, radius)
+        self.planner.resize(len(self.grid.alive))
+        self._edited(i)
+        return i
+
+    def move_ap(self, i, x, y):
+        """Move AP i, keeping its id."""
+        self._reshape(i, x, y, self.grid.radius[i])
+
+    def resize_ap(self, i, radius):
+        """Change the coverage radius of AP i."""
+        self._reshape(i, self.grid.x[i], self.grid.y[i], radius)
+
+    def remove_ap(self, i):
+        """Remove AP i; its id may be reused by a later add_ap."""
+        self._unplot(i)
+        self.planner.set_edges(i, [], [])
+        self.planner.assign(i, -1)
+        self.grid.remove(i)
+        self.heatmap.recolor(self.planner.chan)
+
+    def refresh(self):
+        """Rebuild the whole heatmap field from scratch."""
+        heatmap = self.heatmap
+        self.heatmap = sinr_heatmap.IncrementalSinr(heatmap.width, heatmap.height, len(self.planner.channels),
+                                                    heatmap.exponent)
+        self.heatmap.rgba = heatmap.rgba
+        self.heatmap.version = heatmap.version
+        ids = self.ids()
+        self.heatmap.rebuild(ids, self.grid.x[ids], self.grid.y[ids], self.grid.radius[ids], self.planner.chan[ids])
+        self.heatmap.recolor(self.planner.chan)
+
+    def set_size(self, width, height):
+        """Resize the map (e.g. after a window reshape) and re-render it."""
+        if (width, height) != (self.heatmap.width, self.heatmap.height):
+            self.heatmap = sinr_heatmap.IncrementalSinr(width, height, len(self.planner.channels),
+                                                        self.heatmap.exponent)
+            self.refresh()
+
+    # ---------------- incremental updates ------------------
+    def _disk(self, i):
+        return self.grid.x[i], self.grid.y[i], self.grid.radius[i]
+
+    def _reshape(self, i, x, y, radius):
+        self._unplot(i)
+        self.grid.move(i, x, y, radius)
+        self._edited(i)
+
+    def _unplot(self, i):
+        """Take AP i out of the heatmap field, handing its pixels to the other APs."""
+        others = self.ids()
+        others = others[others != i]
+        self.heatmap.remove(i, *self._disk(i), self.planner.chan[i],
+                            (others, self.grid.x[others], self.grid.y[others], self.grid.radius[others]))
+
+    def _edited(self, i):
+        """Relink AP i in the overlap graph, re-plan its conflicts and update the heatmap."""
+        nbrs, overlap = self.grid.overlapping(*self._disk(i), exclude=i)
+        self.planner.set_edges(i, nbrs, overlap)
+        changed, old = self._replan(i)
+        keep = changed != i
+        self._rechannel(changed[keep], old[keep])
+        self.heatmap.add(i, *self._disk(i), self.planner.chan[i])
+        self.heatmap.recolor(self.planner.chan)
+
+    def _replan(self, i):
+        """
+        Give AP i its cheapest channel, keeping every other AP's, then anneal
+        i with the neighbours still on its channel. Returns the vertices whose
+        channel changed and their previous channel indices.
+        """
+        planner = self.planner
+        old = planner.chan[i]
+        c = int(np.argmin(planner.conflict[i]))
+        if old < 0 or planner.delta(i, c) < 0.0:
+            planner.assign(i, c)
+        nbrs = planner.nbr[i]
+        vertices = np.concatenate([[i], nbrs[planner.chan[nbrs] == planner.chan[i]]]).astype(np.int64)
+        before = planner.chan[vertices].copy()
+        before[0] = old
+        if len(vertices) > 1:
+            planner.anneal(self.budget_ms, 50 * len(vertices), vertices)
+        moved = planner.chan[vertices] != before
+        return vertices[moved], before[moved]
+
+    def _rechannel(self, changed, old):
+        """Move re-planned neighbours to their new channel in the heatmap field."""
+        for j, c in zip(changed.tolist(), old.tolist()):
+            self.heatmap.rechannel(*self._disk(j), c, self.planner.chan[j])
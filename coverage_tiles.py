@@ -0,0 +1,231 @@
+"""
+coverage_tiles.py
+
+Quadtree-tiled, multi-resolution SINR coverage raster.
+
+The analyzer renders its heatmap at one pixel per unit over the window, so a
+site larger than the window cannot be shown and a campus-sized one would be
+computed in full before anything is drawn. `CoverageTiles` splits the site
+into a quadtree of TILE_SIZE x TILE_SIZE tiles instead:
+
+- level 0 is one tile over the whole site; every level halves the units per
+  pixel, and `base_level` is the level at one unit per pixel
+- a tile is only computed when a view asks for it, at the level that matches
+  the view's zoom (sinr_heatmap.sinr_field in blocks of BLOCK pixels, each
+  block only summing the APs within REACH_RADII of their radius, found
+  through an ap_index.APGrid, so a tile costs the same whatever the site size)
+- tiles are kept in an LRU cache of `cache_tiles` entries; each cached tile
+  owns a texture slot, so a renderer needs at most `cache_tiles` textures
+- with a `cache_dir`, computed tiles are written as .npy files and read back
+  memory-mapped, so a revisited (or reopened) site is not recomputed
+- `set_aps` diffs the new layout against the old one and only drops the
+  tiles (in memory and on disk) within reach of the APs that changed
+
+Dependencies:
+- numpy
+- ap_index.py, sinr_heatmap.py
+"""
+
+import hashlib
+import math
+import os
+from collections import OrderedDict
+import numpy as np
+import ap_index
+import sinr_heatmap
+
+TILE_SIZE = 256
+BLOCK = 64                 # pixels per side of a tile's AP-selection block
+CACHE_TILES = 128
+REACH_RADII = 6.0          # APs further than this many radii are below the noise floor
+ZOOM_IN_LEVELS = 2         # levels past one unit per pixel (up to 4 pixels per unit)
+
+
+class CoverageTiles:
+    """Lazily computed, LRU-cached coverage tiles of a width x height site."""
+
+    def __init__(self, width, height, tile_size=TILE_SIZE, cache_tiles=CACHE_TILES, cache_dir=None,
+                 exponent=sinr_heatmap.PATH_LOSS_EXPONENT):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.base_level = max(0, int(math.ceil(math.log2(max(width, height) / tile_size))))
+        self.max_level = self.base_level + ZOOM_IN_LEVELS
+        self.exponent = exponent
+        self.cache_tiles = cache_tiles
+        self.cache_dir = cache_dir
+        self.tiles = OrderedDict()   # (level, tx, ty) -> (slot, version, rgba), least recently used first
+        self._free_slots = list(range(cache_tiles - 1, -1, -1))
+        self.grid = ap_index.APGrid(1.0)
+        self.channel = np.zeros(0)
+        self._layout = None          # set of (x, y, radius, channel) rows
+        self.computed = 0
+        self.loaded = 0
+        self._version = 0            # bumped for every tile entering the cache
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # ---------------- layout ------------------
+    def set_aps(self, x, y, radius, channel):
+        """
+        Use the APs (x, y, radius, channel). Cached tiles stay valid except
+        those within reach of an AP that was added, moved, resized,
+        re-channelled or removed.
+        """
+        x, y, radius = (np.asarray(a, dtype=np.float64) for a in (x, y, radius))
+        channel = np.asarray(channel)
+        layout = set(zip(x.tolist(), y.tolist(), radius.tolist(), channel.tolist()))
+        if layout == self._layout:
+            return
+        if self._layout is None:
+            self._check_disk(x, y, radius, channel)
+        else:
+            for ax, ay, ar, _ in layout.symmetric_difference(self._layout):
+                reach = REACH_RADII * ar
+                self.invalidate(ax - reach, ay - reach, ax + reach, ay + reach)
+        self.grid = ap_index.APGrid.from_arrays(x, y, radius, 2.0 * REACH_RADII * (radius.max() if len(radius) else 1.0))
+        self.channel = channel
+        self._layout = layout
+        if self.cache_dir:
+            with open(os.path.join(self.cache_dir, 'layout.sha1'), 'w') as f:
+                f.write(_digest(x, y, radius, channel))
+
+    def _check_disk(self, x, y, radius, channel):
+        """Drop tiles on disk that were computed for a different layout."""
+        if not self.cache_dir:
+            return
+        path = os.path.join(self.cache_dir, 'layout.sha1')
+        if os.path.exists(path):
+            with open(path) as f:
+                if f.read().strip() == _digest(x, y, radius, channel):
+                    return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npy'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def invalidate(self, x0, y0, x1, y1):
+        """Drop every tile, at every level, that intersects the rectangle [x0, x1] x [y0, y1]."""
+        for level in range(self.max_level + 1):
+            span = self.tile_span(level)
+            for tx in range(max(int(x0 // span), 0), int(x1 // span) + 1):
+                for ty in range(max(int(y0 // span), 0), int(y1 // span) + 1):
+                    key = (level, tx, ty)
+                    cached = self.tiles.pop(key, None)
+                    if cached is not None:
+                        self._free_slots.append(cached[0])
+                    if self.cache_dir:
+                        path = self._path(key)
+                        if os.path.exists(path):
+                            os.remove(path)
+
+    # ---------------- geometry ------------------
+    def units_per_pixel(self, level):
+        return 2.0 ** (self.base_level - level)
+
+    def tile_span(self, level):
+        """Side of a tile of `level` in site units."""
+        return self.tile_size * self.units_per_pixel(level)
+
+    def level_for(self, pixels_per_unit):
+        """Coarsest level with at least one tile pixel per screen pixel."""
+        level = self.base_level + int(math.ceil(math.log2(pixels_per_unit) - 1e-9))
+        return min(max(level, 0), self.max_level)
+
+    def visible(self, x0, y0, x1, y1, pixels_per_unit):
+        """
+        Tiles covering the view rectangle [x0, x1] x [y0, y1] at the level for
+        `pixels_per_unit`, as (slot, version, rgba, x, y, units_per_pixel)
+        with (x, y) the tile's bottom-left corner; `version` changes whenever
+        a slot holds a different image. Missing tiles are computed.
+        """
+        level = self.level_for(pixels_per_unit)
+        span = self.tile_span(level)
+        count = 2 ** level
+        out = []
+        for ty in range(max(int(y0 // span), 0), min(int(math.ceil(y1 / span)), count)):
+            for tx in range(max(int(x0 // span), 0), min(int(math.ceil(x1 / span)), count)):
+                if tx * span >= self.width or ty * span >= self.height:
+                    continue
+                slot, version, rgba = self.tile(level, tx, ty)
+                out.append((slot, version, rgba, tx * span, ty * span, self.units_per_pixel(level)))
+        return out
+
+    # ---------------- cache ------------------
+    def tile(self, level, tx, ty):
+        """(texture slot, version, RGBA image) of a tile, from memory, disk or computed."""
+        key = (level, tx, ty)
+        cached = self.tiles.get(key)
+        if cached is not None:
+            self.tiles.move_to_end(key)
+            return cached
+        rgba = self._load(key)
+        if rgba is None:
+            rgba = self._compute(level, tx, ty)
+            self.computed += 1
+            rgba = self._store(key, rgba)
+        else:
+            self.loaded += 1
+        if not self._free_slots:
+            _, (slot, _, _) = self.tiles.popitem(last=False)
+            self._free_slots.append(slot)
+        self._version += 1
+        cached = self.tiles[key] = (self._free_slots.pop(), self._version, rgba)
+        return cached
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, 'tile_%d_%d_%d.npy' % key)
+
+    def _load(self, key):
+        if not self.cache_dir or not os.path.exists(self._path(key)):
+            return None
+        return np.load(self._path(key), mmap_mode='r')
+
+    def _store(self, key, rgba):
+        """Write a tile as a .npy file and return it memory-mapped (or as is without a cache_dir)."""
+        if not self.cache_dir:
+            return rgba
+        mapped = np.lib.format.open_memmap(self._path(key), mode='w+', dtype=np.uint8, shape=rgba.shape)
+        mapped[:] = rgba
+        mapped.flush()
+        return mapped
+
+    # ---------------- rendering ------------------
+    def _compute(self, level, tx, ty):
+        """RGBA image of one tile; pixels outside the site are transparent."""
+        size = self.tile_size
+        upp = self.units_per_pixel(level)
+        span = size * upp
+        ox, oy = tx * span, ty * span
+        rgba = np.zeros((size, size, 4), dtype=np.uint8)
+        grid = self.grid
+        block = min(BLOCK, size)
+        for by in range(0, size, block):
+            for bx in range(0, size, block):
+                # Block rectangle in site units, and the APs that reach it
+                x0, y0 = ox + bx * upp, oy + by * upp
+                x1, y1 = x0 + block * upp, y0 + block * upp
+                if x0 >= self.width or y0 >= self.height:
+                    continue
+                cx, cy = 0.5 * (x0 + x1), 0.5 * (y0 + y1)
+                ids = grid.candidates(cx, cy, 0.5 * math.hypot(x1 - x0, y1 - y0) + REACH_RADII * grid.max_radius)
+                if len(ids):
+                    gap = np.hypot(np.maximum(np.abs(grid.x[ids] - cx) - 0.5 * (x1 - x0), 0.0),
+                                   np.maximum(np.abs(grid.y[ids] - cy) - 0.5 * (y1 - y0), 0.0))
+                    ids = ids[gap < REACH_RADII * grid.radius[ids]]
+                best, sinr = sinr_heatmap.sinr_field(
+                    (grid.x[ids] - ox) / upp, (grid.y[ids] - oy) / upp, grid.radius[ids] / upp, self.channel[ids],
+                    size, size, (bx, by, bx + block, by + block), self.exponent)
+                rgba[by:by + block, bx:bx + block] = sinr_heatmap.colorize(best, sinr)
+        # Clip to the site rectangle
+        inside_x = int(math.ceil((self.width - ox) / upp))
+        inside_y = int(math.ceil((self.height - oy) / upp))
+        rgba[:, max(inside_x, 0):, 3] = 0
+        rgba[max(inside_y, 0):, :, 3] = 0
+        return rgba
+
+
+def _digest(x, y, radius, channel):
+    """Order-independent fingerprint of an AP layout."""
+    rows = np.stack([np.asarray(a, dtype=np.float64) for a in (x, y, radius, channel)], axis=1)
+    rows = rows[np.lexsort(rows.T[::-1])] if len(rows) else rows
+    return hashlib.sha1(np.ascontiguousarray(rows).tobytes()).hexdigest()
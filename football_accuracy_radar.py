@@ -11,7 +11,8 @@ Features:
 - Accuracy radar showing hit/miss positions
 - Multiple shot simulation
 - Keyboard controls: Space=kick ball, R=reset, I=toggle instructions
-- Self-contained Python + PyOpenGL code
+- Python + PyOpenGL + NumPy (circles rasterized by the shared mpca.py module and
+  drawn from retained vertex buffers, mpca_gl.py)
 
 Run:
     python3 football_accuracy_radar.py
@@ -23,6 +24,7 @@ from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
 import random
+import mpca_gl
 
 # ---------------- Configuration ----------------
 WIDTH, HEIGHT = 900, 600
@@ -40,44 +42,10 @@ ball_target = [WIDTH/2, HEIGHT - GOAL_HEIGHT]
 ball_in_motion = False
 shots = []  # stores (x, y) positions of ball hits
 frame_counter = 0
-
-# ---------------- Mid-Point Circle Algorithm ----------------
-def midpoint_circle_points(xc, yc, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    pts = []
-    while x >= y:
-        pts.extend([
-            (xc + x, yc + y), (xc - x, yc + y),
-            (xc + x, yc - y), (xc - x, yc - y),
-            (xc + y, yc + x), (xc - y, yc + x),
-            (xc + y, yc - x), (xc - y, yc - x),
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    unique = []
-    s = set()
-    for px, py in pts:
-        ix, iy = int(round(px)), int(round(py))
-        if (ix, iy) not in s and 0 <= ix < WIDTH and 0 <= iy < HEIGHT:
-            unique.append((ix, iy))
-            s.add((ix, iy))
-    return unique
+ball_ring = None  # mpca_gl.CircleBatch of the ball, re-uploaded only when it moves
+shot_rings = None  # mpca_gl.CircleBatch of the shot markers
 
 # ---------------- Draw Helpers ----------------
-def draw_circle_mpca(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5)):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(int(round(xc)), int(round(yc)), int(round(radius))):
-        glVertex2i(x, y)
-    glEnd()
-
 def draw_rectangle(xc, yc, width, height, color=(0.0, 0.0, 1.0)):
     r, g, b = color
     glColor3f(r, g, b)
@@ -105,13 +73,21 @@ def draw_goal():
 
 # ---------------- Draw Ball ----------------
 def draw_ball():
-    glColor3f(1.0, 1.0, 0.0)
-    draw_circle_mpca(ball_pos[0], ball_pos[1], BALL_RADIUS, (1.0, 1.0, 0.0, 1.0))
+    # MPCA outline in a VBO; set_circles skips the upload while the ball rests
+    global ball_ring
+    if ball_ring is None:
+        ball_ring = mpca_gl.CircleBatch()
+    ball_ring.set_circles([(round(ball_pos[0]), round(ball_pos[1]), BALL_RADIUS)], (1.0, 1.0, 0.0, 1.0), WIDTH, HEIGHT)
+    ball_ring.draw(point_size=1)
 
 # ---------------- Draw Radar ----------------
 def draw_radar():
-    for shot in shots:
-        draw_circle_mpca(shot[0], shot[1], 5, (0.0, 1.0, 0.0, 0.7))
+    # Every shot marker in one batch, re-uploaded only when a shot lands
+    global shot_rings
+    if shot_rings is None:
+        shot_rings = mpca_gl.CircleBatch()
+    shot_rings.set_circles([(round(x), round(y), 5) for x, y in shots], (0.0, 1.0, 0.0, 0.7), WIDTH, HEIGHT)
+    shot_rings.draw(point_size=1)
 
 # ---------------- Update Ball ----------------
 def update_ball():
@@ -0,0 +1,290 @@
+"""
+mpca.py
+
+Shared Mid-Point Circle Algorithm (MPCA) rasterizer used by the simulations.
+
+Every scene used to carry its own copy of `midpoint_circle_points`, which walked
+the midpoint recurrence one pixel at a time and deduplicated through a set.
+This module produces the same pixels, in the same order, for integer centres
+and radii (what every caller passed), as contiguous int32 (N, 2) NumPy arrays, and can rasterize thousands of circles in one call.
+
+The recurrence
+    p = 1 - r; y += 1; p <= 0 ? keep x : x -= 1
+picks, for every row y >= 1, the largest x with x * (x - 1) <= r*r - y*y, so
+the x of each row has the closed form (1 + isqrt(1 + 4 * (r*r - y*y))) // 2.
+That lets us evaluate every row of every circle at once.
+
+Circles drawn every frame mostly reuse a handful of radii (lane rings, radar
+range rings, orbits, ripples), so `StencilCache` keeps centre-relative
+stencils keyed by integer radius and a frame only has to translate them.
+
+For filled shapes the same rows give, per scanline, the half-width of the
+MPCA outline; `annulus_spans_batch` turns those into horizontal (y, x0, x1)
+spans for filled disks and rings that can be drawn as GL_LINES or written
+straight into a NumPy raster.
+
+Dependencies:
+- numpy
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+# Octant order used by the original point lists:
+# (+x,+y) (-x,+y) (+x,-y) (-x,-y) (+y,+x) (-y,+x) (+y,-x) (-y,-x)
+_SX = np.array([1, -1, 1, -1, 0, 0, 0, 0], dtype=np.int64)
+_SY = np.array([0, 0, 0, 0, 1, -1, 1, -1], dtype=np.int64)
+_TX = np.array([0, 0, 0, 0, 1, 1, -1, -1], dtype=np.int64)
+_TY = np.array([1, 1, -1, -1, 0, 0, 0, 0], dtype=np.int64)
+
+# Octants that repeat an earlier octant of the same row.
+_DUP_ON_AXIS = np.array([0, 0, 1, 1, 0, 1, 0, 1], dtype=bool)      # y == 0
+_DUP_ON_DIAGONAL = np.array([0, 0, 0, 0, 1, 1, 1, 1], dtype=bool)  # x == y
+_DUP_AT_CENTER = np.array([0, 1, 0, 1, 0, 0, 0, 0], dtype=bool)    # x == 0
+
+
+def _isqrt(v):
+    """Exact integer square root of a non-negative int64 array."""
+    s = np.floor(np.sqrt(v.astype(np.float64))).astype(np.int64)
+    s -= (s * s > v)
+    s += ((s + 1) * (s + 1) <= v)
+    return s
+
+
+def octant_rows(radii):
+    """
+    Evaluate the midpoint recurrence for a batch of radii.
+
+    Returns (owner, x, y): one entry per loop iteration of the original
+    `while x >= y` walk, grouped by circle and in iteration order.
+    """
+    radii = np.asarray(radii, dtype=np.int64).reshape(-1)
+    bound = np.where(radii >= 0, (radii * 0.70710678).astype(np.int64) + 2, 0)
+    total = int(bound.sum())
+    owner = np.repeat(np.arange(radii.size), bound)
+    starts = np.cumsum(bound) - bound
+    y = np.arange(total, dtype=np.int64) - np.repeat(starts, bound)
+    r = radii[owner]
+    x = (1 + _isqrt(np.maximum(1 + 4 * (r * r - y * y), 0))) // 2
+    x = np.where(y == 0, r, x)
+    keep = x >= y
+    return owner[keep], x[keep], y[keep]
+
+
+def midpoint_circle_batch(circles, width=None, height=None):
+    """
+    Rasterize many (xc, yc, r) circles at once.
+
+    The algorithm works on integer centres and radii. Other values are cast
+    here at the boundary with int(round(v)) semantics (np.rint also rounds
+    halves to even), which is what every scene's draw_circle did before
+    calling its per-pixel helper. A float centre or radius fed straight into
+    that old per-pixel walk, rounding each pixel after the offset, is not
+    reproduced; round first if those exact pixels matter. When `width` and
+    `height` are given, pixels outside 0 <= x < width, 0 <= y < height are
+    dropped, like the original viewport-clipping helpers.
+
+    Returns (points, offsets): points is an int32 (N, 2) array and the pixels
+    of circle i are points[offsets[i]:offsets[i + 1]].
+    """
+    circles = np.rint(np.asarray(circles, dtype=np.float64).reshape(-1, 3)).astype(np.int64)
+    owner, x, y = octant_rows(circles[:, 2])
+
+    dx = x[:, None] * _SX + y[:, None] * _SY
+    dy = x[:, None] * _TX + y[:, None] * _TY
+    keep = ~((y == 0)[:, None] & _DUP_ON_AXIS)
+    keep &= ~((x == y)[:, None] & _DUP_ON_DIAGONAL)
+    keep &= ~((x == 0)[:, None] & _DUP_AT_CENTER)
+
+    px = circles[owner, 0][:, None] + dx
+    py = circles[owner, 1][:, None] + dy
+    if width is not None and height is not None:
+        keep &= (px >= 0) & (px < width) & (py >= 0) & (py < height)
+
+    points = np.empty((int(keep.sum()), 2), dtype=np.int32)
+    points[:, 0] = px[keep]
+    points[:, 1] = py[keep]
+    counts = np.bincount(np.broadcast_to(owner[:, None], keep.shape)[keep], minlength=len(circles))
+    offsets = np.zeros(len(circles) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return points, offsets
+
+
+def midpoint_circle_points(xc, yc, radius, width=None, height=None):
+    """Unique MPCA pixels of one circle as an int32 (N, 2) array."""
+    points, _ = midpoint_circle_batch([(xc, yc, radius)], width, height)
+    return points
+
+
+# ---------------- Radius-keyed stencil cache ------------------
+class StencilCache:
+    """
+    Bounded LRU of centre-relative circle stencils keyed by integer radius.
+
+    `stencil(r)` must return the pixel offsets of a circle of radius r centred
+    on the origin; the default is the MPCA stencil above. Cached stencils are
+    read-only and shared between callers.
+    """
+
+    def __init__(self, maxsize=256, stencil=None):
+        self.maxsize = maxsize
+        self.make_stencil = stencil or (lambda r: midpoint_circle_points(0, 0, r))
+        self.hits = 0
+        self.misses = 0
+        self._stencils = OrderedDict()
+
+    def __len__(self):
+        return len(self._stencils)
+
+    def stencil(self, radius):
+        r = int(round(radius))
+        cached = self._stencils.get(r)
+        if cached is not None:
+            self.hits += 1
+            self._stencils.move_to_end(r)
+            return cached
+        self.misses += 1
+        cached = np.ascontiguousarray(self.make_stencil(r), dtype=np.int32).reshape(-1, 2)
+        cached.setflags(write=False)
+        self._stencils[r] = cached
+        if len(self._stencils) > self.maxsize:
+            self._stencils.popitem(last=False)
+        return cached
+
+    def points(self, xc, yc, radius, width=None, height=None):
+        """Translate the cached stencil to (xc, yc), clipped like the uncached path."""
+        pts = self.stencil(radius) + np.array([int(round(xc)), int(round(yc))], dtype=np.int32)
+        if width is not None and height is not None:
+            inside = (pts[:, 0] >= 0) & (pts[:, 0] < width) & (pts[:, 1] >= 0) & (pts[:, 1] < height)
+            if not inside.all():
+                pts = pts[inside]
+        return pts
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self._stencils.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+stencil_cache = StencilCache()
+
+
+def cached_circle_points(xc, yc, radius, width=None, height=None):
+    """`midpoint_circle_points` served from the shared stencil cache."""
+    return stencil_cache.points(xc, yc, radius, width, height)
+
+
+# ---------------- Scanline spans for disks and annuli ------------------
+def _half_widths(radii):
+    """
+    Per-scanline half-width of the MPCA outline of each radius.
+
+    Returns (hw, base): the half-width of row |dy| of circle i is
+    hw[base[i] + |dy|]. Negative radii get no rows.
+    """
+    radii = np.asarray(radii, dtype=np.int64).reshape(-1)
+    rows = np.maximum(radii + 1, 0)
+    base = np.cumsum(rows) - rows
+    hw = np.full(int(rows.sum()), -1, dtype=np.int64)
+    owner, x, y = octant_rows(radii)
+    np.maximum.at(hw, base[owner] + y, x)
+    np.maximum.at(hw, base[owner] + x, y)
+    return hw, base
+
+
+def annulus_spans_batch(rings, width=None, height=None):
+    """
+    Horizontal spans of many filled (xc, yc, inner, outer) rings.
+
+    A ring covers the filled MPCA disk of `outer` minus the filled disk of
+    `inner - 1`, so inner=0 gives a filled disk and rings with
+    inner = previous outer + 1 tile the plane without gaps or overlap.
+
+    Returns (spans, offsets): spans is an int32 (N, 3) array of inclusive
+    (y, x0, x1) runs and the spans of ring i are spans[offsets[i]:offsets[i + 1]].
+    """
+    rings = np.rint(np.asarray(rings, dtype=np.float64).reshape(-1, 4)).astype(np.int64)
+    xc, yc, inner, outer = rings.T
+    outer = np.maximum(outer, -1)
+    hole = np.minimum(inner - 1, outer)
+
+    hw_out, base_out = _half_widths(outer)
+    hw_in, base_in = _half_widths(hole)
+
+    # One entry per scanline dy in [-outer, outer] of every ring
+    rows = np.maximum(2 * outer + 1, 0)
+    owner = np.repeat(np.arange(len(rings)), rows)
+    dy = np.arange(int(rows.sum()), dtype=np.int64) - np.repeat(np.cumsum(rows) - rows, rows) - outer[owner]
+    ady = np.abs(dy)
+    wo = hw_out[base_out[owner] + ady]
+    has_hole = ady <= hole[owner]
+    wi = np.full(ady.shape, -1, dtype=np.int64)
+    wi[has_hole] = hw_in[base_in[owner[has_hole]] + ady[has_hole]]
+
+    cx = xc[owner]
+    y = yc[owner] + dy
+    # Left run (whole row when there is no hole) and right run of each scanline
+    x0 = np.stack([cx - wo, cx + wi + 1], axis=1)
+    x1 = np.stack([np.where(has_hole, cx - wi - 1, cx + wo), cx + wo], axis=1)
+    keep = np.stack([np.ones_like(has_hole), has_hole], axis=1)
+    y = np.broadcast_to(y[:, None], x0.shape)
+    if width is not None and height is not None:
+        x0 = np.maximum(x0, 0)
+        x1 = np.minimum(x1, width - 1)
+        keep &= (y >= 0) & (y < height)
+    keep &= x0 <= x1
+
+    spans = np.empty((int(keep.sum()), 3), dtype=np.int32)
+    spans[:, 0] = y[keep]
+    spans[:, 1] = x0[keep]
+    spans[:, 2] = x1[keep]
+    counts = np.bincount(np.broadcast_to(owner[:, None], keep.shape)[keep], minlength=len(rings))
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return spans, offsets
+
+
+def annulus_spans(xc, yc, inner, outer, width=None, height=None):
+    """Spans of one ring between radii `inner` and `outer` (both inclusive)."""
+    spans, _ = annulus_spans_batch([(xc, yc, inner, outer)], width, height)
+    return spans
+
+
+def disk_spans(xc, yc, radius, width=None, height=None):
+    """Spans of one filled disk bounded by its MPCA outline."""
+    return annulus_spans(xc, yc, 0, radius, width, height)
+
+
+def span_coverage(spans, width, height):
+    """Count how many spans cover each pixel of a (height, width) raster."""
+    spans = np.asarray(spans).reshape(-1, 3)
+    inside = (spans[:, 0] >= 0) & (spans[:, 0] < height) & (spans[:, 2] >= 0) & (spans[:, 1] < width)
+    y, x0, x1 = spans[inside].T.astype(np.int64)
+    x0 = np.maximum(x0, 0)
+    x1 = np.minimum(x1, width - 1)
+    diff = np.zeros((height, width + 1), dtype=np.int32)
+    np.add.at(diff, (y, x0), 1)
+    np.add.at(diff, (y, x1 + 1), -1)
+    return np.cumsum(diff[:, :width], axis=1)
+
+
+def fill_spans(raster, spans, value):
+    """Write `value` into every pixel of `raster` (rows = y) covered by `spans`."""
+    height, width = raster.shape[:2]
+    raster[span_coverage(spans, width, height) > 0] = value
+    return raster
+
+
+def span_lines(spans):
+    """GL_LINES vertices (2 per span) that cover the span's pixel centres."""
+    spans = np.asarray(spans).reshape(-1, 3)
+    lines = np.empty((len(spans), 2, 2), dtype=np.float32)
+    lines[:, :, 1] = spans[:, 0:1] + 0.5
+    lines[:, 0, 0] = spans[:, 1]
+    lines[:, 1, 0] = spans[:, 2] + 1
+    return lines.reshape(-1, 2)
@@ -0,0 +1,226 @@
+"""
+mpca_gl.py
+
+Retained-mode OpenGL rendering for MPCA circles.
+
+The scenes used to send every circle pixel through glVertex2i inside
+glBegin(GL_POINTS), i.e. one PyOpenGL call per pixel. `CircleBatch` rasterizes
+a set of circles once with mpca.midpoint_circle_batch, uploads the points and
+their colours into a vertex buffer object, and draws the whole set with a
+single glDrawArrays (or a subset with glMultiDrawArrays). The buffer is only
+re-uploaded when the circles, colours or clip rectangle change. `SpanBatch`
+does the same for filled disks and annuli, stored as one GL_LINES segment per
+scanline span. `TextureImage` keeps an RGBA image (e.g. a computed heatmap)
+in one texture that is drawn as a single quad.
+
+Dependencies:
+- PyOpenGL
+- numpy
+"""
+
+from OpenGL.GL import *
+import ctypes
+import numpy as np
+import mpca
+
+# Interleaved vertex layout: x, y, r, g, b, a
+VERTEX_DTYPE = np.dtype([('pos', np.float32, 2), ('color', np.float32, 4)])
+_STRIDE = VERTEX_DTYPE.itemsize
+_COLOR_OFFSET = VERTEX_DTYPE.fields['color'][1]
+
+
+def as_rgba(colors, count):
+    """Broadcast one colour or per-item colours (RGB or RGBA) to a (count, 4) array."""
+    colors = np.asarray(colors, dtype=np.float32)
+    if colors.shape[-1] == 3:
+        colors = np.concatenate([colors, np.ones(colors.shape[:-1] + (1,), dtype=np.float32)], axis=-1)
+    return np.ascontiguousarray(np.broadcast_to(colors, (count, 4)))
+
+
+def draw_vertices(mode, positions, colors):
+    """
+    Draw per-frame geometry from one interleaved client-side vertex array with
+    a single glDrawArrays. `colors` is one colour or one per vertex.
+    """
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    if not len(positions):
+        return
+    vertices = np.empty(len(positions), dtype=VERTEX_DTYPE)
+    vertices['pos'] = positions
+    vertices['color'] = as_rgba(colors, len(positions))
+    base = vertices.ctypes.data
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(2, GL_FLOAT, _STRIDE, ctypes.c_void_p(base))
+    glColorPointer(4, GL_FLOAT, _STRIDE, ctypes.c_void_p(base + _COLOR_OFFSET))
+    glDrawArrays(mode, 0, len(vertices))
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+
+class _RetainedBatch:
+    """A VBO of interleaved vertices grouped into items drawn with one call."""
+
+    mode = GL_POINTS
+
+    def __init__(self, usage=GL_STATIC_DRAW):
+        self.usage = usage
+        self.vbo = None
+        self.vertex_count = 0
+        self.first = np.zeros(0, dtype=np.int32)
+        self.count = np.zeros(0, dtype=np.int32)
+        self.uploads = 0
+        self._key = None
+
+    def _set(self, positions, offsets, colors, per_item):
+        """Upload `positions` where item i owns positions[per_item * offsets[i]:...]."""
+        counts = np.diff(offsets) * per_item
+        vertices = np.empty(len(positions), dtype=VERTEX_DTYPE)
+        vertices['pos'] = positions
+        vertices['color'] = np.repeat(colors, counts, axis=0)
+        self._upload(vertices)
+        self.first = (offsets[:-1] * per_item).astype(np.int32)
+        self.count = counts.astype(np.int32)
+
+    def _upload(self, vertices):
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, self.usage)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.vertex_count = len(vertices)
+        self.uploads += 1
+
+    def draw(self, items=None, point_size=None):
+        """Draw every item, or only the item indices in `items`."""
+        if not self.vertex_count:
+            return
+        if point_size is not None:
+            glPointSize(point_size)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(2, GL_FLOAT, _STRIDE, ctypes.c_void_p(0))
+        glColorPointer(4, GL_FLOAT, _STRIDE, ctypes.c_void_p(_COLOR_OFFSET))
+        if items is None:
+            glDrawArrays(self.mode, 0, self.vertex_count)
+        else:
+            sel = np.asarray(items, dtype=np.intp)
+            glMultiDrawArrays(self.mode, self.first[sel], self.count[sel], len(sel))
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+        self.vertex_count = 0
+        self._key = None
+
+
+class CircleBatch(_RetainedBatch):
+    """A group of MPCA circle outlines kept in one VBO and drawn with one call."""
+
+    mode = GL_POINTS
+
+    def set_circles(self, circles, colors=(0.0, 1.0, 0.0, 0.5), width=None, height=None):
+        """
+        Set the (xc, yc, r) circles of the batch. `colors` is one colour or one
+        per circle. Returns True when the buffer had to be re-uploaded.
+        """
+        circles = np.asarray(circles, dtype=np.float64).reshape(-1, 3)
+        colors = as_rgba(colors, len(circles))
+        key = (circles.tobytes(), colors.tobytes(), width, height)
+        if key == self._key:
+            return False
+        points, offsets = mpca.midpoint_circle_batch(circles, width, height)
+        self._set(points, offsets, colors, 1)
+        self._key = key
+        return True
+
+
+class SpanBatch(_RetainedBatch):
+    """Filled MPCA disks/annuli kept in one VBO as GL_LINES scanline spans."""
+
+    mode = GL_LINES
+
+    def set_annuli(self, rings, colors=(0.0, 1.0, 0.0, 0.5), width=None, height=None):
+        """
+        Set the (xc, yc, inner, outer) rings of the batch (inner=0 for a filled
+        disk). Returns True when the buffer had to be re-uploaded.
+        """
+        rings = np.asarray(rings, dtype=np.float64).reshape(-1, 4)
+        colors = as_rgba(colors, len(rings))
+        key = (rings.tobytes(), colors.tobytes(), width, height)
+        if key == self._key:
+            return False
+        spans, offsets = mpca.annulus_spans_batch(rings, width, height)
+        self._set(mpca.span_lines(spans), offsets, colors, 2)
+        self._key = key
+        return True
+
+
+class TextureImage:
+    """An RGBA uint8 image kept in one GL texture and drawn as one textured quad."""
+
+    def __init__(self):
+        self.texture = None
+        self.shape = None
+        self.version = None
+        self.uploads = 0
+
+    def set_image(self, rgba, version=None, region=None):
+        """
+        Upload the (height, width, 4) image, row 0 at the bottom. With a
+        `version`, the upload is skipped while it stays the same; `region` =
+        (x0, y0, x1, y1) limits a re-upload to the pixels that changed.
+        Returns True when the texture was (partly) re-uploaded.
+        """
+        rgba = np.ascontiguousarray(rgba, dtype=np.uint8)
+        if version is not None and version == self.version and rgba.shape == self.shape:
+            return False
+        if self.texture is None:
+            self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        if rgba.shape != self.shape:
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, rgba.shape[1], rgba.shape[0], 0, GL_RGBA, GL_UNSIGNED_BYTE, rgba)
+            self.shape = rgba.shape
+        elif region is not None:
+            x0, y0, x1, y1 = region
+            block = np.ascontiguousarray(rgba[y0:y1, x0:x1])
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x0, y0, x1 - x0, y1 - y0, GL_RGBA, GL_UNSIGNED_BYTE, block)
+        else:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, rgba.shape[1], rgba.shape[0], GL_RGBA, GL_UNSIGNED_BYTE, rgba)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self.version = version
+        self.uploads += 1
+        return True
+
+    def draw(self, x=0, y=0, scale=1.0):
+        """Draw the image with its bottom-left corner at (x, y), `scale` units per texel."""
+        if self.texture is None:
+            return
+        h, w = self.shape[:2]
+        h, w = h * scale, w * scale
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0); glVertex2f(x, y)
+        glTexCoord2f(1, 0); glVertex2f(x + w, y)
+        glTexCoord2f(1, 1); glVertex2f(x + w, y + h)
+        glTexCoord2f(0, 1); glVertex2f(x, y + h)
+        glEnd()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_TEXTURE_2D)
+
+    def delete(self):
+        if self.texture is not None:
+            glDeleteTextures([self.texture])
+            self.texture = None
+        self.shape = None
+        self.version = None
@@ -0,0 +1,389 @@
+"""
+obstacle_loss.py
+
+Wall-attenuated coverage for the coverage analyzers.
+
+A floor plan is a raster of material codes, row 0 at the bottom like every
+other raster here (0 = free space, see MATERIALS). It is loaded from a .npy
+array of codes or from a PNG whose colours are matched to the nearest
+material colour (read with the small zlib-based reader below, so no imaging
+library is needed).
+
+Every wall a signal passes through costs its material's loss in dB, once per
+crossing. For one AP the loss of every pixel around it comes from one
+vectorized ray march:
+
+- rays are cast from the AP, about one per pixel of the circumference at the
+  reach (REACH_RADII coverage radii), and sampled every pixel along the way;
+  where a step changes both coordinates, the pixel whose corner the ray
+  clips in between is read too, so every pixel the ray touches is seen (a
+  1-pixel diagonal wall stops it)
+- the material is gathered at all (ray, step) samples at once, a crossing is
+  a sample whose material differs from the previous one, and a cumulative sum
+  along each ray gives the loss so far
+- every pixel takes the loss of the nearest (ray, step) sample
+
+The received power is the log-distance model of sinr_heatmap minus the wall
+loss, so a pixel is covered when (radius / d)^exponent * 10^(-loss / 10) >= 1.
+`ObstacleMap` caches each AP's signal window; it is only recomputed when the
+AP moves or is resized. Painting walls inside the window re-marches just the
+rays through the painted cells and rewrites the pixels they cover.
+
+Dependencies:
+- numpy
+- sinr_heatmap.py
+"""
+
+import os
+import struct
+import zlib
+import numpy as np
+import sinr_heatmap
+
+REACH_RADII = 3.0          # signal is evaluated up to this many coverage radii
+RAY_DENSITY = 1.0          # rays per pixel of circumference at the reach
+MARCH_SAMPLES = 1 << 22    # (ray, step) samples per batch
+# code: (name, loss per crossing in dB, RGB in floor-plan images)
+MATERIALS = {
+    0: ('free', 0.0, (255, 255, 255)),
+    1: ('drywall', 3.0, (190, 190, 190)),
+    2: ('glass', 2.0, (120, 200, 255)),
+    3: ('wood', 4.0, (150, 100, 50)),
+    4: ('brick', 8.0, (180, 60, 40)),
+    5: ('concrete', 12.0, (0, 0, 0)),
+    6: ('metal', 25.0, (40, 40, 140)),
+}
+CONCRETE = 5
+LOSS_DB = np.array([MATERIALS[m][1] if m in MATERIALS else 0.0 for m in range(256)], dtype=np.float32)
+WALL_ALPHA = 0.85
+
+
+# ---------------- Floor plans ------------------
+def read_png(path):
+    """
+    Pixels of an 8-bit, non-interlaced PNG (grey, grey + alpha, RGB, RGBA or
+    palette) as uint8 (height, width, channels), top row first.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError('%s: not a PNG file' % path)
+    pos, idat, palette, header = 8, [], None, None
+    while pos < len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif kind == b'PLTE':
+            palette = np.frombuffer(body, dtype=np.uint8).reshape(-1, 3)
+        elif kind == b'IDAT':
+            idat.append(body)
+        elif kind == b'IEND':
+            break
+    width, height, depth, color, _, _, interlace = header
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color)
+    if depth != 8 or channels is None or interlace:
+        raise ValueError('%s: only 8-bit non-interlaced PNGs are supported' % path)
+
+    # Undo the per-row filters; Sub and Up are vectorized, Average and Paeth
+    # depend on the byte to their left and go byte by byte
+    stride = width * channels
+    rows = np.frombuffer(zlib.decompress(b''.join(idat)), dtype=np.uint8).reshape(height, stride + 1)
+    out = np.zeros((height, stride), dtype=np.uint8)
+    prev = np.zeros(stride, dtype=np.int32)
+    for r in range(height):
+        kind, line = rows[r, 0], rows[r, 1:].astype(np.int32)
+        if kind == 1:
+            line = line.reshape(width, channels).cumsum(axis=0).ravel()
+        elif kind == 2:
+            line += prev
+        elif kind in (3, 4):
+            line = line.tolist()
+            up = prev.tolist()
+            for i in range(stride):
+                left = line[i - channels] if i >= channels else 0
+                if kind == 3:
+                    line[i] = (line[i] + (left + up[i]) // 2) & 255
+                    continue
+                corner = up[i - channels] if i >= channels else 0
+                p = left + up[i] - corner
+                pa, pb, pc = abs(p - left), abs(p - up[i]), abs(p - corner)
+                line[i] = (line[i] + (left if pa <= pb and pa <= pc else up[i] if pb <= pc else corner)) & 255
+            line = np.array(line, dtype=np.int32)
+        prev = line & 255
+        out[r] = prev
+    pixels = out.reshape(height, width, channels)
+    if color == 3:
+        pixels = palette[pixels[..., 0]]
+    return pixels
+
+
+def materials_from_rgb(pixels):
+    """Material code of every pixel: the nearest MATERIALS colour (transparent pixels are free)."""
+    pixels = np.asarray(pixels)
+    if pixels.shape[-1] in (1, 2):   # grey (+ alpha)
+        pixels = np.concatenate([np.repeat(pixels[..., :1], 3, axis=-1), pixels[..., 1:]], axis=-1)
+    codes = np.array(sorted(MATERIALS))
+    colors = np.array([MATERIALS[c][2] for c in codes], dtype=np.int32)
+    rgb = pixels[..., :3].astype(np.int32)
+    dist = np.square(rgb[..., None, :] - colors).sum(axis=-1)
+    walls = codes[dist.argmin(axis=-1)].astype(np.uint8)
+    if pixels.shape[-1] == 4:
+        walls[pixels[..., 3] < 128] = 0
+    return walls
+
+
+def load_walls(path):
+    """
+    Material raster (uint8, row 0 at the bottom) from a .npy array of codes
+    (a bool array marks concrete walls) or a PNG floor plan (top row first).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        walls = np.load(path)
+        if walls.dtype == bool:
+            return walls.astype(np.uint8) * CONCRETE
+        if walls.ndim != 2 or not np.issubdtype(walls.dtype, np.integer):
+            raise ValueError('%s: expected a 2-D integer array of material codes' % path)
+        return walls.astype(np.uint8)
+    if ext == '.png':
+        return np.ascontiguousarray(materials_from_rgb(read_png(path))[::-1])
+    raise ValueError('unknown wall raster format %r (use .png or .npy)' % ext)
+
+
+def demo_walls(width, height):
+    """A sample office floor: concrete shell and core, drywall offices with doors, a glass meeting room."""
+    walls = np.zeros((height, width), dtype=np.uint8)
+    t = 4
+    walls[:t], walls[-t:], walls[:, :t], walls[:, -t:] = CONCRETE, CONCRETE, CONCRETE, CONCRETE
+    corridor = height // 2
+    walls[corridor - 40:corridor - 37, :] = 1
+    walls[corridor + 37:corridor + 40, :] = 1
+    for x in range(width // 6, width, width // 6):
+        walls[:corridor - 40, x:x + 3] = 1
+        walls[corridor + 40:, x:x + 3] = 1
+    for x in range(width // 12, width, width // 6):
+        walls[corridor - 40:corridor - 37, x:x + 24] = 3     # office doors
+        walls[corridor + 37:corridor + 40, x:x + 24] = 3
+    cx = width // 2
+    walls[corridor - 30:corridor + 30, cx - 40:cx + 40] = CONCRETE   # lift core
+    walls[corridor - 24:corridor + 24, cx - 34:cx + 34] = 6
+    walls[corridor - 20:corridor + 20, cx - 30:cx + 30] = 0
+    walls[t:corridor - 40, width - width // 6:width - width // 6 + 3] = 2   # glass meeting room
+    return walls
+
+
+def walls_rgba(walls, alpha=WALL_ALPHA):
+    """RGBA uint8 image of a material raster, free space transparent."""
+    colors = np.zeros((256, 4), dtype=np.uint8)
+    for code, (_, _, rgb) in MATERIALS.items():
+        colors[code] = rgb + (int(alpha * 255),)
+    colors[5, :3] = (110, 110, 110)   # concrete is black in plans, grey on the dark map
+    colors[0] = 0
+    return colors[walls]
+
+
+# ---------------- Ray marching ------------------
+def ray_count(reach):
+    """Rays cast from an AP whose signal reaches `reach` pixels."""
+    return max(64, int(np.ceil(2.0 * np.pi * reach * RAY_DENSITY)))
+
+
+def march_loss(walls, px, py, reach, loss_db=LOSS_DB, rays=None, window=None):
+    """
+    Wall loss (dB) from the raster point (px, py) to every pixel centre within
+    `reach` pixels, as (x0, y0, loss) with loss a float32 (h, w) window whose
+    bottom-left pixel is (x0, y0).
+
+    `window` = (x0, y0, x1, y1) narrows the result to part of that window,
+    and `rays` = (first, count) marches only those consecutive rays (mod
+    ray_count(reach)); pixels that take their loss from another ray are NaN.
+    """
+    height, width = walls.shape
+    x0, y0 = max(int(np.floor(px - reach)), 0), max(int(np.floor(py - reach)), 0)
+    x1, y1 = min(int(np.ceil(px + reach)), width), min(int(np.ceil(py + reach)), height)
+    far = np.hypot(max(px - x0, x1 - px), max(py - y0, y1 - py))
+    if window is not None:
+        x0, y0, x1, y1 = max(x0, window[0]), max(y0, window[1]), min(x1, window[2]), min(y1, window[3])
+    if x0 >= x1 or y0 >= y1:
+        return x0, y0, np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.float32)
+    # Samples past the edge land in a one-pixel free border
+    padded = np.pad(walls, 1).ravel()
+    total = ray_count(reach)
+    first, count = (0, total) if rays is None else rays
+    steps = int(np.ceil(min(reach, far))) + 2
+    theta = ((first + np.arange(count)) % total) * (2.0 * np.pi / total)
+    t = np.arange(steps, dtype=np.float32)
+    cum = np.empty((count, steps), dtype=np.float32)
+    start = walls[min(max(int(py), 0), height - 1), min(max(int(px), 0), width - 1)]
+    batch = max(1, MARCH_SAMPLES // steps)
+    for r0 in range(0, count, batch):
+        a = theta[r0:r0 + batch, None]
+        cos, sin = np.cos(a).astype(np.float32), np.sin(a).astype(np.float32)
+        ix = np.clip(np.floor(np.float32(px) + cos * t), -1, width).astype(np.int32)
+        iy = np.clip(np.floor(np.float32(py) + sin * t), -1, height).astype(np.int32)
+        mat = padded[(iy + 1) * (width + 2) + (ix + 1)]
+        # Between two samples a ray can pass through one more pixel: when both
+        # coordinates change it clips the corner of (ix, iy_prev) or (ix_prev,
+        # iy), whichever boundary it crosses first. Without it, rays slip
+        # through 8-connected diagonal walls.
+        ix_prev, iy_prev = ix[:, :-1], iy[:, :-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tx = (np.maximum(ix_prev, ix[:, 1:]) - np.float32(px)) / cos
+            ty = (np.maximum(iy_prev, iy[:, 1:]) - np.float32(py)) / sin
+        x_first = tx < ty
+        corner = padded[(np.where(x_first, iy_prev, iy[:, 1:]) + 1) * (width + 2)
+                        + (np.where(x_first, ix[:, 1:], ix_prev) + 1)]
+        corner = np.where((ix_prev != ix[:, 1:]) & (iy_prev != iy[:, 1:]), corner, mat[:, :-1])
+        # A crossing is the first sample of a run of wall material
+        prev = np.concatenate([np.full((len(mat), 1), start, dtype=mat.dtype), corner], axis=1)
+        step_loss = np.where((mat != prev) & (mat != 0), loss_db[mat], np.float32(0.0))
+        step_loss[:, 1:] += np.where((corner != mat[:, :-1]) & (corner != 0), loss_db[corner], np.float32(0.0))
+        np.cumsum(step_loss, axis=1, out=cum[r0:r0 + batch])
+
+    dx = np.arange(x0, x1) + 0.5 - px
+    dy = np.arange(y0, y1) + 0.5 - py
+    angle = np.arctan2(dy[:, None], dx[None, :])
+    ray = (np.rint(angle * (total / (2.0 * np.pi))).astype(np.int64) - first) % total
+    step = np.minimum(np.rint(np.hypot(dy[:, None], dx[None, :])).astype(np.int64), steps - 1)
+    if rays is None:
+        return x0, y0, cum[ray, step]
+    inside = ray < count
+    loss = np.full(ray.shape, np.nan, dtype=np.float32)
+    loss[inside] = cum[ray[inside], step[inside]]
+    return x0, y0, loss
+
+
+class ObstacleMap:
+    """
+    A material raster with `cell` world units per pixel and the cached,
+    wall-attenuated signal window of every AP id.
+    """
+
+    def __init__(self, walls, cell=1.0, exponent=sinr_heatmap.PATH_LOSS_EXPONENT,
+                 noise_dbm=sinr_heatmap.NOISE_DBM, reach_radii=REACH_RADII):
+        self.walls = np.ascontiguousarray(walls, dtype=np.uint8)
+        self.height, self.width = self.walls.shape
+        self.cell = float(cell)
+        self.exponent = exponent
+        self.noise = 10.0 ** ((noise_dbm - sinr_heatmap.EDGE_DBM) / 10.0)
+        self.reach_radii = reach_radii
+        self.version = 0      # bumped whenever the walls change
+        self.marches = 0      # ray marches run (cache misses)
+        self._cache = {}      # AP id -> ((x, y, radius), x0, y0, signal window)
+
+    def rgba(self):
+        return walls_rgba(self.walls)
+
+    def paint(self, x0, y0, x1, y1, material):
+        """
+        Set the world rectangle [x0, x1) x [y0, y1) to `material` and bring
+        the cached APs whose window overlaps it up to date. Returns the number
+        of APs whose signal changed.
+
+        Only the rays of an AP that pass through the painted cells can see
+        the change, so only those are marched again and only the pixels past
+        the rectangle along them are rewritten; an AP inside the rectangle,
+        or close enough that the rays span half a turn, is dropped and marched
+        in full when next asked for.
+        """
+        c0, r0 = max(int(x0 // self.cell), 0), max(int(y0 // self.cell), 0)
+        c1, r1 = min(int(-(-x1 // self.cell)), self.width), min(int(-(-y1 // self.cell)), self.height)
+        if c0 >= c1 or r0 >= r1:
+            return 0
+        self.walls[r0:r1, c0:c1] = material
+        self.version += 1
+        touched = [(i, entry) for i, entry in self._cache.items()
+                   if entry[1] < c1 and entry[1] + entry[3].shape[1] > c0
+                   and entry[2] < r1 and entry[2] + entry[3].shape[0] > r0]
+        # The painted cells with a pixel of margin, for the corner pixels rays clip
+        cx = np.array([c0 - 1, c1 + 1, c1 + 1, c0 - 1], dtype=np.float64)
+        cy = np.array([r0 - 1, r0 - 1, r1 + 1, r1 + 1], dtype=np.float64)
+        for i, (key, wx, wy, s) in touched:
+            px, py = key[0] / self.cell, key[1] / self.cell
+            reach = self.reach_radii * key[2] / self.cell
+            total = ray_count(reach)
+            angle = np.arctan2(cy - py, cx - px)
+            spread = (angle - angle[0] + np.pi) % (2.0 * np.pi) - np.pi
+            first = int(np.floor((angle[0] + spread.min()) * total / (2.0 * np.pi))) - 1
+            count = int(np.ceil((angle[0] + spread.max()) * total / (2.0 * np.pi))) + 2 - first
+            if cx[0] <= px <= cx[1] and cy[0] <= py <= cy[2] or count >= total // 2:
+                del self._cache[i]
+                continue
+            # Bounding box of the shadow: the rectangle and the rays' far ends
+            theta = (first + np.arange(count)) * (2.0 * np.pi / total)
+            far = np.hypot(*s.shape) + 1.0
+            bx = np.concatenate([cx, px + far * np.cos(theta)])
+            by = np.concatenate([cy, py + far * np.sin(theta)])
+            window = (max(int(np.floor(bx.min())), wx), max(int(np.floor(by.min())), wy),
+                      min(int(np.ceil(bx.max())), wx + s.shape[1]), min(int(np.ceil(by.max())), wy + s.shape[0]))
+            x0, y0, loss = march_loss(self.walls, px, py, reach, rays=(first, count), window=window)
+            patch = self._signal(px, py, key[2], x0, y0, loss)
+            h, w = patch.shape
+            target = s[y0 - wy:y0 - wy + h, x0 - wx:x0 - wx + w]
+            keep = ~np.isnan(patch)
+            target[keep] = patch[keep]
+            self.marches += 1
+        return len(touched)
+
+    def _signal(self, px, py, radius, x0, y0, loss):
+        """Signal (edge units) of an AP at raster point (px, py) over a loss window at (x0, y0)."""
+        h, w = loss.shape
+        # (d / radius)^2 in world units, floored as in sinr_heatmap
+        dx = ((np.arange(x0, x0 + w) + 0.5 - px) * (self.cell / radius)).astype(np.float32)
+        dy = ((np.arange(y0, y0 + h) + 0.5 - py) * (self.cell / radius)).astype(np.float32)
+        q = np.square(dy)[:, None] + np.square(dx)[None, :] + np.float32((0.01 / radius) ** 2)
+        s = sinr_heatmap._falloff(q, self.exponent, np.empty_like(q))
+        s *= np.power(np.float32(10.0), loss * np.float32(-0.1))
+        return s
+
+    def signal(self, i, x, y, radius):
+        """
+        Received power of AP i at (x, y, radius) in units of the edge power
+        (covered where >= 1), as (x0, y0, window) in raster pixels.
+        """
+        key = (float(x), float(y), float(radius))
+        hit = self._cache.get(i)
+        if hit is not None and hit[0] == key:
+            return hit[1:]
+        px, py = key[0] / self.cell, key[1] / self.cell
+        x0, y0, loss = march_loss(self.walls, px, py, self.reach_radii * key[2] / self.cell)
+        s = self._signal(px, py, key[2], x0, y0, loss)
+        self._cache[i] = (key, x0, y0, s)
+        self.marches += 1
+        return x0, y0, s
+
+    def pending(self, ids, x, y, radius):
+        """Indices into `ids` of the APs whose signal is not cached yet (field() marches them)."""
+        return [k for k, (i, xi, yi, ri) in enumerate(zip(np.asarray(ids).tolist(), np.asarray(x).tolist(),
+                                                          np.asarray(y).tolist(), np.asarray(radius).tolist()))
+                if i not in self._cache or self._cache[i][0] != (float(xi), float(yi), float(ri))]
+
+    def field(self, ids, x, y, radius, channel):
+        """
+        Strongest attenuated signal (edge units) and SINR (dB) of every raster
+        pixel for the APs (ids, x, y, radius, channel), as float32 (h, w)
+        arrays. Cache entries of APs no longer present are dropped.
+        """
+        ids = np.asarray(ids).tolist()
+        for i in set(self._cache) - set(ids):
+            del self._cache[i]
+        channel = np.asarray(channel)
+        groups = {c: g for g, c in enumerate(np.unique(channel).tolist())}
+        best = np.zeros((self.height, self.width), dtype=np.float32)
+        best_group = np.zeros((self.height, self.width), dtype=np.int64)
+        total = np.zeros((max(len(groups), 1), self.height, self.width), dtype=np.float32)
+        for i, xi, yi, ri, ci in zip(ids, np.asarray(x).tolist(), np.asarray(y).tolist(),
+                                     np.asarray(radius).tolist(), channel.tolist()):
+            x0, y0, s = self.signal(i, xi, yi, ri)
+            window = (slice(y0, y0 + s.shape[0]), slice(x0, x0 + s.shape[1]))
+            g = groups[ci]
+            total[g][window] += s
+            stronger = s > best[window]
+            best[window][stronger] = s[stronger]
+            best_group[window][stronger] = g
+        interference = np.take_along_axis(total, best_group[None], 0)[0] - best
+        with np.errstate(divide='ignore'):
+            sinr_db = 10.0 * np.log10(best / (np.maximum(interference, 0.0) + np.float32(self.noise)))
+        return best, sinr_db.astype(np.float32)
@@ -2,39 +2,21 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math, time
+import mpca
+import mpca_gl
 
 window_width, window_height = 800, 600
 angle = 0
+orbits = None  # retained VBO for the orbit rings
 
 def draw_circle_midpoint(x_center, y_center, radius):
     glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(x_center, y_center, radius):
+    for (x, y) in midpoint_circle_points(x_center, y_center, radius).tolist():
         glVertex2f(x, y)
     glEnd()
 
 def midpoint_circle_points(x_center, y_center, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    points = []
-    while x >= y:
-        points.extend([
-            (x_center + x, y_center + y),
-            (x_center - x, y_center + y),
-            (x_center + x, y_center - y),
-            (x_center - x, y_center - y),
-            (x_center + y, y_center + x),
-            (x_center - y, y_center + x),
-            (x_center + y, y_center - x),
-            (x_center - y, y_center - x)
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    return points
+    return mpca.cached_circle_points(x_center, y_center, radius)
 
 def draw_planet_orbit(x_center, y_center, radius, color):
     glColor3f(*color)
@@ -49,13 +31,15 @@ def draw_planet(x, y, size, color):
     glEnd()
 
 def display():
-    global angle
+    global angle, orbits
     glClear(GL_COLOR_BUFFER_BIT)
     glPointSize(2)
 
-    # Draw orbits
-    draw_planet_orbit(0, 0, 100, (0.4, 0.4, 0.4))
-    draw_planet_orbit(0, 0, 200, (0.4, 0.4, 0.4))
+    # Draw orbits (static, uploaded once into a VBO)
+    if orbits is None:
+        orbits = mpca_gl.CircleBatch()
+        orbits.set_circles([(0, 0, 100), (0, 0, 200)], (0.4, 0.4, 0.4))
+    orbits.draw()
 
     # Draw central sun
     draw_planet(0, 0, 20, (1.0, 1.0, 0.0))
@@ -0,0 +1,109 @@
+"""
+ppi_display.py
+
+Phosphor PPI (plan position indicator) raster for the radar scanners.
+
+A real PPI does not redraw its targets: the sweep writes each return into the
+phosphor, which then fades until the beam comes round again. `PPIRaster`
+keeps that phosphor as a polar accumulation buffer, one row of range bins per
+azimuth bin:
+
+- sweep() writes the columns the beam crossed this frame: they glow faintly
+  and every return lights PULSE_BINS range bins, so a target leaves a short
+  arc
+- decay() fades the whole buffer by `persistence` per frame
+- rgba() scan-converts the buffer to a Cartesian image
+
+The scan conversion never touches polar maths per frame. The buffer bin of
+every texel (or a spare always-dark cell for texels beyond the maximum
+range) is computed once into an index lookup table, so converting is a
+palette lookup over the small polar buffer plus a single fancy-index gather
+over the image. The frame cost is constant whatever the number of targets.
+
+Dependencies:
+- numpy
+"""
+
+import numpy as np
+
+RANGE_BINS = 100        # samples per range profile, as air_filter.RadarDenoiser takes
+AZIMUTH_BINS = 720      # half a degree each
+PERSISTENCE = 0.99      # brightness kept per frame
+PULSE_BINS = 2          # range bins one return lights
+BEAM_GLOW = 0.12        # brightness of the columns under the beam
+
+
+def phosphor_palette(levels=256):
+    """RGBA uint8 colours of a green phosphor from dark to white-hot, packed one uint32 per level."""
+    v = np.linspace(0.0, 1.0, levels)
+    rgba = np.stack([0.7 * v ** 3, v, 0.7 * v ** 3, np.ones(levels)], axis=1)
+    return (rgba * 255).round().astype(np.uint8).view(np.uint32)[:, 0]
+
+
+class PPIRaster:
+    """Polar phosphor buffer of a radar at the origin, scan-converted through a lookup table."""
+
+    def __init__(self, max_range, scale=1.0, range_bins=RANGE_BINS, azimuth_bins=AZIMUTH_BINS,
+                 persistence=PERSISTENCE):
+        self.max_range = float(max_range)
+        self.scale = scale  # world units per texel
+        self.range_bins = range_bins
+        self.azimuth_bins = azimuth_bins
+        self.persistence = persistence
+        # One spare cell at the end stays dark: texels outside the maximum range read it
+        self.buffer = np.zeros(azimuth_bins * range_bins + 1, dtype=np.float32)
+        self.echo = self.buffer[:-1].reshape(azimuth_bins, range_bins)
+        self.palette = phosphor_palette()
+        self.size = int(np.ceil(2 * self.max_range / scale))
+        self.lut = self._lookup()
+
+    def _lookup(self):
+        """Flat buffer index of every texel (row 0 at the bottom)."""
+        c = (np.arange(self.size) + 0.5) * self.scale + self.origin[0]
+        x, y = c[None, :], c[:, None]
+        r = np.floor(np.hypot(x, y) * (self.range_bins / self.max_range)).astype(np.int64)
+        az = np.floor(np.degrees(np.arctan2(y, x)) % 360.0 * (self.azimuth_bins / 360.0)).astype(np.int64)
+        az %= self.azimuth_bins
+        lut = np.where(r < self.range_bins, az * self.range_bins + r, len(self.buffer) - 1)
+        return lut.astype(np.int32).ravel()
+
+    @property
+    def origin(self):
+        """World position of the image's bottom-left corner."""
+        return -self.size * self.scale / 2, -self.size * self.scale / 2
+
+    def clear(self):
+        self.buffer[:] = 0.0
+
+    def decay(self, dt=1.0):
+        """Fade the phosphor by `dt` frames."""
+        self.buffer *= self.persistence ** dt
+
+    def columns(self, start, end):
+        """Azimuth bins the beam crossed sweeping from `start` to `end` degrees (at least the one under `end`)."""
+        a0 = int(np.floor(start % 360.0 * self.azimuth_bins / 360.0))
+        a1 = int(np.floor(end % 360.0 * self.azimuth_bins / 360.0))
+        count = max((a1 - a0) % self.azimuth_bins, 1)
+        return (a1 - np.arange(count)[::-1]) % self.azimuth_bins
+
+    def sweep(self, start, end, ranges=(), amplitudes=(), glow=BEAM_GLOW):
+        """
+        Write one frame of the beam sweeping from azimuth `start` to `end`
+        degrees: its columns glow at least `glow`, and each return (range,
+        amplitude in [0, 1]) lights PULSE_BINS range bins across them.
+        """
+        cols = self.columns(start, end)
+        self.echo[cols] = np.maximum(self.echo[cols], glow)
+        ranges = np.asarray(ranges, dtype=np.float64)
+        bins = np.floor(ranges * (self.range_bins / self.max_range)).astype(np.int64)
+        bins = (bins[:, None] + np.arange(PULSE_BINS)).ravel()
+        amp = np.repeat(np.asarray(amplitudes, dtype=np.float32), PULSE_BINS)
+        keep = (bins >= 0) & (bins < self.range_bins)
+        bins, amp = bins[keep], amp[keep]
+        if len(bins):
+            np.maximum.at(self.echo, (np.repeat(cols, len(bins)), np.tile(bins, len(cols))), np.tile(amp, len(cols)))
+
+    def rgba(self):
+        """The phosphor as a (size, size, 4) uint8 image, row 0 at the bottom."""
+        level = (np.clip(self.buffer, 0.0, 1.0) * (len(self.palette) - 1)).astype(np.int32)
+        return self.palette[level][self.lut].view(np.uint8).reshape(self.size, self.size, 4)
@@ -2,143 +2,190 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math, random, numpy as np
+import mpca_gl
+import ppi_display
+import radar_cfar
+import beam_sector
+import track_association
+import track_bank
 
 WIDTH, HEIGHT = 800, 800
 SWEEP_SPEED = 2.0  # degrees per frame
+BEAM_WIDTH = 2.0  # degrees either side of the beam angle
+GATE_MARGIN = 15.0  # most degrees a track's gate may reach past the beam
+INDEX_MAX_DRIFT = 10.0  # rebuild an azimuth index early once its points may have turned this far
 angle = 0
+now = 0.0  # sweep time in frames
+range_rings = None  # retained VBO for the range rings
+ppi = None  # ppi_display.PPIRaster the sweep writes its detections into
+ppi_texture = None  # mpca_gl.TextureImage showing it
+carry = None  # radar_cfar.look()'s profiles carried into the next frame
 
 RADIUS_LIMIT = 300
 MAX_TARGETS = 20
-targets = []
-
-# ========== KALMAN FILTER CLASS ==========
-class KalmanFilter2D:
-    def __init__(self, x, y):
-        # State: [x, y, vx, vy]
-        self.state = np.array([[x], [y], [0], [0]], dtype=float)
-        self.P = np.eye(4) * 500
-        self.F = np.array([[1, 0, 1, 0],
-                           [0, 1, 0, 1],
-                           [0, 0, 1, 0],
-                           [0, 0, 0, 1]])
-        self.H = np.array([[1, 0, 0, 0],
-                           [0, 1, 0, 0]])
-        self.R = np.eye(2) * 25
-        self.Q = np.eye(4) * 0.1
-
-    def predict(self):
-        self.state = np.dot(self.F, self.state)
-        self.P = np.dot(self.F, np.dot(self.P, self.F.T)) + self.Q
-        return self.state[0, 0], self.state[1, 0]
-
-    def update(self, x, y):
-        Z = np.array([[x], [y]])
-        Y = Z - np.dot(self.H, self.state)
-        S = np.dot(self.H, np.dot(self.P, self.H.T)) + self.R
-        K = np.dot(self.P, np.dot(self.H.T, np.linalg.inv(S)))
-        self.state = self.state + np.dot(K, Y)
-        I = np.eye(self.F.shape[0])
-        self.P = np.dot((I - np.dot(K, self.H)), self.P)
-
-# ========== MIDPOINT CIRCLE ALGORITHM ==========
-def midpoint_circle_points(x_center, y_center, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    points = []
-    while x >= y:
-        points.extend([
-            (x_center + x, y_center + y),
-            (x_center - x, y_center + y),
-            (x_center + x, y_center - y),
-            (x_center - x, y_center - y),
-            (x_center + y, y_center + x),
-            (x_center - y, y_center + x),
-            (x_center + y, y_center - x),
-            (x_center - y, y_center - x)
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    return points
-
-def draw_circle(x_center, y_center, radius, color=(0.0, 0.8, 0.0)):
-    glColor3f(*color)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(x_center, y_center, radius):
-        glVertex2f(x, y)
-    glEnd()
+TARGET_SPEED = (0.01, 0.06)  # units per frame, along circular courses around the radar
+SNR_DB = 25.0  # on-axis echo SNR of an intensity 1 target (scaled by intensity in dB)
+MEAS_SIGMA = 2.0  # plot position error the tracker assumes (about a range bin)
+CONFIRM_HITS, CONFIRM_LOOKS = 3, 4  # a track is confirmed on 3 hits in its last 4 beam passes
+MAX_MISSES = 3  # beam passes in a row without a detection before a confirmed track is dropped
+TENTATIVE_MISSES = 2  # the same for unconfirmed tracks
+targets = np.zeros((0, 4))  # true targets: rows of (range, azimuth at t=0 (rad), angular speed (rad/frame), intensity)
+fluctuation = np.zeros(0)  # Swerling 1 echo power factor of each target for the current pass
+target_index = None  # beam_sector.AzimuthIndex of the targets
+tracks = None  # track_bank.TrackBank built from the detections
+track_index = None  # beam_sector.AzimuthIndex of the tracks
+detections = np.zeros((0, 2))  # this frame's detections
+updated = 0  # tracks the last step() associated at the beam, plus those it started
 
 # ========== TARGET SYSTEM ==========
-class Target:
-    def __init__(self, x, y, intensity):
-        self.kf = KalmanFilter2D(x, y)
-        self.intensity = intensity
-        self.life = 0
-
-    def update(self):
-        x_pred, y_pred = self.kf.predict()
-        # Random "noise" in real detection
-        x_meas = x_pred + random.uniform(-5, 5)
-        y_meas = y_pred + random.uniform(-5, 5)
-        self.kf.update(x_meas, y_meas)
-        self.life += 1
-        return self.kf.state[0, 0], self.kf.state[1, 0]
-
-def generate_targets():
-    global targets
-    targets = []
-    for _ in range(random.randint(8, MAX_TARGETS)):
-        r = random.uniform(30, RADIUS_LIMIT)
-        theta = random.uniform(0, 2 * math.pi)
-        x = r * math.cos(theta)
-        y = r * math.sin(theta)
-        intensity = random.uniform(0.6, 1.0)
-        targets.append(Target(x, y, intensity))
+# True targets fly circular courses; the tracker only sees the unlabelled
+# CFAR plots of the beam (with misses and false alarms) and keeps its tracks in
+# one TrackBank (stacked Kalman filters, track_bank.py)
+def generate_targets(count=None):
+    global targets, tracks, track_index, ppi, carry, fluctuation
+    count = random.randint(8, MAX_TARGETS) if count is None else count
+    r = np.random.uniform(50, RADIUS_LIMIT, count)
+    omega = np.random.uniform(*TARGET_SPEED, count) / r * np.random.choice([-1.0, 1.0], count)
+    targets = np.stack([r, np.random.uniform(0, 2 * math.pi, count), omega, np.random.uniform(0.6, 1.0, count)], axis=1)
+    tracks = track_bank.TrackBank(q=1e-6, r=MEAS_SIGMA ** 2, p0=MEAS_SIGMA ** 2, pv0=TARGET_SPEED[1] ** 2)
+    track_index = beam_sector.AzimuthIndex([], [])
+    ppi = ppi_display.PPIRaster(RADIUS_LIMIT)
+    carry = None
+    fluctuation = np.random.exponential(1.0, count)
+    index_targets()
+
+def target_positions(ids):
+    r, phase = targets[ids, 0], targets[ids, 1] + targets[ids, 2] * now
+    return r * np.cos(phase), r * np.sin(phase), -targets[ids, 2] * r * np.sin(phase), targets[ids, 2] * r * np.cos(phase)
+
+def index_targets():
+    global target_index
+    x, y, vx, vy = target_positions(slice(None))
+    target_index = beam_sector.AzimuthIndex(x, y, None, vx, vy)
+
+def index_tracks():
+    global track_index
+    ids = tracks.ids()
+    x, y = tracks.extrapolate(ids, now)
+    track_index = beam_sector.AzimuthIndex(x, y, ids, tracks.state[ids, 2], tracks.state[ids, 3])
+
+def in_sector(index, positions, center=None, half_width=BEAM_WIDTH):
+    """Ids of `index` inside a sector (default: the beam), filtered by their current azimuth."""
+    center = angle if center is None else center
+    ids = np.unique(index.sector(center, half_width))
+    x, y = positions(ids)[:2]
+    return ids[beam_sector.angle_diff(beam_sector.azimuth(x, y), center) <= half_width]
+
+def sweep_detections(start):
+    """
+    Unlabelled detections (x, y, amplitude) of the beam swept from `start`:
+    CFAR plots of the range profiles of those azimuths (radar_cfar.py).
+    """
+    global carry
+    columns = ppi.columns(start, angle)
+    step_deg = 360.0 / ppi.azimuth_bins
+    # A target's echo fluctuates from pass to pass: redraw it half a turn from the beam
+    away = in_sector(target_index, target_positions, angle + 180.0, (angle - start) % 360)
+    fluctuation[away] = np.random.exponential(1.0, len(away))
+    lit = in_sector(target_index, target_positions, angle, 2 * BEAM_WIDTH + (angle - start) % 360)
+    x, y = target_positions(lit)[:2]
+    zx, zy, margin_db, carry = radar_cfar.look((columns + 0.5) * step_deg, step_deg, np.hypot(x, y), beam_sector.azimuth(x, y),
+                                               SNR_DB * targets[lit, 3], RADIUS_LIMIT, BEAM_WIDTH,
+                                               fluctuation=fluctuation[lit], previous=carry)
+    return zx, zy, np.clip(0.5 + margin_db / 20.0, 0.0, 1.0)
+
+def step(dt=1.0):
+    """
+    Advance the sweep and track the beam's detections: the tracks in the beam
+    (or whose gate reaches into it) are predicted up to now and associated
+    with the detections (gated GNN, track_association.py); matched tracks
+    are corrected and unmatched detections start new tentative tracks. A
+    track the beam (and its gate margin) has just passed closes a look: it
+    is confirmed on CONFIRM_HITS hits in its last CONFIRM_LOOKS passes and
+    dropped after too many missed passes in a row. Tracks outside the beam
+    keep their last state. The detections are also written into the fading
+    PPI phosphor.
+    """
+    global angle, now, detections, updated
+    now += dt
+    start = angle
+    revolution = angle + SWEEP_SPEED * dt >= 360
+    angle = (angle + SWEEP_SPEED * dt) % 360
+    target_index.age(dt)
+    track_index.age(dt)
+    # Track velocities change with every update, so that index is also renewed once per revolution
+    if target_index.drift > INDEX_MAX_DRIFT:
+        index_targets()
+    if revolution or track_index.drift > INDEX_MAX_DRIFT:
+        index_tracks()
+
+    zx, zy, amp = sweep_detections(start)
+    detections = np.stack([zx, zy], axis=1)
+    ppi.decay(dt)
+    ppi.sweep(start, angle, np.hypot(zx, zy), np.clip(amp, 0.0, 1.0))
+    track_positions = lambda i: tracks.extrapolate(i, now)
+    ids = in_sector(track_index, track_positions, angle, BEAM_WIDTH + GATE_MARGIN)
+    ids = ids[tracks.alive[ids]]
+    tracks.predict_to(ids, now)
+    x, y = tracks.positions(ids)
+    reach = np.degrees(track_association.gate_reach(tracks, ids) / np.maximum(np.hypot(x, y), 1.0))
+    ids = ids[beam_sector.angle_diff(beam_sector.azimuth(x, y), angle) <= BEAM_WIDTH + np.minimum(reach, GATE_MARGIN)]
+    ti, di = track_association.associate(tracks, ids, zx, zy)
+
+    hit = ids[ti]
+    tracks.update(hit, zx[di], zy[di])
+    tracks.intensity[hit] = 0.5 * (tracks.intensity[hit] + amp[di])
+
+    # Tracks whose widest gate window the beam left this frame close a look (beam pass)
+    sweep = SWEEP_SPEED * dt
+    window = BEAM_WIDTH + GATE_MARGIN
+    left = in_sector(track_index, track_positions, angle - window - sweep / 2, sweep / 2)
+    left = left[tracks.alive[left]]
+    tracks.end_look(left, tracks.updated[left] >= now - 2 * window / SWEEP_SPEED - dt)
+    tracks.confirmed[left] |= tracks.hits_in(left, CONFIRM_LOOKS) >= CONFIRM_HITS
+    tracks.remove(left[tracks.misses[left] >= np.where(tracks.confirmed[left], MAX_MISSES, TENTATIVE_MISSES)])
+
+    new = np.setdiff1d(np.arange(len(zx)), di)
+    born = tracks.add(zx[new], zy[new], amp[new], now=now)
+    track_index.insert(born, zx[new], zy[new])
+    updated = len(ids) + len(born)
 
 # ========== DRAWING SYSTEM ==========
-def draw_radar_beam(angle):
-    glColor3f(0.0, 1.0, 0.0)
-    glBegin(GL_TRIANGLE_FAN)
-    glVertex2f(0, 0)
-    for a in range(int(angle - 2), int(angle + 2)):
-        x = RADIUS_LIMIT * math.cos(math.radians(a))
-        y = RADIUS_LIMIT * math.sin(math.radians(a))
-        glVertex2f(x, y)
-    glEnd()
+def draw_ppi():
+    # Beam trail and raw detections: the phosphor, scan-converted into one texture
+    global ppi_texture
+    if ppi_texture is None:
+        ppi_texture = mpca_gl.TextureImage()
+    ppi_texture.set_image(ppi.rgba())
+    ppi_texture.draw(*ppi.origin, scale=ppi.scale)
 
 def draw_targets():
+    # AI filtering: only show confirmed, high-intensity tracks
+    ids = tracks.ids()
+    shown = ids[tracks.confirmed[ids] & (tracks.intensity[ids] > 0.7)]
     glPointSize(5)
-    glBegin(GL_POINTS)
-    for t in targets:
-        x, y = t.update()
-        # AI filtering: only show persistent, high-intensity detections
-        if t.life > 5 and t.intensity > 0.7:
-            glColor3f(0.0, 1.0, 0.0)
-            glVertex2f(x, y)
-    glEnd()
+    mpca_gl.draw_vertices(GL_POINTS, np.stack(tracks.extrapolate(shown, now), axis=1), (0.0, 1.0, 0.0))
 
 # ========== DISPLAY ==========
 def display():
-    global angle
+    global range_rings
+    step()
     glClear(GL_COLOR_BUFFER_BIT)
     glLoadIdentity()
 
-    # Draw radar rings
-    for r in range(50, RADIUS_LIMIT + 1, 50):
-        draw_circle(0, 0, r, (0.0, 0.3, 0.0))
+    # Draw the PPI phosphor (rotating beam and detections)
+    draw_ppi()
 
-    # Draw rotating beam
-    draw_radar_beam(angle)
+    # Draw radar rings (static, uploaded once into a VBO)
+    if range_rings is None:
+        range_rings = mpca_gl.CircleBatch()
+        range_rings.set_circles([(0, 0, r) for r in range(50, RADIUS_LIMIT + 1, 50)], (0.0, 0.3, 0.0))
+    range_rings.draw()
 
     # Draw AI-filtered targets
     draw_targets()
 
     glutSwapBuffers()
-    angle = (angle + SWEEP_SPEED) % 360
 
 def timer(value):
     glutPostRedisplay()
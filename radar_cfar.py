@@ -0,0 +1,205 @@
+"""
+radar_cfar.py
+
+Synthetic range profiles and a vectorized CFAR detector for the radar scanners.
+
+Each beam position returns a range profile of RANGE_BINS square-law power
+samples, the length air_filter.RadarDenoiser takes. A sweep is a matrix of
+profiles, one row per azimuth:
+
+- range_profiles() builds it: exponentially distributed receiver noise,
+  ground clutter whose mean falls off with range, and the targets' echoes
+  (weighted by the beam pattern, fluctuating from look to look) added at
+  their range bins
+- cfar() thresholds every cell against its own neighbourhood along range,
+  skipping GUARD cells either side and averaging TRAINING cells beyond:
+  cell averaging ('ca') takes the window sums from one cumulative sum per
+  row, ordered statistic ('os') takes the OS_RANK-th smallest training cell
+  (every cell's training window gathered and sorted), which holds up better next to clutter edges
+  and close targets. Windows are cut short at the ends of a profile and the
+  threshold factor follows the number of cells left, so the false-alarm
+  rate stays PFA everywhere
+- plots() reduces the detected cells beyond the minimum range (BLIND_BINS)
+  to one plot per local power peak, and detect() turns those into positions
+- look() does all of it for the azimuths a beam swept in one frame, plus one
+  neighbouring azimuth either side that is only used to judge the peaks, so
+  a target is plotted once per pass rather than once per frame it is lit;
+  those neighbours are carried over from the previous frame's profiles
+  rather than simulated again
+
+Every step works on the whole matrix at once, however many rows the sweep
+covered this frame.
+
+Dependencies:
+- numpy
+- beam_sector.py (angle_diff)
+"""
+
+import numpy as np
+import beam_sector
+
+RANGE_BINS = 100       # samples per range profile, as air_filter.RadarDenoiser takes
+NOISE_POWER = 1.0
+CLUTTER_DB = 20.0      # clutter-to-noise ratio at zero range
+CLUTTER_RANGE = 0.04   # fraction of the maximum range over which the clutter falls by 1/e
+BLIND_BINS = 10        # minimum range: the first bins are blanked (transmit pulse, strongest clutter)
+GUARD = 2              # cells skipped either side of the cell under test
+TRAINING = 12          # cells averaged / ranked either side beyond the guard cells
+PFA = 1e-4             # false-alarm probability per cell
+OS_RANK = 0.75         # rank of the OS-CFAR noise estimate, as a fraction of the training cells
+
+_os_scales = {}
+
+
+# ---------------- Range profiles ------------------
+def range_profiles(azimuths, target_range, target_azimuth, snr_db, max_range, beam_width,
+                   noise_power=NOISE_POWER, clutter_db=CLUTTER_DB, fluctuation=None):
+    """
+    Power profiles (len(azimuths), RANGE_BINS) of a beam pointing at each of
+    `azimuths` (degrees). Targets are given in polar form with their SNR on
+    the beam axis; the beam pattern falls to half power `beam_width` degrees
+    off axis. Each target's echo power is scaled by its `fluctuation`
+    (Swerling 1: one exponential draw per target and beam pass, which the
+    caller keeps while the pass lasts); without it one is drawn per call.
+    """
+    azimuths = np.atleast_1d(np.asarray(azimuths, dtype=np.float64))
+    r = (np.arange(RANGE_BINS) + 0.5) / RANGE_BINS
+    clutter = 10 ** (clutter_db / 10) * np.exp(-r / CLUTTER_RANGE)
+    power = noise_power * (1.0 + clutter) * np.random.exponential(1.0, (len(azimuths), RANGE_BINS))
+
+    target_range = np.asarray(target_range, dtype=np.float64)
+    bins = np.floor(target_range * (RANGE_BINS / max_range)).astype(np.int64)
+    keep = (bins >= 0) & (bins < RANGE_BINS)
+    if keep.any():
+        off = beam_sector.angle_diff(np.asarray(target_azimuth)[keep][None, :], azimuths[:, None])
+        if fluctuation is None:
+            fluctuation = np.random.exponential(1.0, len(keep))
+        echo = 10 ** (np.asarray(snr_db, dtype=np.float64)[keep] / 10) * np.broadcast_to(fluctuation, keep.shape)[keep]
+        rows = np.repeat(np.arange(len(azimuths)), keep.sum())
+        np.add.at(power, (rows, np.tile(bins[keep], len(azimuths))),
+                  (noise_power * echo * 2.0 ** (-(off / beam_width) ** 2)).ravel())
+    return power
+
+
+# ---------------- CFAR ------------------
+def _windows(n, guard, training):
+    """Bounds of the leading [a0, a1) and lagging [b0, b1) training windows of every cell."""
+    i = np.arange(n)
+    a0, a1 = np.clip(i - guard - training, 0, n), np.clip(i - guard, 0, n)
+    b0, b1 = np.clip(i + guard + 1, 0, n), np.clip(i + guard + training + 1, 0, n)
+    return a0, a1, b0, b1
+
+
+def os_scale(cells, rank, pfa=PFA):
+    """
+    Threshold factor T of OS-CFAR on `cells` training cells ranked at `rank`
+    (1-based): Pfa = prod_{i<rank} (cells - i) / (cells - i + T), solved by
+    bisection and cached.
+    """
+    key = (cells, rank, pfa)
+    if key not in _os_scales:
+        i = np.arange(rank)
+        lo, hi = 0.0, 1.0
+        while np.prod((cells - i) / (cells - i + hi)) > pfa:
+            hi *= 2.0
+        for _ in range(60):
+            mid = 0.5 * (lo + hi)
+            if np.prod((cells - i) / (cells - i + mid)) > pfa:
+                lo = mid
+            else:
+                hi = mid
+        _os_scales[key] = hi
+    return _os_scales[key]
+
+
+def cfar(power, method='ca', guard=GUARD, training=TRAINING, pfa=PFA):
+    """
+    CFAR detection along the last axis (range) of `power`.
+    Returns (hits, threshold), both shaped like power.
+    """
+    power = np.asarray(power, dtype=np.float64)
+    n = power.shape[-1]
+    a0, a1, b0, b1 = _windows(n, guard, training)
+    count = (a1 - a0) + (b1 - b0)
+    if method == 'ca':
+        # Window sums from one cumulative sum; scale alpha = N (Pfa^(-1/N) - 1) on the mean
+        c = np.concatenate([np.zeros(power.shape[:-1] + (1,)), np.cumsum(power, axis=-1)], axis=-1)
+        total = c[..., a1] - c[..., a0] + c[..., b1] - c[..., b0]
+        threshold = (pfa ** (-1.0 / count) - 1.0) * total
+    elif method == 'os':
+        # Every cell's training cells as one gather; cut-short windows are padded with +inf,
+        # which ranks them last, and the rank follows the cells actually there
+        offset = np.concatenate([np.arange(-guard - training, -guard), np.arange(guard + 1, guard + training + 1)])
+        index = np.arange(n)[:, None] + offset
+        valid = (index >= 0) & (index < n)
+        cells = np.where(valid, power[..., np.clip(index, 0, n - 1)], np.inf)
+        rank = np.maximum(np.round(OS_RANK * count).astype(np.int64), 1)
+        ranked = np.sort(cells, axis=-1)  # faster than a partition at the ~10 distinct ranks
+        estimate = np.take_along_axis(ranked, np.broadcast_to(rank - 1, power.shape)[..., None], axis=-1)[..., 0]
+        scale = np.array([os_scale(int(k), int(q), pfa) for k, q in zip(count, rank)])
+        threshold = scale * estimate
+    else:
+        raise ValueError("unknown CFAR method %r (use 'ca' or 'os')" % method)
+    return power > threshold, threshold
+
+
+def plots(power, hits, edge=0):
+    """
+    One plot per detected cell beyond BLIND_BINS that is the strongest of
+    its 3 x 3 (azimuth x range) neighbourhood; the first and last `edge`
+    rows only serve as neighbours. Returns (row, range_bin) index arrays.
+    """
+    padded = np.pad(np.asarray(power, dtype=np.float64), 1, constant_values=-np.inf)
+    peak = hits.copy()
+    peak[:, :BLIND_BINS] = False
+    peak[:edge] = peak[len(peak) - edge:] = False
+    rows, cols = power.shape
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dy or dx:
+                neighbour = padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols]
+                # ties go to the earlier cell so a flat peak still gives one plot
+                peak &= (power > neighbour) if (dy, dx) < (0, 0) else (power >= neighbour)
+    return np.nonzero(peak)
+
+
+def detect(azimuths, power, max_range, method='ca', edge=0):
+    """
+    CFAR plots of the profiles `power` taken at `azimuths`, as (x, y,
+    margin_db): the centre of each peak cell and how far its power clears
+    the threshold.
+    """
+    azimuths = np.atleast_1d(np.asarray(azimuths, dtype=np.float64))
+    hits, threshold = cfar(power, method)
+    row, cell = plots(power, hits, edge)
+    r = (cell + 0.5) * (max_range / power.shape[-1])
+    phase = np.radians(azimuths[row])
+    return r * np.cos(phase), r * np.sin(phase), 10 * np.log10(power[row, cell] / threshold[row, cell])
+
+
+def look(azimuths, step, target_range, target_azimuth, snr_db, max_range, beam_width, method='ca',
+         fluctuation=None, previous=None):
+    """
+    Plots (x, y, margin_db) of one frame of the sweep: the beam pointing at
+    each of `azimuths` (`step` degrees apart) over the given targets, plus
+    the frame's carry.
+
+    Pass the last frame's carry as `previous`: when this frame continues
+    where that one stopped, its last profile and the one beyond it are
+    reused as this frame's left neighbour and first azimuth instead of being
+    drawn again with fresh noise, so a peak on the boundary is judged on the
+    same samples from both sides (plotted once, never twice or not at all).
+    That needs the targets' `fluctuation` (see range_profiles) to hold for
+    the whole pass.
+    """
+    azimuths = np.atleast_1d(np.asarray(azimuths, dtype=np.float64))
+    padded = np.concatenate([azimuths[:1] - step, azimuths, azimuths[-1:] + step])
+    if previous is not None and beam_sector.angle_diff(previous[0] + step, azimuths[0]) < 0.5 * step:
+        fresh = range_profiles(padded[2:], target_range, target_azimuth, snr_db, max_range, beam_width,
+                               fluctuation=fluctuation)
+        power = np.concatenate([previous[1], fresh])
+    else:
+        power = range_profiles(padded, target_range, target_azimuth, snr_db, max_range, beam_width,
+                               fluctuation=fluctuation)
+    x, y, margin_db = detect(padded, power, max_range, method, edge=1)
+    return x, y, margin_db, (azimuths[-1], power[-2:])
@@ -1,53 +1,35 @@
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
-import math, random, time
+import math, random, sys, time
+import numpy as np
+import beam_sector
+import ppi_display
+import radar_cfar
+import render_backend
 
 # Window parameters
 WIDTH, HEIGHT = 800, 800
 SWEEP_SPEED = 1.5  # degrees per frame
+BEAM_WIDTH = 2.0  # degrees either side of the beam angle
 angle = 0
-targets = []
+backend = None  # render_backend.GLBackend, or SoftwareBackend when run headless
+targets = np.zeros((0, 3))  # rows of (x, y, intensity)
+sector_index = None  # beam_sector.AzimuthIndex of the targets
+detected = np.zeros((0, 2))  # (x, y) of the CFAR plots of the current frame
+updated = 0  # targets the last step() simulated echoes of (those near the beam)
+ppi = None  # ppi_display.PPIRaster the sweep writes its returns into
+carry = None  # radar_cfar.look()'s profiles carried into the next frame
+fluctuation = np.zeros(0)  # Swerling 1 echo power factor of each target for the current pass
 
 # Parameters for target generation
 MAX_TARGETS = 20
 RADIUS_LIMIT = 300
-
-# --- Midpoint Circle Algorithm ---
-def midpoint_circle_points(x_center, y_center, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    points = []
-    while x >= y:
-        points.extend([
-            (x_center + x, y_center + y),
-            (x_center - x, y_center + y),
-            (x_center + x, y_center - y),
-            (x_center - x, y_center - y),
-            (x_center + y, y_center + x),
-            (x_center - y, y_center + x),
-            (x_center + y, y_center - x),
-            (x_center - y, y_center - x)
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    return points
-
-def draw_circle(x_center, y_center, radius, color=(0.0, 0.8, 0.0)):
-    glColor3f(*color)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(x_center, y_center, radius):
-        glVertex2f(x, y)
-    glEnd()
+SNR_DB = (8.0, 25.0)  # on-axis echo SNR of intensity 0 and 1 targets
 
 # --- Random Targets ---
 def generate_targets():
-    global targets
+    global targets, sector_index, ppi, carry, fluctuation
     targets = []
     for _ in range(random.randint(10, MAX_TARGETS)):
         r = random.uniform(30, RADIUS_LIMIT)
@@ -56,56 +38,73 @@ def generate_targets():
         y = r * math.sin(theta)
         intensity = random.random()
         targets.append((x, y, intensity))
+    targets = np.array(targets).reshape(-1, 3)
+    sector_index = beam_sector.AzimuthIndex(targets[:, 0], targets[:, 1])
+    ppi = ppi_display.PPIRaster(RADIUS_LIMIT)
+    carry = None
+    fluctuation = np.random.exponential(1.0, len(targets))
 
-# --- Radar Sweep Beam ---
-def draw_radar_beam(angle):
-    glColor3f(0.0, 1.0, 0.0)
-    glBegin(GL_TRIANGLE_FAN)
-    glVertex2f(0, 0)
-    for a in range(int(angle - 2), int(angle + 2)):
-        x = RADIUS_LIMIT * math.cos(math.radians(a))
-        y = RADIUS_LIMIT * math.sin(math.radians(a))
-        glVertex2f(x, y)
-    glEnd()
+# --- Simulation Step ---
+def step(dt=1.0):
+    """
+    Advance the sweep by `dt` frames, detect the targets in the range
+    profiles of the azimuths swept (radar_cfar.py) and write the plots into
+    the fading PPI phosphor.
+    """
+    global angle, detected, updated, carry
+    start = angle
+    angle = (angle + SWEEP_SPEED * dt) % 360
+    columns = ppi.columns(start, angle)
+    step_deg = 360.0 / ppi.azimuth_bins
+    # A target's echo fluctuates from pass to pass: redraw it half a turn from the beam
+    away = sector_index.sector(angle + 180.0, SWEEP_SPEED * dt)
+    fluctuation[away] = np.random.exponential(1.0, len(away))
+    ids = sector_index.sector(angle, 2 * BEAM_WIDTH + SWEEP_SPEED * dt)
+    lit = targets[ids]
+    updated = len(lit)
+    x, y, margin_db, carry = radar_cfar.look((columns + 0.5) * step_deg, step_deg,
+                                             np.hypot(lit[:, 0], lit[:, 1]), beam_sector.azimuth(lit[:, 0], lit[:, 1]),
+                                             SNR_DB[0] + (SNR_DB[1] - SNR_DB[0]) * lit[:, 2], RADIUS_LIMIT, BEAM_WIDTH,
+                                             fluctuation=fluctuation[ids], previous=carry)
+    detected = np.stack([x, y], axis=1)
+    ppi.decay(dt)
+    ppi.sweep(start, angle, np.hypot(x, y), np.clip(0.5 + margin_db / 20.0, 0.0, 1.0))
 
-# --- Target Dots ---
-def draw_targets():
-    glPointSize(5)
-    glBegin(GL_POINTS)
-    for (x, y, intensity) in targets:
-        if random.random() < intensity * 0.7:  # simulate noise detection
-            glColor3f(0.0, 1.0, 0.0)
-            glVertex2f(x, y)
-    glEnd()
+# --- PPI Phosphor (beam trail and target returns) ---
+def draw_ppi():
+    backend.image('ppi', ppi.rgba(), *ppi.origin, scale=ppi.scale)
 
 # --- Display Function ---
 def display():
-    global angle
-    glClear(GL_COLOR_BUFFER_BIT)
-    glLoadIdentity()
-
-    # Draw Radar Circles
-    for r in range(50, RADIUS_LIMIT + 1, 50):
-        draw_circle(0, 0, r, (0.0, 0.4, 0.0))
+    step()
+    backend.clear((0.0, 0.0, 0.0, 1.0))
 
-    # Draw Beam
-    draw_radar_beam(angle)
+    # Draw Beam and Targets (one scan-converted phosphor image)
+    draw_ppi()
 
-    # Draw Targets
-    draw_targets()
+    # Draw Radar Circles (static, retained by the backend)
+    backend.circles('range_rings', [(0, 0, r) for r in range(50, RADIUS_LIMIT + 1, 50)], (0.0, 0.4, 0.0), point_size=1)
 
-    glutSwapBuffers()
-    angle = (angle + SWEEP_SPEED) % 360
+    backend.present()
 
 def timer(value):
     glutPostRedisplay()
     glutTimerFunc(33, timer, 0)
 
+def run_headless(frames, dump_dir=None):
+    """Run the sweep offscreen into a software framebuffer."""
+    global backend
+    backend = render_backend.SoftwareBackend(WIDTH, HEIGHT, ortho=(-400, 400, -400, 400), blend=False)
+    generate_targets()
+    render_backend.run_frames(backend, display, frames, dump_dir)
+
 def main():
+    global backend
     glutInit()
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB)
     glutInitWindowSize(WIDTH, HEIGHT)
     glutCreateWindow(b"Radar Scanner Simulation - Midpoint Circle Algorithm")
+    backend = render_backend.GLBackend()
     glClearColor(0.0, 0.0, 0.0, 1.0)
     gluOrtho2D(-400, 400, -400, 400)
     generate_targets()
@@ -114,4 +113,8 @@ def main():
     glutMainLoop()
 
 if __name__ == "__main__":
-    main()
+    args = render_backend.parse_headless_args(sys.argv)
+    if args:
+        run_headless(args.headless, args.dump)
+    else:
+        main()
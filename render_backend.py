@@ -0,0 +1,386 @@
+"""
+render_backend.py
+
+Pluggable render backends for the 2D simulations.
+
+Scenes draw through a small backend API instead of calling OpenGL directly:
+
+    clear(color)                      points(pts, colors, size)
+    lines(verts, color)               line_loop(verts, color)
+    quads(verts, colors)              polygon(verts, color) / triangle_fan(verts, color)
+    circles(name, circles, colors)    annuli(name, rings, colors)
+    image(name, rgba, x, y, version, region, scale)
+    text(x, y, text, color)
+    set_view(left, right, bottom, top)
+    present()
+
+`GLBackend` issues the OpenGL calls (MPCA circles and annuli go through the
+retained VBO batches of mpca_gl, images through one retained texture each). `SoftwareBackend` rasterizes the same calls
+into a NumPy RGBA framebuffer with GL_SRC_ALPHA / GL_ONE_MINUS_SRC_ALPHA
+blending, so a scene can run N frames on a headless box and dump frames or
+checksums.
+
+Dependencies:
+- numpy
+- PyOpenGL (GLBackend only)
+"""
+
+import argparse
+import os
+import random
+import zlib
+import numpy as np
+import mpca
+
+
+def _rgba(colors, count):
+    """Broadcast one colour or per-item colours (RGB or RGBA) to float32 (count, 4)."""
+    colors = np.asarray(colors, dtype=np.float32)
+    if colors.shape[-1] == 3:
+        colors = np.concatenate([colors, np.ones(colors.shape[:-1] + (1,), dtype=np.float32)], axis=-1)
+    return np.ascontiguousarray(np.broadcast_to(colors, (count, 4)))
+
+
+def circle_polygon(xc, yc, radius, segments=64):
+    """Vertices of a regular polygon approximating a circle."""
+    theta = np.linspace(0.0, 2.0 * np.pi, segments, endpoint=False)
+    return np.stack([xc + radius * np.cos(theta), yc + radius * np.sin(theta)], axis=1)
+
+
+# ---------------- Software framebuffer ------------------
+class SoftwareBackend:
+    """
+    Rasterize scene draw calls into a float32 (height, width, 4) framebuffer.
+
+    World coordinates are mapped to pixels through an orthographic window
+    (left, right, bottom, top), the same rectangle the scene hands to
+    gluOrtho2D. Row 0 of the framebuffer is the bottom row, as in OpenGL.
+    """
+
+    def __init__(self, width, height, ortho=None, blend=True):
+        self.width = width
+        self.height = height
+        self.ortho = ortho or (0, width, 0, height)
+        self.blend = blend
+        self.frame = np.zeros((height, width, 4), dtype=np.float32)
+        self.frames = 0
+        self._circles = {}
+
+    # --- coordinate mapping ---
+    def to_window(self, verts):
+        left, right, bottom, top = self.ortho
+        verts = np.asarray(verts, dtype=np.float64).reshape(-1, 2)
+        wx = (verts[:, 0] - left) * (self.width / (right - left))
+        wy = (verts[:, 1] - bottom) * (self.height / (top - bottom))
+        return wx, wy
+
+    # --- blending ---
+    def _blend(self, py, px, rgba):
+        """Blend rgba[i] into pixel (py[i], px[i]) in draw order, like GL does."""
+        inside = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height)
+        py, px, rgba = py[inside], px[inside], rgba[inside]
+        if not len(px):
+            return
+        if not self.blend:
+            self.frame[py, px] = rgba
+            return
+        # Pixels hit more than once are blended pass by pass, in order
+        key = py.astype(np.int64) * self.width + px
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        starts = np.r_[0, np.flatnonzero(sorted_key[1:] != sorted_key[:-1]) + 1]
+        rank = np.empty(len(key), dtype=np.int64)
+        rank[order] = np.arange(len(key)) - np.repeat(starts, np.diff(np.r_[starts, len(key)]))
+        for r in range(int(rank.max()) + 1):
+            sel = rank == r
+            src = rgba[sel]
+            a = src[:, 3:4]
+            dst = self.frame[py[sel], px[sel]]
+            self.frame[py[sel], px[sel]] = src * a + dst * (1.0 - a)
+
+    # --- backend API ---
+    def clear(self, color=(0.0, 0.0, 0.0, 1.0)):
+        self.frame[:] = _rgba(color, 1)[0]
+
+    def points(self, pts, colors, size=1):
+        wx, wy = self.to_window(pts)
+        if not len(wx):
+            return
+        rgba = _rgba(colors, len(wx))
+        x0 = np.floor(wx - size / 2.0 + 0.5).astype(np.int64)
+        y0 = np.floor(wy - size / 2.0 + 0.5).astype(np.int64)
+        d = np.arange(int(size))
+        px = (x0[:, None, None] + d[None, None, :]).repeat(len(d), axis=1)
+        py = (y0[:, None, None] + d[None, :, None]).repeat(len(d), axis=2)
+        self._blend(py.reshape(-1), px.reshape(-1), np.repeat(rgba, len(d) * len(d), axis=0))
+
+    def spans(self, spans, color):
+        """(y, x0, x1) runs in world units; assumes one world unit per pixel."""
+        left, _, bottom, _ = self.ortho
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 3)
+        lengths = np.maximum(spans[:, 2] - spans[:, 1] + 1, 0)
+        py = np.repeat(spans[:, 0] - int(bottom), lengths)
+        px = np.repeat(spans[:, 1] - int(left), lengths) + np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        self._blend(py, px, _rgba(color, len(px)))
+
+    def lines(self, verts, color):
+        """Independent segments, vertices taken in pairs (GL_LINES)."""
+        wx, wy = self.to_window(verts)
+        x0, y0, x1, y1 = wx[0::2], wy[0::2], wx[1::2], wy[1::2]
+        steps = np.maximum(np.ceil(np.maximum(np.abs(x1 - x0), np.abs(y1 - y0))).astype(np.int64), 1)
+        seg = np.repeat(np.arange(len(steps)), steps)
+        t = (np.arange(int(steps.sum())) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[seg]
+        px = np.floor(x0[seg] + (x1 - x0)[seg] * t).astype(np.int64)
+        py = np.floor(y0[seg] + (y1 - y0)[seg] * t).astype(np.int64)
+        self._blend(py, px, _rgba(color, len(px)))
+
+    def line_loop(self, verts, color):
+        verts = np.asarray(verts, dtype=np.float64).reshape(-1, 2)
+        self.lines(np.stack([verts, np.roll(verts, -1, axis=0)], axis=1).reshape(-1, 2), color)
+
+    def polygon(self, verts, color):
+        """Fill a convex polygon (GL_POLYGON / GL_TRIANGLE_FAN around its first vertex)."""
+        wx, wy = self.to_window(verts)
+        if len(wx) < 3:
+            return
+        x_lo = max(int(np.floor(wx.min())), 0)
+        x_hi = min(int(np.ceil(wx.max())), self.width)
+        y_lo = max(int(np.floor(wy.min())), 0)
+        y_hi = min(int(np.ceil(wy.max())), self.height)
+        if x_lo >= x_hi or y_lo >= y_hi:
+            return
+        cx = np.arange(x_lo, x_hi) + 0.5
+        cy = np.arange(y_lo, y_hi)[:, None] + 0.5
+        ex, ey = np.roll(wx, -1) - wx, np.roll(wy, -1) - wy
+        area = np.sum(wx * np.roll(wy, -1) - np.roll(wx, -1) * wy)
+        sign = 1.0 if area >= 0 else -1.0
+        inside = np.ones((y_hi - y_lo, x_hi - x_lo), dtype=bool)
+        for i in range(len(wx)):
+            inside &= sign * (ex[i] * (cy - wy[i]) - ey[i] * (cx - wx[i])) >= 0
+        py, px = np.nonzero(inside)
+        self._blend(py + y_lo, px + x_lo, _rgba(color, len(px)))
+
+    triangle_fan = polygon
+
+    def quads(self, verts, colors, max_extent=32, chunk=4096):
+        """
+        Fill convex quads in order. Small quads (cars, bars) are rasterized
+        together, `chunk` at a time, over a shared window as large as the
+        biggest quad's bounding box.
+        """
+        verts = np.asarray(verts, dtype=np.float64).reshape(-1, 4, 2)
+        rgba = _rgba(colors, len(verts))
+        if not len(verts):
+            return
+        wx, wy = self.to_window(verts.reshape(-1, 2))
+        wx, wy = wx.reshape(-1, 4), wy.reshape(-1, 4)
+        x_lo = np.floor(wx.min(axis=1)).astype(np.int64)
+        y_lo = np.floor(wy.min(axis=1)).astype(np.int64)
+        extent = int(max((np.ceil(wx.max(axis=1)) - x_lo).max(), (np.ceil(wy.max(axis=1)) - y_lo).max()))
+        if extent > max_extent:
+            for quad, color in zip(verts, rgba):
+                self.polygon(quad, color)
+            return
+
+        ex, ey = np.roll(wx, -1, axis=1) - wx, np.roll(wy, -1, axis=1) - wy
+        area = np.sum(wx * np.roll(wy, -1, axis=1) - np.roll(wx, -1, axis=1) * wy, axis=1)
+        sign = np.where(area >= 0, 1.0, -1.0)
+        d = np.arange(extent) + 0.5
+        for lo in range(0, len(verts), chunk):
+            sl = slice(lo, lo + chunk)
+            cx = (x_lo[sl, None] + d)[:, None, :]
+            cy = (y_lo[sl, None] + d)[:, :, None]
+            inside = np.ones((len(cx), extent, extent), dtype=bool)
+            for i in range(4):
+                inside &= sign[sl, None, None] * (ex[sl, i, None, None] * (cy - wy[sl, i, None, None])
+                                                  - ey[sl, i, None, None] * (cx - wx[sl, i, None, None])) >= 0
+            q, iy, ix = np.nonzero(inside)
+            q += lo
+            self._blend(y_lo[q] + iy, x_lo[q] + ix, rgba[q])
+
+    def circles(self, name, circles, colors, width=None, height=None, point_size=None):
+        """MPCA circle outlines; `name` identifies the retained set (see GLBackend)."""
+        circles = np.asarray(circles, dtype=np.float64).reshape(-1, 3)
+        colors = _rgba(colors, len(circles))
+        key = (circles.tobytes(), width, height)
+        cached = self._circles.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, mpca.midpoint_circle_batch(circles, width, height))
+            self._circles[name] = cached
+        points, offsets = cached[1]
+        self.points(points, np.repeat(colors, np.diff(offsets), axis=0), point_size or 1)
+
+    def annuli(self, name, rings, colors, width=None, height=None):
+        """Filled MPCA (xc, yc, inner, outer) rings, drawn in order."""
+        rings = np.asarray(rings, dtype=np.float64).reshape(-1, 4)
+        colors = _rgba(colors, len(rings))
+        spans, offsets = mpca.annulus_spans_batch(rings, width, height)
+        for i in range(len(rings)):
+            self.spans(spans[offsets[i]:offsets[i + 1]], colors[i])
+
+    def image(self, name, rgba, x=0, y=0, version=None, region=None, scale=1.0):
+        """
+        Blend a (height, width, 4) uint8 image, row 0 at the bottom, at world
+        (x, y) with `scale` world units per texel (nearest-texel sampling).
+        """
+        left, right, bottom, top = self.ortho
+        kx = scale * self.width / (right - left)
+        ky = scale * self.height / (top - bottom)
+        src = np.asarray(rgba)
+        h, w = src.shape[:2]
+        if kx == 1.0 and ky == 1.0:
+            x0, y0 = int(round(x - left)), int(round(y - bottom))
+            fx0, fy0 = max(x0, 0), max(y0, 0)
+            fx1, fy1 = min(x0 + w, self.width), min(y0 + h, self.height)
+            if fx0 >= fx1 or fy0 >= fy1:
+                return
+            src = src[fy0 - y0:fy1 - y0, fx0 - x0:fx1 - x0]
+        else:
+            wx, wy = self.to_window((x, y))
+            fx0, fy0 = max(int(np.floor(wx[0])), 0), max(int(np.floor(wy[0])), 0)
+            fx1, fy1 = min(int(np.ceil(wx[0] + w * kx)), self.width), min(int(np.ceil(wy[0] + h * ky)), self.height)
+            if fx0 >= fx1 or fy0 >= fy1:
+                return
+            cols = np.clip(np.floor((np.arange(fx0, fx1) + 0.5 - wx[0]) / kx).astype(np.int64), 0, w - 1)
+            rows = np.clip(np.floor((np.arange(fy0, fy1) + 0.5 - wy[0]) / ky).astype(np.int64), 0, h - 1)
+            src = src[rows][:, cols]
+        src = src.astype(np.float32) / 255.0
+        dst = self.frame[fy0:fy1, fx0:fx1]
+        if self.blend:
+            a = src[..., 3:4]
+            dst[:] = src * a + dst * (1.0 - a)
+        else:
+            dst[:] = src
+
+    def text(self, x, y, text, color=(1.0, 1.0, 1.0), font=None):
+        pass
+
+    def set_view(self, left, right, bottom, top):
+        """Map the world rectangle onto the framebuffer from now on (gluOrtho2D)."""
+        self.ortho = (left, right, bottom, top)
+
+    def present(self):
+        self.frames += 1
+
+    # --- output ---
+    def rgb8(self):
+        """Top-down uint8 RGB copy of the framebuffer."""
+        rgb = np.clip(self.frame[::-1, :, :3] * 255.0 + 0.5, 0, 255)
+        return rgb.astype(np.uint8)
+
+    def checksum(self):
+        return zlib.crc32(self.rgb8().tobytes())
+
+    def save_ppm(self, path):
+        with open(path, 'wb') as f:
+            f.write(b'P6 %d %d 255\n' % (self.width, self.height))
+            f.write(self.rgb8().tobytes())
+
+
+# ---------------- OpenGL ------------------
+class GLBackend:
+    """Forward the backend API to OpenGL in the current GLUT context."""
+
+    def __init__(self):
+        from OpenGL import GL, GLUT
+        import mpca_gl
+        self.GL, self.GLUT, self.mpca_gl = GL, GLUT, mpca_gl
+        self._batches = {}
+
+    def _batch(self, name, cls):
+        batch = self._batches.get(name)
+        if batch is None:
+            batch = self._batches[name] = cls()
+        return batch
+
+    def _draw(self, mode, verts, colors):
+        self.mpca_gl.draw_vertices(mode, verts, colors)
+
+    def clear(self, color=(0.0, 0.0, 0.0, 1.0)):
+        self.GL.glClear(self.GL.GL_COLOR_BUFFER_BIT | self.GL.GL_DEPTH_BUFFER_BIT)
+        self.GL.glLoadIdentity()
+
+    def points(self, pts, colors, size=1):
+        self.GL.glPointSize(size)
+        self._draw(self.GL.GL_POINTS, pts, colors)
+
+    def spans(self, spans, color):
+        self._draw(self.GL.GL_LINES, mpca.span_lines(spans), color)
+
+    def lines(self, verts, color):
+        self._draw(self.GL.GL_LINES, verts, color)
+
+    def line_loop(self, verts, color):
+        self._draw(self.GL.GL_LINE_LOOP, verts, color)
+
+    def polygon(self, verts, color):
+        self._draw(self.GL.GL_POLYGON, verts, color)
+
+    def triangle_fan(self, verts, color):
+        self._draw(self.GL.GL_TRIANGLE_FAN, verts, color)
+
+    def quads(self, verts, colors):
+        verts = np.asarray(verts, dtype=np.float32).reshape(-1, 4, 2)
+        self._draw(self.GL.GL_QUADS, verts, np.repeat(_rgba(colors, len(verts)), 4, axis=0))
+
+    def circles(self, name, circles, colors, width=None, height=None, point_size=None):
+        batch = self._batch(name, self.mpca_gl.CircleBatch)
+        batch.set_circles(circles, colors, width, height)
+        batch.draw(point_size=point_size)
+
+    def annuli(self, name, rings, colors, width=None, height=None):
+        batch = self._batch(name, self.mpca_gl.SpanBatch)
+        batch.set_annuli(rings, colors, width, height)
+        batch.draw()
+
+    def image(self, name, rgba, x=0, y=0, version=None, region=None, scale=1.0):
+        texture = self._batch(name, self.mpca_gl.TextureImage)
+        texture.set_image(rgba, version, region)
+        texture.draw(x, y, scale)
+
+    def text(self, x, y, text, color=(1.0, 1.0, 1.0), font=None):
+        GLUT = self.GLUT
+        self.GL.glColor3f(*color[:3])
+        self.GL.glRasterPos2i(int(x), int(y))
+        for ch in text:
+            GLUT.glutBitmapCharacter(font or GLUT.GLUT_BITMAP_HELVETICA_12, ord(ch))
+
+    def set_view(self, left, right, bottom, top):
+        GL = self.GL
+        GL.glMatrixMode(GL.GL_PROJECTION)
+        GL.glLoadIdentity()
+        GL.glOrtho(left, right, bottom, top, -1.0, 1.0)
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+
+    def present(self):
+        self.GLUT.glutSwapBuffers()
+
+
+# ---------------- Headless runs ------------------
+def parse_headless_args(argv):
+    """
+    Parse `--headless N [--dump DIR] [--seed S]` from a scene's command line.
+    Returns None when --headless is absent, so the scene opens its GLUT window.
+    """
+    if '--headless' not in argv:
+        return None
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', type=int, metavar='FRAMES', required=True)
+    parser.add_argument('--dump', metavar='DIR', help='write every frame as a PPM image')
+    parser.add_argument('--seed', type=int, help='seed `random` for reproducible checksums')
+    args = parser.parse_args(argv[1:])
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+    if args.dump:
+        os.makedirs(args.dump, exist_ok=True)
+    return args
+
+
+def run_frames(backend, display, frames, dump_dir=None):
+    """Call `display` for each frame and report the framebuffer checksum."""
+    for i in range(frames):
+        display()
+        if dump_dir:
+            backend.save_ppm(os.path.join(dump_dir, 'frame_%05d.ppm' % i))
+        print('frame %d checksum %08x' % (i, backend.checksum()))
@@ -3,6 +3,7 @@ from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import time
 import math
+import mpca
 
 # Global animation variables
 ripples = []   # Each ripple: [x, y, radius, speed]
@@ -29,12 +30,15 @@ def midpoint_circle(xc, yc, r):
         x += 1
     return points
 
+# Growing ripples keep revisiting the same radii, so reuse their stencils
+ripple_stencils = mpca.StencilCache(stencil=lambda r: midpoint_circle(0, 0, r))
+
 # ------------------- Draw Ripple -------------------
 def draw_ripple(xc, yc, r):
     glBegin(GL_POINTS)
     glColor3f(0.2, 0.6, 1.0)
-    for x, y in midpoint_circle(xc, yc, r):
-        glVertex2f(x / 400, y / 400)
+    for x, y in (ripple_stencils.points(xc, yc, r) / 400.0).tolist():
+        glVertex2f(x, y)
     glEnd()
 
 # ------------------- Display -------------------
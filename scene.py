@@ -11,7 +11,9 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
-import random
+import numpy as np
+import mpca_gl
+import traffic_fleet
 
 # ------------------------ Configuration ------------------------
 WIDTH, HEIGHT = 800, 800
@@ -27,8 +29,11 @@ TRAFFIC_LIGHT_INTERVAL = 200  # frames per light change
 NUM_LANES = 5 
 
 # ------------------------ State (MODIFIED) ------------------------
-cars = []
+fleet = traffic_fleet.CarFleet([], [], [], [])
 frame_counter = 0
+lane_rings = None  # retained VBO for the lane markings
+lane_surfaces = None  # retained span VBO for the filled lanes
+demo_rings = None  # retained VBO for the MPCA visualizer scene
 traffic_light_state = 0  
 current_scene = 1 # 1=Simulation, 2=MPCA Visualizer, 3=Control Panel, 4=Metrics
 MAX_SCENES = 4
@@ -41,90 +46,52 @@ def switch_scene():
     current_scene = (current_scene % MAX_SCENES) + 1
     glutPostRedisplay()
 
-# ---------------- Mid-Point Circle Algorithm ------------------
-def midpoint_circle_points(xc, yc, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    pts = []
-    while x >= y:
-        pts.extend([
-            (xc + x, yc + y), (xc - x, yc + y),
-            (xc + x, yc - y), (xc - x, yc - y),
-            (xc + y, yc + x), (xc - y, yc + x),
-            (xc + y, yc - x), (xc - y, yc - x),
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    unique = []
-    s = set()
-    for px, py in pts:
-        ix, iy = int(round(px)), int(round(py))
-        if (ix, iy) not in s and 0 <= ix < WIDTH and 0 <= iy < HEIGHT:
-            unique.append((ix, iy))
-            s.add((ix, iy))
-    return unique
-
-# ---------------- Car Class ------------------
-class Car:
-    def __init__(self, lane_radius, angle, speed):
-        self.radius = lane_radius
-        self.angle = angle  # degrees
-        self.speed = speed  # degrees per frame
-        self.color = (random.uniform(0.3, 1.0), random.uniform(0.3, 1.0), random.uniform(0.3, 1.0)) # Random car color
-
-    def update(self):
-        global traffic_light_state
-        # Simple logic: cars slow down if red light is active at entry angle ~0 deg
-        if traffic_light_state == 2 and (0 <= self.angle % 360 <= 30):
-            pass  # stop car temporarily
-        else:
-            self.angle = (self.angle + self.speed) % 360
-
-    def position(self):
-        rad = math.radians(self.angle)
-        x = WIDTH/2 + self.radius * math.cos(rad)
-        y = HEIGHT/2 + self.radius * math.sin(rad)
-        return x, y
-
 # ---------------- Generate Cars ------------------
 def generate_cars(num=NUM_CARS):
-    global cars
-    cars = []
-    max_lane_radius = MAX_RADIUS - CAR_WIDTH/2
-    min_lane_radius = MIN_RADIUS + CAR_WIDTH/2
-    
-    for _ in range(num):
-        lane_radius = random.uniform(min_lane_radius, max_lane_radius)
-        angle = random.uniform(0, 360)
-        speed = CAR_SPEED * random.uniform(0.8, 1.2)
-        cars.append(Car(lane_radius, angle, speed))
+    global fleet
+    # Every car drives on the centre line of one of the NUM_LANES lanes
+    radii = traffic_fleet.lane_radii(MIN_RADIUS, MAX_RADIUS, NUM_LANES)
+    fleet = traffic_fleet.CarFleet.on_lanes(num, radii, CAR_SPEED, CAR_LENGTH)
+
+def set_car_count(num):
+    """
+    Spawn or despawn cars towards `num`, keeping the others' state. Returns
+    the new fleet size, which stays short of `num` once the lanes are full.
+    """
+    extra = num - len(fleet)
+    if extra > 0:
+        fleet.spawn(extra, CAR_SPEED)
+    elif extra < 0:
+        fleet.despawn(-extra)
+    return len(fleet)
 
 # ---------------- Draw Roundabout ------------------
 def draw_roundabout():
+    global lane_rings, lane_surfaces
     lane_width = (MAX_RADIUS - MIN_RADIUS)/NUM_LANES
-    for i in range(NUM_LANES):
-        radius = MIN_RADIUS + (i + 0.5) * lane_width
-        color = (0.2, 0.2, 0.2, 0.8)
-        if USE_MPCA:
-            draw_circle_mpca(WIDTH/2, HEIGHT/2, radius, color)
-        else:
+    radii = [MIN_RADIUS + (i + 0.5) * lane_width for i in range(NUM_LANES)]
+    color = (0.2, 0.2, 0.2, 0.8)
+    if USE_MPCA:
+        # Lane surfaces are filled MPCA annuli of the full lane width, shaded
+        # alternately so adjacent lanes stay distinguishable
+        if lane_surfaces is None:
+            lane_surfaces = mpca_gl.SpanBatch()
+        bands = [(WIDTH/2, HEIGHT/2, round(MIN_RADIUS + i * lane_width) + (1 if i else 0),
+                  round(MIN_RADIUS + (i + 1) * lane_width)) for i in range(NUM_LANES)]
+        shades = [(0.14, 0.14, 0.14, 0.8) if i % 2 else (0.17, 0.17, 0.17, 0.8) for i in range(NUM_LANES)]
+        lane_surfaces.set_annuli(bands, shades, WIDTH, HEIGHT)
+        lane_surfaces.draw()
+
+        # Lane markings only change with NUM_LANES/radii, so they stay in one VBO
+        if lane_rings is None:
+            lane_rings = mpca_gl.CircleBatch()
+        lane_rings.set_circles([(WIDTH/2, HEIGHT/2, r) for r in radii], color, WIDTH, HEIGHT)
+        lane_rings.draw(point_size=1)
+    else:
+        for radius in radii:
             draw_circle_poly(WIDTH/2, HEIGHT/2, radius, color)
 
 # ---------------- Circle Drawing Helpers ------------------
-def draw_circle_mpca(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5)):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glPointSize(1)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(int(round(xc)), int(round(yc)), int(round(radius))):
-        glVertex2i(x, y)
-    glEnd()
-
 def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=128):
     r, g, b, a = color
     glColor4f(r, g, b, a)
@@ -138,35 +105,9 @@ def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=128):
 
 # ---------------- Draw Cars ------------------
 def draw_cars():
-    glLineWidth(1.0) 
-    
-    for car in cars:
-        x, y = car.position()
-        car_rotation_angle = car.angle - 90 
-        
-        glPushMatrix()
-        glTranslatef(x, y, 0)
-        glRotatef(car_rotation_angle, 0, 0, 1)
-        
-        # Car Body
-        glColor3f(*car.color)
-        glBegin(GL_QUADS)
-        glVertex2f(-CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f( CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f( CAR_LENGTH/2,  CAR_WIDTH/2)
-        glVertex2f(-CAR_LENGTH/2,  CAR_WIDTH/2)
-        glEnd()
-        
-        # Headlight
-        glColor3f(1.0, 1.0, 0.0) 
-        glBegin(GL_QUADS)
-        glVertex2f(CAR_LENGTH/2 - 2, -CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2,  CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2 - 2, CAR_WIDTH/2)
-        glEnd()
-        
-        glPopMatrix()
+    # One interleaved vertex array for every body and headlight, one draw call
+    quads, colors = traffic_fleet.car_quads(fleet, WIDTH/2, HEIGHT/2, CAR_LENGTH, CAR_WIDTH)
+    mpca_gl.draw_vertices(GL_QUADS, quads, np.repeat(colors, 4, axis=0))
 
 # ---------------- Traffic Lights ------------------
 def draw_traffic_lights():
@@ -198,8 +139,7 @@ def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_12):
 def draw_simulation_scene():
     """The main running traffic simulation."""
     # Car movement update is only needed in the active simulation scene
-    for car in cars:
-        car.update()
+    fleet.update(red_light=traffic_light_state == 2)
         
     draw_roundabout()
     draw_cars()
@@ -220,10 +160,14 @@ def draw_mpca_scene():
     draw_text(WIDTH - 250, HEIGHT - 20, "Scene 2: MPCA Visualization")
     draw_text(10, 50, "Showing multiple circles rendered via Mid-Point Circle Algorithm.")
     
-    # Draw several MPCA circles
-    for r in range(50, 350, 50):
-        color = (r/400.0, 1.0 - r/400.0, 0.5, 0.5) 
-        draw_circle_mpca(xc, yc, r, color)
+    # Draw several MPCA circles (retained in one VBO, one draw call)
+    global demo_rings
+    radii = range(50, 350, 50)
+    if demo_rings is None:
+        demo_rings = mpca_gl.CircleBatch()
+    demo_rings.set_circles([(xc, yc, r) for r in radii],
+                           [(r/400.0, 1.0 - r/400.0, 0.5, 0.5) for r in radii], WIDTH, HEIGHT)
+    demo_rings.draw()
 
 
 # --- SCENE 3: Traffic Light Control Panel (NEW) ---
@@ -339,12 +283,14 @@ def keyboard(key, x, y):
     
     # Only allow controls in the simulation scene (Scene 1)
     if current_scene == 1:
-        if k == '+': NUM_CARS += 1; generate_cars(NUM_CARS)
-        elif k == '-': NUM_CARS = max(1, NUM_CARS - 1); generate_cars(NUM_CARS)
+        if k == '+': NUM_CARS = set_car_count(NUM_CARS + 1)
+        elif k == '-': NUM_CARS = set_car_count(max(1, NUM_CARS - 1))
         elif k in ('s', 'S'):
+            old_speed = CAR_SPEED
             if k == 's': CAR_SPEED = max(0.1, CAR_SPEED - 0.2)
             else: CAR_SPEED += 0.2
-            for car in cars: car.speed = CAR_SPEED * random.uniform(0.8, 1.2)
+            # Rescale existing cars' speeds, keeping each car's own variation
+            fleet.scale_speed(CAR_SPEED / old_speed)
         
     if k in ('i', 'I'): SHOW_INSTRUCTIONS = not SHOW_INSTRUCTIONS
     elif k in ('q', 'Q', '\x1b'): glutLeaveMainLoop()
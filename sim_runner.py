@@ -0,0 +1,159 @@
+"""
+sim_runner.py
+
+Headless fixed-timestep runner for the simulation models.
+
+The scenes only advance their state from display(), which GLUT calls on a
+33 ms timer. Each scene now exposes a `step(dt)` function holding the model
+update (dt is measured in those 33 ms frames); this runner calls it for a fixed
+number of steps with no window or renderer and reports throughput:
+
+- steps/sec
+- entity-updates/sec (cars, radar targets and Kalman tracks at the beam, submarine + sonar pulses)
+- per-step latency percentiles
+
+The tracker model runs radar_ai_scanner's full sweep (CFAR plots, association,
+Kalman tracks) on its own few targets. With --cars it instead drives the
+scene's TrackBank directly: CFAR finds little once thousands of targets fill
+its training windows, so each step predicts every one of the --cars tracks and
+corrects it with a noisy plot of its target.
+
+Run:
+    python3 sim_runner.py                                               # all models, 1000 steps each
+    python3 sim_runner.py roundabout --steps 5000 --cars 10000 --seed 1 # lanes added to fit the cars
+    python3 sim_runner.py radar sonar --dt 0.5
+    python3 sim_runner.py tracker --steps 2000 --seed 1                 # the radar_ai_scanner sweep
+    python3 sim_runner.py tracker --cars 100000 --steps 50              # TrackBank predict / update
+
+Dependencies:
+- numpy
+- the scene modules (PyOpenGL is imported by them but no window is opened)
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+
+def run_fixed_steps(step, steps, dt=1.0, entities=None, warmup=10):
+    """
+    Call `step(dt)` `steps` times after `warmup` untimed steps.
+    `entities` returns the number of entities the step just run updated.
+    Returns a dict of throughput and latency statistics (latencies in ms).
+    """
+    if steps < 1:
+        raise ValueError('steps must be at least 1')
+    for _ in range(warmup):
+        step(dt)
+    latency = np.empty(steps)
+    updates = 0
+    clock = time.perf_counter
+    for i in range(steps):
+        start = clock()
+        step(dt)
+        latency[i] = clock() - start
+        if entities is not None:
+            updates += entities()
+    seconds = latency.sum()
+    stats = {
+        'steps': steps,
+        'dt': dt,
+        'seconds': seconds,
+        'steps_per_sec': steps / seconds if seconds else float('inf'),
+        'entity_updates_per_sec': updates / seconds if seconds else float('inf'),
+        'mean_entities': updates / steps,
+        'max_ms': latency.max() * 1e3,
+    }
+    for p, value in zip(PERCENTILES, np.percentile(latency, PERCENTILES) * 1e3):
+        stats['p%d_ms' % p] = value
+    return stats
+
+
+def format_stats(name, stats):
+    """One report line per model."""
+    percentiles = '  '.join('p%d %.3f ms' % (p, stats['p%d_ms' % p]) for p in PERCENTILES)
+    return ('%-10s %7d steps  %10.1f steps/s  %12.0f entity-updates/s  (%.1f entities)  %s  max %.3f ms'
+            % (name, stats['steps'], stats['steps_per_sec'], stats['entity_updates_per_sec'],
+               stats['mean_entities'], percentiles, stats['max_ms']))
+
+
+# ---------------- Models ------------------
+def roundabout_model(cars=None):
+    import traffic_roundabout as model
+    import traffic_fleet
+    cars = model.NUM_CARS if cars is None else cars
+    # Cars never spawn overlapping, so a fleet larger than the scene's lanes
+    # hold gets extra lanes of the same width outside the roundabout
+    lane_width = (model.MAX_RADIUS - model.MIN_RADIUS) / model.NUM_LANES
+    while traffic_fleet.CarFleet.lane_capacity(
+            traffic_fleet.lane_radii(model.MIN_RADIUS, model.MAX_RADIUS, model.NUM_LANES), model.CAR_LENGTH).sum() < cars:
+        model.NUM_LANES += 1
+        model.MAX_RADIUS += lane_width
+    model.generate_cars(cars)
+    return model.step, lambda: len(model.fleet)
+
+
+def radar_model(cars=None):
+    import radar_scanner as model
+    model.generate_targets()
+    return model.step, lambda: model.updated
+
+
+def tracker_model(cars=None):
+    import radar_ai_scanner as model
+    model.generate_targets(cars)
+    if cars is None:
+        return model.step, lambda: model.updated
+    # One track per target, started on its true state
+    tracks = model.tracks
+    x, y, vx, vy = model.target_positions(slice(None))
+    ids = tracks.add(x, y, vx=vx, vy=vy, now=model.now)
+
+    def step(dt=1.0):
+        model.now += dt
+        x, y = model.target_positions(slice(None))[:2]
+        noise = np.random.normal(0.0, model.MEAS_SIGMA, (2, len(ids)))
+        tracks.predict_to(ids, model.now)
+        tracks.update(ids, x + noise[0], y + noise[1])
+    return step, lambda: len(ids)
+
+
+def sonar_model(cars=None):
+    import submarine_sonar as model
+    return model.step, lambda: 1 + len(model.sonar_pulses)
+
+
+MODELS = {
+    'roundabout': roundabout_model,
+    'radar': radar_model,
+    'sonar': sonar_model,
+    'tracker': tracker_model,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('models', nargs='*', metavar='model', help='%s (default: all)' % ', '.join(sorted(MODELS)))
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--dt', type=float, default=1.0, help='timestep in 33 ms frames')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--cars', type=int, help='roundabout fleet size (default: NUM_CARS) or tracker track count (drives the TrackBank directly)')
+    parser.add_argument('--seed', type=int, help='seed `random` and numpy for reproducible runs')
+    args = parser.parse_args(argv)
+    unknown = set(args.models) - set(MODELS)
+    if unknown:
+        parser.error('unknown model(s): %s' % ', '.join(sorted(unknown)))
+
+    for name in args.models or sorted(MODELS):
+        if args.seed is not None:
+            random.seed(args.seed)
+            np.random.seed(args.seed)
+        step, entities = MODELS[name](args.cars)
+        print(format_stats(name, run_fixed_steps(step, args.steps, args.dt, entities, args.warmup)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""
+sinr_heatmap.py
+
+Per-pixel signal / SINR field of a set of access points.
+
+The analyzer's old heatmap was a stack of alpha-blended bands around every
+AP. This module computes the field itself, for every pixel of the map:
+
+- received power of AP i at distance d follows a log-distance path loss model
+  anchored at its coverage radius: P_i(d) = EDGE_DBM at d = radius_i,
+  falling off with PATH_LOSS_EXPONENT
+- the pixel is served by the strongest AP; every other AP on the same channel
+  is co-channel interference
+- SINR = P_best / (sum of co-channel P_j + thermal noise)
+
+The whole grid is evaluated with NumPy broadcasting in blocks of pixel rows
+times AP chunks, so memory stays bounded for large maps and many APs.
+`SinrHeatmap` colours the field into one RGBA image that the render backend
+keeps as a single texture; it is only recomputed when the AP set changes, and
+`update_region` re-renders just a dirty rectangle after a local edit.
+
+Dependencies:
+- numpy
+"""
+
+import numpy as np
+
+EDGE_DBM = -75.0           # received power at an AP's coverage radius
+NOISE_DBM = -95.0          # thermal noise floor
+PATH_LOSS_EXPONENT = 3.0   # indoor log-distance exponent
+SINR_RANGE_DB = (0.0, 30.0)  # mapped from red to green
+HEATMAP_ALPHA = 0.45
+REACH_DB = 0.0             # IncrementalSinr drops an AP's signal this far below the noise floor
+
+
+def _falloff(q, exponent, out):
+    """(radius / d)^exponent from q = (d / radius)^2, with fast paths for common exponents."""
+    if exponent == 2.0:
+        return np.reciprocal(q, out=out)
+    if exponent == 3.0:
+        np.sqrt(q, out=out)
+        np.multiply(q, out, out=out)
+        return np.reciprocal(out, out=out)
+    if exponent == 4.0:
+        np.multiply(q, q, out=out)
+        return np.reciprocal(out, out=out)
+    return np.power(q, -exponent / 2.0, out=out)
+
+
+def sinr_field(x, y, radius, channel, width, height, region=None,
+               exponent=PATH_LOSS_EXPONENT, noise_dbm=NOISE_DBM, rows=8, ap_chunk=16):
+    """
+    Best received power (dBm) and SINR (dB) of every pixel.
+
+    Pixel (px, py) is sampled at its centre (px + 0.5, py + 0.5); row 0 is
+    the bottom row. `region` = (x0, y0, x1, y1) restricts the evaluation to
+    the half-open pixel rectangle [x0, x1) x [y0, y1). Returns two float32
+    arrays of shape (y1 - y0, x1 - x0).
+    """
+    x0, y0, x1, y1 = region or (0, 0, width, height)
+    w, h = x1 - x0, y1 - y0
+    best_dbm = np.full((h, w), -np.inf, dtype=np.float32)
+    sinr_db = np.full((h, w), -np.inf, dtype=np.float32)
+    x = np.asarray(x, dtype=np.float32)
+    if not len(x) or w <= 0 or h <= 0:
+        return best_dbm, sinr_db
+    y = np.asarray(y, dtype=np.float32)
+    radius = np.asarray(radius, dtype=np.float32)
+    channel = np.asarray(channel)
+
+    # Group APs by channel so each channel's sum and max are plain reductions
+    order = np.argsort(channel, kind='stable')
+    groups = np.split(order, np.flatnonzero(np.diff(channel[order])) + 1)
+    noise = np.float32(10.0 ** ((noise_dbm - EDGE_DBM) / 10.0))  # in units of the edge power
+
+    # Distances are measured in units of each AP's radius, so the falloff is
+    # q^(-exponent / 2) with q = (d / radius)^2
+    px = np.arange(x0, x1, dtype=np.float32) + 0.5
+    dx2 = np.square((px[None, :] - x[:, None]) / radius[:, None])    # (aps, w)
+    # Keeps q > 0 at an AP's own position (about a hundredth of a pixel)
+    floor = np.square(np.float32(0.01) / radius)
+    total = np.empty((len(groups), rows, w), dtype=np.float32)
+    peak = np.empty((len(groups), rows, w), dtype=np.float32)
+    d2 = np.empty((ap_chunk, rows, w), dtype=np.float32)
+    tmp = np.empty_like(d2)
+
+    for r0 in range(0, h, rows):
+        hb = min(rows, h - r0)
+        py = np.arange(y0 + r0, y0 + r0 + hb, dtype=np.float32) + 0.5
+        dy2 = np.square((py[None, :] - y[:, None]) / radius[:, None]) + floor[:, None]  # (aps, hb)
+        tot, pk = total[:, :hb], peak[:, :hb]
+        tot.fill(0.0)
+        pk.fill(0.0)
+        for g, members in enumerate(groups):
+            for c0 in range(0, len(members), ap_chunk):
+                ids = members[c0:c0 + ap_chunk]
+                k = len(ids)
+                q, t = d2[:k, :hb], tmp[:k, :hb]
+                np.add(dy2[ids][:, :, None], dx2[ids][:, None, :], out=q)
+                s = _falloff(q, exponent, t)
+                tot[g] += s.sum(axis=0)
+                np.maximum(pk[g], s.max(axis=0), out=pk[g])
+        best_group = pk.argmax(axis=0)
+        best = np.take_along_axis(pk, best_group[None], 0)[0]
+        interference = np.take_along_axis(tot, best_group[None], 0)[0] - best
+        with np.errstate(divide='ignore'):
+            best_dbm[r0:r0 + hb] = EDGE_DBM + 10.0 * np.log10(best)
+            sinr_db[r0:r0 + hb] = 10.0 * np.log10(best / (np.maximum(interference, 0.0) + noise))
+    return best_dbm, sinr_db
+
+
+def colorize(best_dbm, sinr_db, alpha=HEATMAP_ALPHA):
+    """RGBA uint8 image: SINR from red (poor) over yellow to green (good) inside coverage."""
+    return _paint(best_dbm >= EDGE_DBM, sinr_db, alpha)
+
+
+def _paint(covered, sinr_db, alpha=HEATMAP_ALPHA):
+    lo, hi = SINR_RANGE_DB
+    t = np.clip((np.asarray(sinr_db, dtype=np.float32) - lo) * np.float32(1.0 / (hi - lo)), 0.0, 1.0)
+    rgba = np.empty(covered.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = np.minimum(2.0 - 2.0 * t, 1.0) * 255
+    rgba[..., 1] = np.minimum(2.0 * t, 1.0) * 255
+    rgba[..., 2] = 40
+    rgba[..., 3] = covered * np.uint8(alpha * 255)
+    return rgba
+
+
+class SinrHeatmap:
+    """The coloured SINR image of an AP set, recomputed only when the APs change."""
+
+    def __init__(self, width, height, exponent=PATH_LOSS_EXPONENT):
+        self.width = width
+        self.height = height
+        self.exponent = exponent
+        self.rgba = np.zeros((height, width, 4), dtype=np.uint8)
+        self.version = 0   # bumped whenever `rgba` changes
+        self.dirty = None  # (x0, y0, x1, y1) changed since the last take_dirty()
+        self._key = None
+
+    def _touch(self, region):
+        self.version += 1
+        if self.dirty is None:
+            self.dirty = region
+        else:
+            self.dirty = (min(self.dirty[0], region[0]), min(self.dirty[1], region[1]),
+                          max(self.dirty[2], region[2]), max(self.dirty[3], region[3]))
+
+    def take_dirty(self):
+        """The pixel rectangle changed since the last call (None if nothing changed)."""
+        dirty, self.dirty = self.dirty, None
+        return dirty
+
+    def update(self, x, y, radius, channel):
+        """Recompute for the APs (x, y, radius, channel); returns True if the image changed."""
+        arrays = [np.asarray(a, dtype=np.float64) for a in (x, y, radius, channel)]
+        key = tuple(a.tobytes() for a in arrays) + (self.width, self.height)
+        if key == self._key:
+            return False
+        best, sinr = sinr_field(*arrays, self.width, self.height, exponent=self.exponent)
+        self.rgba = colorize(best, sinr)
+        self._touch((0, 0, self.width, self.height))
+        self._key = key
+        return True
+
+    def update_region(self, x, y, radius, channel, region):
+        """Recompute only the pixel rectangle `region` = (x0, y0, x1, y1) for the given APs."""
+        x0, y0, x1, y1 = region
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1, y1 = min(int(x1), self.width), min(int(y1), self.height)
+        if x0 >= x1 or y0 >= y1:
+            return False
+        best, sinr = sinr_field(x, y, radius, channel, self.width, self.height, (x0, y0, x1, y1), self.exponent)
+        self.rgba[y0:y1, x0:x1] = colorize(best, sinr)
+        self._touch((x0, y0, x1, y1))
+        self._key = None
+        return True
+
+
+def _scaled_d2(x, y, radius, x0, y0, x1, y1):
+    """(d / radius)^2 of every pixel centre in [x0, x1) x [y0, y1), as float64 (h, w)."""
+    px = (np.arange(x0, x1) + 0.5 - x) / radius
+    py = (np.arange(y0, y1) + 0.5 - y) / radius
+    return py[:, None] ** 2 + px[None, :] ** 2 + (0.01 / radius) ** 2
+
+
+class IncrementalSinr(SinrHeatmap):
+    """
+    A SinrHeatmap kept up to date one AP at a time.
+
+    Per pixel it stores the strongest signal and the id of the AP it comes
+    from, plus the summed signal of every channel (float64, so removing an AP
+    subtracts its contribution exactly enough). An AP's signal is only kept
+    within its reach, where it is at most REACH_DB below the noise floor, so
+    adding, removing or re-channelling an AP costs one pass over its reach
+    rectangle instead of one over the map per AP set. Only pixels whose
+    strongest AP was removed are searched again, against just the APs that
+    can be strongest there, and recolor() recolours only the rectangles the
+    edits since the last call touched.
+    """
+
+    def __init__(self, width, height, channel_count, exponent=PATH_LOSS_EXPONENT, noise_dbm=NOISE_DBM):
+        super().__init__(width, height, exponent)
+        self.best = np.zeros((height, width))
+        self.best_id = np.full((height, width), -1, dtype=np.int64)
+        self.total = np.zeros((channel_count, height, width))
+        self.noise = 10.0 ** ((noise_dbm - EDGE_DBM) / 10.0)
+        # Largest (d / radius)^2 at which a signal is kept: q^(-exponent / 2) = noise / 10^(REACH_DB / 10)
+        self.reach_q = (self.noise * 10.0 ** (-REACH_DB / 10.0)) ** (-2.0 / exponent)
+        self.stale = [(0, 0, width, height)]  # rectangles recolor() has to redo
+
+    def reach(self, x, y, radius):
+        """Pixel rectangle (x0, y0, x1, y1) of the map the signal of an AP at (x, y, radius) reaches."""
+        d = radius * np.sqrt(self.reach_q)
+        return (max(int(np.floor(x - d)), 0), max(int(np.floor(y - d)), 0),
+                min(int(np.ceil(x + d)) + 1, self.width), min(int(np.ceil(y + d)) + 1, self.height))
+
+    def _mark_stale(self, region):
+        x0, y0, x1, y1 = region
+        if x0 >= x1 or y0 >= y1:
+            return
+        # Rectangles that overlap enough are merged, so no pixel is recoloured
+        # twice and the box never costs more than the two apart
+        area = (x1 - x0) * (y1 - y0)
+        for k, (a0, b0, a1, b1) in enumerate(self.stale):
+            u0, v0, u1, v1 = min(a0, x0), min(b0, y0), max(a1, x1), max(b1, y1)
+            if (u1 - u0) * (v1 - v0) <= area + (a1 - a0) * (b1 - b0):
+                del self.stale[k]
+                return self._mark_stale((u0, v0, u1, v1))
+        self.stale.append(region)
+
+    def _signal(self, x, y, radius):
+        """Signal of an AP over its reach rectangle, and the rectangle's slices."""
+        x0, y0, x1, y1 = region = self.reach(x, y, radius)
+        self._mark_stale(region)
+        q = _scaled_d2(x, y, radius, x0, y0, max(x1, x0), max(y1, y0))
+        s = _falloff(q, self.exponent, np.empty_like(q))
+        # Only a rectangle cut by the map edge can lie wholly inside the reach
+        if q.size and q[[0, 0, -1, -1], [0, -1, 0, -1]].max() > self.reach_q:
+            s[q > self.reach_q] = 0.0
+        return s, (slice(y0, max(y1, y0)), slice(x0, max(x1, x0)))
+
+    def add(self, i, x, y, radius, c):
+        """Add AP i at (x, y, radius) on channel index c."""
+        s, window = self._signal(x, y, radius)
+        self.total[c][window] += s
+        best, best_id = self.best[window], self.best_id[window]
+        stronger = s > best
+        best[stronger] = s[stronger]
+        best_id[stronger] = i
+
+    def rechannel(self, x, y, radius, old, new):
+        """Move an AP's signal from channel index `old` to `new`."""
+        if old == new:
+            return
+        s, window = self._signal(x, y, radius)
+        if old >= 0:
+            self.total[old][window] -= s
+        if new >= 0:
+            self.total[new][window] += s
+
+    def _strongest(self, ids, x, y, radius, chan, region, totals=True, rows=8, ap_chunk=16):
+        """
+        Strongest signal, its AP id and (optionally) per-channel sums of the
+        APs (ids, x, y, radius, chan) over the pixel rectangle `region`.
+        """
+        x0, y0, x1, y1 = region
+        w, h = x1 - x0, y1 - y0
+        best = np.zeros((h, w))
+        best_id = np.full((h, w), -1, dtype=np.int64)
+        total = np.zeros((len(self.total), h, w)) if totals else None
+        ids, x, y, radius, chan = (np.asarray(a) for a in (ids, x, y, radius, chan))
+        px = np.arange(x0, x1) + 0.5
+        for r0 in range(0, h, rows):
+            hb = min(rows, h - r0)
+            py = np.arange(y0 + r0, y0 + r0 + hb) + 0.5
+            for c0 in range(0, len(ids), ap_chunk):
+                sl = slice(c0, c0 + ap_chunk)
+                r = radius[sl][:, None, None]
+                q = ((py[None, :, None] - y[sl][:, None, None]) / r) ** 2 + ((px[None, None, :] - x[sl][:, None, None]) / r) ** 2
+                q += (0.01 / r) ** 2
+                s = _falloff(q, self.exponent, np.empty_like(q))
+                s[q > self.reach_q] = 0.0
+                k = s.argmax(axis=0)
+                sk = np.take_along_axis(s, k[None], 0)[0]
+                rb, rid = best[r0:r0 + hb], best_id[r0:r0 + hb]
+                stronger = sk > rb
+                rb[stronger] = sk[stronger]
+                rid[stronger] = ids[sl][k[stronger]]
+                if totals:
+                    for c in np.unique(chan[sl]).tolist():
+                        total[c, r0:r0 + hb] += s[chan[sl] == c].sum(axis=0)
+        return best, best_id, total
+
+    def rebuild(self, ids, x, y, radius, chan):
+        """Recompute the whole field for the APs (ids, x, y, radius, channel index)."""
+        self.best, self.best_id, self.total = self._strongest(ids, x, y, radius, chan, (0, 0, self.width, self.height))
+        self.stale = [(0, 0, self.width, self.height)]
+
+    def _bounds(self, x, y, radius, region):
+        """Smallest and largest signal of each AP (x, y, radius) over the pixel centres of `region`."""
+        x0, y0, x1, y1 = region
+        gx = np.maximum(np.maximum(x0 + 0.5 - x, x - (x1 - 0.5)), 0.0)
+        gy = np.maximum(np.maximum(y0 + 0.5 - y, y - (y1 - 0.5)), 0.0)
+        fx = np.maximum(np.abs(x - (x0 + 0.5)), np.abs(x - (x1 - 0.5)))
+        fy = np.maximum(np.abs(y - (y0 + 0.5)), np.abs(y - (y1 - 0.5)))
+        floor = (0.01 / radius) ** 2
+        near = (gx * gx + gy * gy) / (radius * radius) + floor
+        far = (fx * fx + fy * fy) / (radius * radius) + floor
+        high = np.where(near > self.reach_q, 0.0, _falloff(near, self.exponent, np.empty_like(near)))
+        low = np.where(far > self.reach_q, 0.0, _falloff(far, self.exponent, np.empty_like(far)))
+        return low, high
+
+    def remove(self, i, x, y, radius, c, others):
+        """
+        Remove AP i; `others` = (ids, x, y, radius) of the remaining APs, used
+        to find the new strongest AP where i was the strongest.
+        """
+        s, window = self._signal(x, y, radius)
+        self.total[c][window] -= s
+        # i is only the strongest where its signal reaches
+        lost = self.best_id[window] == i
+        if not lost.any():
+            return
+        rows, cols = np.flatnonzero(lost.any(axis=1)), np.flatnonzero(lost.any(axis=0))
+        y0, y1 = window[0].start + int(rows[0]), window[0].start + int(rows[-1]) + 1
+        x0, x1 = window[1].start + int(cols[0]), window[1].start + int(cols[-1]) + 1
+        # Each pixel's new strongest signal is at least the best lower bound of
+        # any AP over the box, so APs whose upper bound falls short never win
+        ids, ox, oy, oradius = (np.asarray(a) for a in others)
+        low, high = self._bounds(ox.astype(np.float64), oy.astype(np.float64), oradius.astype(np.float64),
+                                 (x0, y0, x1, y1))
+        keep = (high > 0.0) & (high >= low.max(initial=0.0))
+        best, best_id, _ = self._strongest(ids[keep], ox[keep], oy[keep], oradius[keep],
+                                           np.zeros(int(keep.sum()), dtype=np.int64), (x0, y0, x1, y1), totals=False)
+        box = lost[y0 - window[0].start:y1 - window[0].start, x0 - window[1].start:x1 - window[1].start]
+        self.best[y0:y1, x0:x1][box] = best[box]
+        self.best_id[y0:y1, x0:x1][box] = best_id[box]
+
+    def recolor(self, chan):
+        """
+        Recolour the rectangles the edits since the last call touched; `chan`
+        maps AP id to channel index. Returns the box of pixels whose colour
+        changed (also marked dirty), or None.
+        """
+        stale, self.stale = self.stale, []
+        changed = [box for box in (self._recolor(chan, *region) for region in stale) if box]
+        if not changed:
+            return None
+        x0, y0, x1, y1 = zip(*changed)
+        region = (min(x0), min(y0), max(x1), max(y1))
+        self._touch(region)
+        self._key = None
+        return region
+
+    def _recolor(self, chan, x0, y0, x1, y1):
+        """Recolour one pixel rectangle; returns the box of pixels whose colour changed, or None."""
+        best, best_id = self.best[y0:y1, x0:x1], self.best_id[y0:y1, x0:x1]
+        served = best_id >= 0
+        best_c = np.asarray(chan)[np.maximum(best_id, 0)]
+        total = np.take_along_axis(self.total[:, y0:y1, x0:x1], best_c[None], 0)[0]
+        interference = np.maximum(total - best, 0.0)
+        ratio = (best / (interference + self.noise)).astype(np.float32)
+        with np.errstate(divide='ignore'):
+            sinr_db = 10.0 * np.log10(ratio)
+        # Covered means the strongest AP reaches EDGE_DBM, i.e. best >= 1 edge unit
+        rgba = _paint(served & (best >= 1.0), sinr_db)
+        old = self.rgba[y0:y1, x0:x1]
+        changed = rgba.view(np.uint32)[..., 0] != old.view(np.uint32)[..., 0]
+        if not changed.any():
+            return None
+        rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+        old[...] = rgba
+        return (x0 + int(cols[0]), y0 + int(rows[0]), x0 + int(cols[-1]) + 1, y0 + int(rows[-1]) + 1)
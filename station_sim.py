@@ -0,0 +1,166 @@
+"""
+station_sim.py
+
+Client-station association for the coverage analyzer.
+
+A population of stations (up to a million) associates to the AP with the
+strongest signal. With received power anchored at each AP's coverage radius
+(sinr_heatmap's log-distance model), that is the AP whose disk contains the
+station with the smallest distance / radius; ap_index.APGrid.strongest answers
+that for all stations in one vectorized query. A station outside every disk
+is uncovered.
+
+From the association the simulator reports, per AP id:
+- stations: associated station count
+- airtime: share of the AP's airtime its stations need, sum(demand / PHY rate)
+  with the rate from the station's SNR (20 MHz single-stream MCS table)
+- medium: airtime plus that of every overlapping co-channel AP, which has to
+  share the same medium (> 1.0 means the channel is overloaded there)
+
+`update` re-associates only the stations around the APs that changed since
+the last call, so a layout edit costs far less than a full pass. Those
+stations are found through a cell sort of the stations (built once), not by
+scanning all of them per AP; when the changed APs cover most of the site it
+simply re-associates everyone.
+
+Dependencies:
+- numpy
+- ap_index.py, sinr_heatmap.py
+"""
+
+import numpy as np
+import sinr_heatmap
+
+DEMAND_MBPS = 0.1          # average offered load per station
+# 802.11n/ac 20 MHz, one spatial stream: minimum SNR (dB) and rate (Mbit/s) per MCS
+MCS_SNR_DB = np.array([5.0, 8.0, 11.0, 14.0, 18.0, 21.0, 23.0, 25.0, 29.0])
+MCS_RATE_MBPS = np.array([6.5, 13.0, 19.5, 26.0, 39.0, 52.0, 58.5, 65.0, 78.0])
+
+
+def generate_stations(count, width, height, hotspots=6, clustered=0.7, spread=80.0, rng=np.random):
+    """
+    Station positions inside the width x height site: a `clustered` share
+    around random hotspots (Gaussian with `spread`), the rest uniform.
+    """
+    near = int(count * clustered) if hotspots else 0
+    centres = np.stack([rng.uniform(0, width, hotspots), rng.uniform(0, height, hotspots)], axis=1)
+    which = rng.randint(0, max(hotspots, 1), near)
+    x = np.concatenate([centres[which, 0] + rng.normal(0.0, spread, near), rng.uniform(0, width, count - near)])
+    y = np.concatenate([centres[which, 1] + rng.normal(0.0, spread, near), rng.uniform(0, height, count - near)])
+    return np.clip(x, 0, width), np.clip(y, 0, height)
+
+
+def phy_rate(snr_db):
+    """PHY rate (Mbit/s) of the best MCS the SNR supports, 0 below the lowest."""
+    mcs = np.searchsorted(MCS_SNR_DB, snr_db, 'right') - 1
+    return np.where(mcs >= 0, MCS_RATE_MBPS[np.maximum(mcs, 0)], 0.0)
+
+
+class StationSim:
+    """Stations at (x, y) and the AP each one is associated with."""
+
+    def __init__(self, x, y, demand_mbps=DEMAND_MBPS, exponent=sinr_heatmap.PATH_LOSS_EXPONENT,
+                 noise_dbm=sinr_heatmap.NOISE_DBM):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.demand_mbps = demand_mbps
+        self.exponent = exponent
+        self.noise_dbm = noise_dbm
+        self.ap = np.full(len(self.x), -1, dtype=np.int64)   # associated AP id, -1 = uncovered
+        self.snr_db = np.full(len(self.x), -np.inf, dtype=np.float32)
+        self._layout = None
+        self._cells = None     # (cell size, sorted cell keys, station ids in that order)
+
+    def __len__(self):
+        return len(self.x)
+
+    def _sorted(self, size):
+        """Station ids sorted by cells of `size`, row-major, and their sorted cell keys (cached per size)."""
+        if self._cells is None or self._cells[0] != size:
+            key = np.floor_divide(self.y, size).astype(np.int64) * 2 ** 32 + np.floor_divide(self.x, size).astype(np.int64)
+            order = np.argsort(key, kind='stable')
+            self._cells = (size, key[order], order)
+        return self._cells[1:]
+
+    def within(self, grid, disks):
+        """
+        Ids of the stations inside the bounding box of any of `disks` = (x,
+        y, radius) arrays, or None when that would be most of them anyway.
+
+        Stations are kept sorted by cells of grid.max_radius / 2, as
+        APGrid.strongest sorts its points, so every box is at most 5 cell
+        rows of contiguous runs found by binary search.
+        """
+        cx, cy, r = (np.asarray(a, dtype=np.float64) for a in disks)
+        size = max(grid.max_radius, r.max(initial=0.0), 1e-9) / 2.0
+        sorted_key, order = self._sorted(size)
+        col0, col1 = np.floor_divide(cx - r, size).astype(np.int64), np.floor_divide(cx + r, size).astype(np.int64)
+        row0, row1 = np.floor_divide(cy - r, size).astype(np.int64), np.floor_divide(cy + r, size).astype(np.int64)
+        rows = row0[:, None] + np.arange(5)
+        lo = np.searchsorted(sorted_key, (rows * 2 ** 32 + col0[:, None]).ravel(), 'left')
+        hi = np.searchsorted(sorted_key, (rows * 2 ** 32 + col1[:, None]).ravel(), 'right')
+        hi[(rows > row1[:, None]).ravel()] = lo[(rows > row1[:, None]).ravel()]
+        count = hi - lo
+        total = int(count.sum())
+        if total > len(self.x) // 2:
+            return None
+        disk = np.repeat(np.repeat(np.arange(len(r)), 5), count)
+        sid = order[np.repeat(lo - (np.cumsum(count) - count), count) + np.arange(total)]
+        hit = (np.abs(self.x[sid] - cx[disk]) <= r[disk]) & (np.abs(self.y[sid] - cy[disk]) <= r[disk])
+        inside = np.zeros(len(self.x), dtype=bool)
+        inside[sid[hit]] = True
+        return np.flatnonzero(inside)
+
+    def associate(self, grid, disks=None):
+        """
+        Associate every station with its strongest AP, or only the stations
+        inside the bounding boxes of `disks` = (x, y, radius) arrays (all of
+        them again when the boxes hold more than half).
+        """
+        sel = slice(None)
+        if disks is not None:
+            inside = self.within(grid, disks)
+            if inside is not None:
+                sel = inside
+        ap, q = grid.strongest(self.x[sel], self.y[sel])
+        self.ap[sel] = ap
+        with np.errstate(divide='ignore'):
+            # P = EDGE_DBM - 10 * exponent * log10(d / radius), with q = (d / radius)^2
+            self.snr_db[sel] = sinr_heatmap.EDGE_DBM - 5.0 * self.exponent * np.log10(q) - self.noise_dbm
+
+    def update(self, grid):
+        """
+        Re-associate after a layout change: only the stations inside the
+        disks (old and new) of the APs that were added, moved, resized or
+        removed.
+        """
+        ids = np.flatnonzero(grid.alive)
+        layout = set(zip(ids.tolist(), grid.x[ids].tolist(), grid.y[ids].tolist(), grid.radius[ids].tolist()))
+        if self._layout is None:
+            self.associate(grid)
+        else:
+            changed = layout.symmetric_difference(self._layout)
+            if changed:
+                self.associate(grid, list(zip(*changed))[1:])
+        self._layout = layout
+
+    def stats(self, grid, chan=None):
+        """
+        Per-AP id arrays 'stations', 'airtime' and (with the channel index of
+        every AP id in `chan`) 'medium', plus 'uncovered' and 'covered' counts.
+        """
+        slots = len(grid.alive)
+        served = self.ap >= 0
+        ap = self.ap[served]
+        rate = phy_rate(self.snr_db[served])
+        stations = np.bincount(ap, minlength=slots)
+        airtime = np.bincount(ap, self.demand_mbps / np.maximum(rate, 1e-9), minlength=slots)
+        out = {'stations': stations, 'airtime': airtime,
+               'covered': int(served.sum()), 'uncovered': int(len(self.ap) - served.sum())}
+        if chan is not None:
+            chan = np.asarray(chan)
+            i, j, _ = grid.overlap_pairs()
+            same = chan[i] == chan[j]
+            i, j = i[same], j[same]
+            out['medium'] = airtime + np.bincount(i, airtime[j], minlength=slots) + np.bincount(j, airtime[i], minlength=slots)
+        return out
@@ -77,14 +77,34 @@ def draw_sonar():
         draw_circle_xy(x, y, z, radius, color=(0.0,1.0,1.0,0.3))
 
 # ---------------- Update Sonar Pulses ----------------
-def update_sonar():
+def update_sonar(dt=1.0):
     for i in range(len(sonar_pulses)):
         x, y, z, radius = sonar_pulses[i]
-        radius += 1.0
+        radius += 1.0 * dt
         if radius > SONAR_MAX_RADIUS:
             radius = 0.0
         sonar_pulses[i] = (x, y, z, radius)
 
+# ---------------- Simulation Step ----------------
+def step(dt=1.0):
+    """Move the submarine, maybe emit a pulse and grow the pulses by `dt` frames."""
+    if not paused:
+        # Autonomous movement
+        sub_pos[0] += sub_dir[0] * dt
+        sub_pos[1] += sub_dir[1] * dt
+        sub_pos[2] += sub_dir[2] * dt
+
+        # Bounce from boundaries
+        for i in range(3):
+            if abs(sub_pos[i]) > 50:
+                sub_dir[i] *= -1
+
+        # Randomly deploy sonar pulse
+        if random.random() < 0.05 * dt:
+            sonar_pulses.append((sub_pos[0], sub_pos[1], sub_pos[2], 0.0))
+
+    update_sonar(dt)
+
 # ---------------- Draw Flare ----------------
 def draw_flare():
     if flare_active:
@@ -117,22 +137,7 @@ def display():
     draw_sonar()
     draw_flare()
 
-    if not paused:
-        # Autonomous movement
-        sub_pos[0] += sub_dir[0]
-        sub_pos[1] += sub_dir[1]
-        sub_pos[2] += sub_dir[2]
-
-        # Bounce from boundaries
-        for i in range(3):
-            if abs(sub_pos[i]) > 50:
-                sub_dir[i] *= -1
-
-        # Randomly deploy sonar pulse
-        if random.random() < 0.05:
-            sonar_pulses.append((sub_pos[0], sub_pos[1], sub_pos[2], 0.0))
-
-    update_sonar()
+    step()
 
     if SHOW_INSTRUCTIONS:
         glColor3f(1,1,1)
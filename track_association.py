@@ -0,0 +1,181 @@
+"""
+track_association.py
+
+Global-nearest-neighbour association of radar detections to tracks.
+
+A sweep produces an unlabelled list of detections (true echoes, with misses,
+plus clutter); each has to be matched to at most one track and each track to
+at most one detection. Solving that as one assignment problem is cubic in
+the number of targets, so it is split up:
+
+- gating: every track's Mahalanobis gate d^2 = y^T S^-1 y < GATE (chi-square,
+  2 dof) is checked only against the detections in the grid cells its gate
+  ellipse can reach (detections are sorted by cell, each track's rows of
+  cells are contiguous runs, as in ap_index.APGrid.strongest)
+- clustering: tracks and detections linked by a gated pair form connected
+  components, found by vectorized label propagation
+- assignment: a cluster of one track and one detection is matched directly;
+  larger clusters are solved optimally with the Hungarian algorithm below
+  (tracks may also stay unassigned at cost GATE), or greedily by distance
+  once they exceed MAX_CLUSTER tracks or detections
+
+Dependencies:
+- numpy
+- track_bank.py (the tracks)
+"""
+
+import numpy as np
+
+GATE = 9.21          # chi-square 99% for 2 degrees of freedom
+MAX_CLUSTER = 64     # larger clusters fall back to greedy assignment
+_UNGATED = 1e9
+
+
+def gate_reach(bank, ids, gate=GATE):
+    """Bound on the radius of each track's gate ellipse: sqrt(gate * largest eigenvalue of S) <= sqrt(gate * trace S)."""
+    P = bank.cov[ids]
+    return np.sqrt(gate * (P[:, 0, 0] + P[:, 1, 1] + 2.0 * bank.r))
+
+
+def gate_pairs(bank, ids, zx, zy, gate=GATE):
+    """
+    Gated (track, detection) pairs of the tracks `ids` (predicted to the
+    detection time) and detections (zx, zy), as (ti, di, d2) with ti / di
+    indices into ids / the detections.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    zx, zy = np.asarray(zx, dtype=np.float64), np.asarray(zy, dtype=np.float64)
+    if not len(ids) or not len(zx):
+        return empty, empty, np.zeros(0)
+    reach = gate_reach(bank, ids, gate)
+    cell = max(float(np.median(reach)), 1.0)
+    tx, ty = bank.positions(ids)
+
+    key = np.floor_divide(zy, cell).astype(np.int64) * 2 ** 32 + np.floor_divide(zx, cell).astype(np.int64)
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+
+    # One run of detections per track and cell row its gate reaches
+    col0, col1 = np.floor_divide(tx - reach, cell).astype(np.int64), np.floor_divide(tx + reach, cell).astype(np.int64)
+    row0, row1 = np.floor_divide(ty - reach, cell).astype(np.int64), np.floor_divide(ty + reach, cell).astype(np.int64)
+    rows = row1 - row0 + 1
+    run_track = np.repeat(np.arange(len(ids)), rows)
+    run_row = row0[run_track] + np.arange(int(rows.sum())) - np.repeat(np.cumsum(rows) - rows, rows)
+    lo = np.searchsorted(sorted_key, run_row * 2 ** 32 + col0[run_track], 'left')
+    hi = np.searchsorted(sorted_key, run_row * 2 ** 32 + col1[run_track], 'right')
+    count = hi - lo
+    total = int(count.sum())
+    ti = np.repeat(run_track, count)
+    di = order[np.repeat(lo - (np.cumsum(count) - count), count) + np.arange(total)]
+
+    y, S_inv = bank.innovation(ids[ti], zx[di], zy[di])
+    d2 = np.einsum('ni,nij,nj->n', y, S_inv, y)
+    keep = d2 < gate
+    return ti[keep], di[keep], d2[keep]
+
+
+def clusters(ti, di, tracks, detections):
+    """Cluster label of every track and every detection (connected components of the gated pairs)."""
+    label = np.arange(tracks + detections)
+    dnode = di + tracks
+    while True:
+        link = np.minimum(label[ti], label[dnode])
+        new = label.copy()
+        np.minimum.at(new, ti, link)
+        np.minimum.at(new, dnode, link)
+        new = new[new]     # pointer jumping
+        if np.array_equal(new, label):
+            return label[:tracks], label[tracks:]
+        label = new
+
+
+def hungarian(cost):
+    """
+    Minimum-cost assignment of every row of an (n, m) cost matrix, n <= m,
+    to a distinct column (shortest augmenting paths with potentials).
+    Returns the column of each row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)      # row (1-based) assigned to column j, 0 = none
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free[1:] & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            masked = np.where(free, minv, np.inf)
+            j1 = int(masked.argmin())
+            delta = masked[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    col = np.empty(n, dtype=np.int64)
+    assigned = np.flatnonzero(p[1:])
+    col[p[assigned + 1] - 1] = assigned
+    return col
+
+
+def _solve_cluster(ti, di, d2, gate):
+    """Optimal pairs of one cluster; a track may stay unassigned at cost `gate`."""
+    tracks, t_local = np.unique(ti, return_inverse=True)
+    dets, d_local = np.unique(di, return_inverse=True)
+    n, m = len(tracks), len(dets)
+    if max(n, m) > MAX_CLUSTER:
+        # Greedy: best remaining gated pair first
+        used_t, used_d, keep = set(), set(), []
+        for k in np.argsort(d2, kind='stable').tolist():
+            if ti[k] not in used_t and di[k] not in used_d:
+                used_t.add(ti[k])
+                used_d.add(di[k])
+                keep.append(k)
+        return ti[keep], di[keep]
+    cost = np.full((n, m + n), _UNGATED)
+    cost[t_local, d_local] = d2
+    cost[:, m:] = gate
+    col = hungarian(cost)
+    hit = (col < m) & (cost[np.arange(n), np.minimum(col, m - 1)] < gate)
+    return tracks[hit], dets[col[hit]]
+
+
+def associate(bank, ids, zx, zy, gate=GATE):
+    """
+    Global-nearest-neighbour assignment of detections (zx, zy) to the tracks
+    `ids`. Returns (track_idx, det_idx): matched indices into ids and the
+    detections; everything else is unassigned.
+    """
+    ti, di, d2 = gate_pairs(bank, ids, zx, zy, gate)
+    if not len(ti):
+        return ti, di
+    t_label, _ = clusters(ti, di, len(ids), len(zx))
+    label = t_label[ti]
+    order = np.argsort(label, kind='stable')
+    ti, di, d2, label = ti[order], di[order], d2[order], label[order]
+    starts = np.flatnonzero(np.r_[True, label[1:] != label[:-1]])
+    sizes = np.diff(np.r_[starts, len(label)])
+
+    # Clusters that are a single gated pair need no solver
+    single = sizes == 1
+    out_t, out_d = [ti[starts[single]]], [di[starts[single]]]
+    for s, k in zip(starts[~single].tolist(), sizes[~single].tolist()):
+        t, d = _solve_cluster(ti[s:s + k], di[s:s + k], d2[s:s + k], gate)
+        out_t.append(t)
+        out_d.append(d)
+    return np.concatenate(out_t), np.concatenate(out_d)
@@ -0,0 +1,193 @@
+"""
+track_bank.py
+
+Constant-velocity Kalman filters for many radar tracks at once.
+
+radar_ai_scanner.py used to give every target its own KalmanFilter2D, a
+chain of tiny np.dot calls plus np.linalg.inv(S) per target per frame, so the
+per-call NumPy overhead dwarfed the 4x4 arithmetic. `TrackBank` keeps every
+track in stacked arrays instead:
+
+- state (N, 4): x, y, vx, vy
+- cov   (N, 4, 4)
+
+and runs predict and update for any set of tracks in one vectorized pass:
+
+- predict: F P F^T is a row operation plus a column operation (F only adds
+  dt * velocity to position), done in place on the stack
+- update: the innovation covariance S = P[:2, :2] + R is 2x2 and symmetric,
+  so its inverse is closed-form; the covariance update uses the Joseph form
+  (I - K H) P (I - K H)^T + K R K^T, which keeps P symmetric and positive
+  definite in float arithmetic
+
+Every track also keeps the time its state refers to (`stamp`), so tracks the
+radar beam does not touch need not be predicted every frame: predict_to()
+catches a track up with one step of the elapsed time when it is next
+measured, and extrapolate() gives its current position for drawing.
+
+A scanning radar sees each track once per look (beam pass). end_look()
+closes a look for a set of tracks: it shifts whether each was updated into a
+per-track hit history, one bit per look, and counts consecutive misses, so a
+caller can confirm a track on M hits in its last N looks (hits_in) and drop
+one after K misses in a row.
+
+Track ids are slots in the arrays and stay valid until the track is removed.
+
+Dependencies:
+- numpy
+"""
+
+import numpy as np
+
+PROCESS_NOISE = 0.1        # Q = q * I
+MEASUREMENT_NOISE = 25.0   # R = r * I (position measurements)
+INITIAL_VARIANCE = 500.0   # P0 = p0 * I (pv0 for the velocity, default p0)
+HISTORY_LOOKS = 32         # looks kept in the hit history
+
+
+class TrackBank:
+    """Kalman-filtered tracks in stacked state / covariance arrays."""
+
+    def __init__(self, q=PROCESS_NOISE, r=MEASUREMENT_NOISE, p0=INITIAL_VARIANCE, pv0=None):
+        self.q = q
+        self.r = r
+        self.p0 = p0
+        self.pv0 = p0 if pv0 is None else pv0
+        self.state = np.zeros((0, 4))
+        self.cov = np.zeros((0, 4, 4))
+        self.intensity = np.zeros(0)
+        self.life = np.zeros(0, dtype=np.int64)    # updates since birth
+        self.misses = np.zeros(0, dtype=np.int64)  # consecutive looks without an update
+        self.history = np.zeros(0, dtype=np.int64) # one bit per look, latest in bit 0: 1 = updated during it
+        self.confirmed = np.zeros(0, dtype=bool)   # set by the caller's confirmation rule
+        self.stamp = np.zeros(0)                   # time (frames) of each state
+        self.updated = np.zeros(0)                 # time of the last measurement update
+        self.alive = np.zeros(0, dtype=bool)
+        self._free = []
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def ids(self):
+        return np.flatnonzero(self.alive)
+
+    def positions(self, ids=None):
+        """(x, y) arrays of the tracks `ids` (default: all live tracks)."""
+        ids = self.ids() if ids is None else ids
+        return self.state[ids, 0], self.state[ids, 1]
+
+    # ---------------- edits ------------------
+    def _grow(self, count):
+        old = len(self.alive)
+        extra = max(old, count, 16)
+        self.state = np.concatenate([self.state, np.zeros((extra, 4))])
+        self.cov = np.concatenate([self.cov, np.zeros((extra, 4, 4))])
+        self.intensity = np.concatenate([self.intensity, np.zeros(extra)])
+        self.life = np.concatenate([self.life, np.zeros(extra, dtype=np.int64)])
+        self.misses = np.concatenate([self.misses, np.zeros(extra, dtype=np.int64)])
+        self.history = np.concatenate([self.history, np.zeros(extra, dtype=np.int64)])
+        self.confirmed = np.concatenate([self.confirmed, np.zeros(extra, dtype=bool)])
+        self.stamp = np.concatenate([self.stamp, np.zeros(extra)])
+        self.updated = np.concatenate([self.updated, np.zeros(extra)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self._free.extend(range(old + extra - 1, old - 1, -1))
+
+    def add(self, x, y, intensity=1.0, vx=0.0, vy=0.0, now=0.0):
+        """Start tracks at positions (x, y) (scalars or arrays) at time `now`; returns their ids."""
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        if len(self._free) < len(x):
+            self._grow(len(x) - len(self._free))
+        ids = np.array([self._free.pop() for _ in range(len(x))], dtype=np.int64)
+        self.state[ids] = np.stack(np.broadcast_arrays(x, y, vx, vy), axis=1)
+        self.cov[ids] = np.diag([self.p0, self.p0, self.pv0, self.pv0])
+        self.intensity[ids] = intensity
+        self.life[ids] = 0
+        self.misses[ids] = 0
+        self.history[ids] = 0
+        self.confirmed[ids] = False
+        self.stamp[ids] = now
+        self.updated[ids] = now
+        self.alive[ids] = True
+        return ids
+
+    def remove(self, ids):
+        """Drop tracks; their ids may be reused by later adds."""
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        self.alive[ids] = False
+        self._free.extend(ids.tolist())
+
+    def end_look(self, ids, hit):
+        """
+        Close one look of the tracks `ids`: `hit` (bool per track) says which
+        were updated during it. A hit resets the miss count, a miss adds one.
+        """
+        hit = np.asarray(hit, dtype=bool)
+        self.history[ids] = ((self.history[ids] << 1) | hit) & ((1 << HISTORY_LOOKS) - 1)
+        self.misses[ids] = np.where(hit, 0, self.misses[ids] + 1)
+
+    def hits_in(self, ids, looks):
+        """Number of looks among the last `looks` (at most HISTORY_LOOKS) in which each track was updated."""
+        recent = self.history[ids] & ((1 << looks) - 1)
+        return sum((recent >> k) & 1 for k in range(looks))
+
+    # ---------------- filtering ------------------
+    def predict(self, ids=None, dt=1.0):
+        """
+        Advance the tracks `ids` by `dt` (a scalar or one per track) with
+        constant velocity. Without ids every slot is advanced in place (free
+        slots too, which is harmless and saves the gather / scatter).
+        """
+        if ids is None:
+            ids = slice(None)
+            x, P = self.state, self.cov
+        else:
+            x, P = self.state[ids], self.cov[ids]
+        dt = np.asarray(dt, dtype=np.float64)
+        x[:, :2] += dt[..., None] * x[:, 2:]
+        # F P F^T: add dt * velocity rows to position rows, then the same for columns
+        P[:, :2, :] += dt[..., None, None] * P[:, 2:, :]
+        P[:, :, :2] += dt[..., None, None] * P[:, :, 2:]
+        P.reshape(len(P), 16)[:, ::5] += self.q * dt[..., None]
+        self.stamp[ids] += dt
+        if not isinstance(ids, slice):
+            self.state[ids], self.cov[ids] = x, P
+
+    def predict_to(self, ids, now):
+        """Predict the tracks `ids` from their own stamps up to time `now`."""
+        self.predict(ids, now - self.stamp[ids])
+
+    def extrapolate(self, ids, now):
+        """Predicted (x, y) of the tracks `ids` at time `now`, without changing them."""
+        dt = now - self.stamp[ids]
+        return self.state[ids, 0] + dt * self.state[ids, 2], self.state[ids, 1] + dt * self.state[ids, 3]
+
+    def innovation(self, ids, zx, zy):
+        """
+        Innovations (n, 2) and inverse innovation covariances (n, 2, 2) of the
+        position measurements (zx, zy) against the tracks `ids`.
+        """
+        P = self.cov[ids]
+        a = P[:, 0, 0] + self.r
+        b = P[:, 0, 1]
+        d = P[:, 1, 1] + self.r
+        inv_det = 1.0 / (a * d - b * b)
+        S_inv = np.empty((len(a), 2, 2))
+        S_inv[:, 0, 0] = d * inv_det
+        S_inv[:, 1, 1] = a * inv_det
+        S_inv[:, 0, 1] = S_inv[:, 1, 0] = -b * inv_det
+        y = np.stack([np.asarray(zx) - self.state[ids, 0], np.asarray(zy) - self.state[ids, 1]], axis=1)
+        return y, S_inv
+
+    def update(self, ids, zx, zy):
+        """Correct the tracks `ids` with position measurements (zx, zy) (one per track)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        y, S_inv = self.innovation(ids, zx, zy)
+        P = self.cov[ids]
+        K = P[:, :, :2] @ S_inv                        # (n, 4, 2) = P H^T S^-1
+        self.state[ids] += (K @ y[:, :, None])[:, :, 0]
+        A = np.broadcast_to(np.eye(4), P.shape).copy()  # I - K H
+        A[:, :, :2] -= K
+        self.cov[ids] = A @ P @ A.transpose(0, 2, 1) + self.r * (K @ K.transpose(0, 2, 1))
+        self.life[ids] += 1
+        self.misses[ids] = 0
+        self.updated[ids] = self.stamp[ids]
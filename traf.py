@@ -4,11 +4,11 @@ Uses the Mid-Point Circle Algorithm (MPCA) to render the roundabout, lanes, and
 
 Features:
 - Animated cars moving along roundabout lanes
-- Collision avoidance using local path planning
+- Collision avoidance: IDM car-following within discrete lanes (traffic_fleet.py)
 - Adjustable traffic density and car speed
 - Traffic light simulation at entry points with changing colors
 - Keyboard controls: '+' / '-' change traffic density, 'S' / 's' speed, 'I' toggle instructions
-- Self-contained Python + PyOpenGL code, no external packages needed
+- Python + PyOpenGL + NumPy (circles rasterized by the shared mpca.py module)
 
 Run:
     python3 traffic_roundabout.py
@@ -19,7 +19,9 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
-import random
+import numpy as np
+import mpca_gl
+import traffic_fleet
 
 # ------------------------ Configuration ------------------------
 WIDTH, HEIGHT = 800, 800
@@ -29,97 +31,40 @@ MAX_RADIUS = 250
 CAR_WIDTH = 6  # New: Car dimensions
 CAR_LENGTH = 12 # New: Car dimensions
 CAR_SPEED = 1.5  # degrees per frame
+NUM_LANES = 3
 SHOW_INSTRUCTIONS = True
 USE_MPCA = True
 TRAFFIC_LIGHT_INTERVAL = 200  # frames per light change
 
 # state
-cars = []
+fleet = traffic_fleet.CarFleet([], [], [], [])
 frame_counter = 0
+lane_rings = None  # retained VBO for the lane markings
 traffic_light_state = 0  # 0=green, 1=yellow, 2=red
 
-# ---------------- Mid-Point Circle Algorithm ------------------
-def midpoint_circle_points(xc, yc, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    pts = []
-    while x >= y:
-        pts.extend([
-            (xc + x, yc + y), (xc - x, yc + y),
-            (xc + x, yc - y), (xc - x, yc - y),
-            (xc + y, yc + x), (xc - y, yc + x),
-            (xc + y, yc - x), (xc - y, yc - x),
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    unique = []
-    s = set()
-    for px, py in pts:
-        ix, iy = int(round(px)), int(round(py))
-        if (ix, iy) not in s and 0 <= ix < WIDTH and 0 <= iy < HEIGHT:
-            unique.append((ix, iy))
-            s.add((ix, iy))
-    return unique
-
-# ---------------- Car Class ------------------
-class Car:
-    def __init__(self, lane_radius, angle, speed):
-        self.radius = lane_radius
-        self.angle = angle  # degrees
-        self.speed = speed  # degrees per frame
-        self.color = (random.uniform(0.3, 1.0), random.uniform(0.3, 1.0), random.uniform(0.3, 1.0)) # Random car color
-
-    def update(self):
-        global traffic_light_state
-        # Simple logic: cars slow down if red light is active at entry angle ~0 deg
-        if traffic_light_state == 2 and (0 <= self.angle % 360 <= 30):
-            pass  # stop car temporarily
-        else:
-            self.angle = (self.angle + self.speed) % 360
-
-    def position(self):
-        rad = math.radians(self.angle)
-        x = WIDTH/2 + self.radius * math.cos(rad)
-        y = HEIGHT/2 + self.radius * math.sin(rad)
-        return x, y
-
 # ---------------- Generate Cars ------------------
 def generate_cars(num=NUM_CARS):
-    global cars
-    cars = []
-    for _ in range(num):
-        lane_radius = random.uniform(MIN_RADIUS + CAR_WIDTH/2, MAX_RADIUS - CAR_WIDTH/2) # Adjust radius range
-        angle = random.uniform(0, 360)
-        speed = CAR_SPEED * random.uniform(0.8, 1.2)
-        cars.append(Car(lane_radius, angle, speed))
+    global fleet
+    # Every car drives on the centre line of one of the NUM_LANES lanes
+    radii = traffic_fleet.lane_radii(MIN_RADIUS, MAX_RADIUS, NUM_LANES)
+    fleet = traffic_fleet.CarFleet.on_lanes(num, radii, CAR_SPEED, CAR_LENGTH)
 
 # ---------------- Draw Roundabout ------------------
 def draw_roundabout():
-    num_lanes = 3
-    lane_width = (MAX_RADIUS - MIN_RADIUS)/num_lanes
-    for i in range(num_lanes):
-        radius = MIN_RADIUS + (i + 0.5) * lane_width
-        color = (0.2, 0.2, 0.2, 0.8)
-        if USE_MPCA:
-            draw_circle_mpca(WIDTH/2, HEIGHT/2, radius, color)
-        else:
+    global lane_rings
+    radii = traffic_fleet.lane_radii(MIN_RADIUS, MAX_RADIUS, NUM_LANES)
+    color = (0.2, 0.2, 0.2, 0.8)
+    if USE_MPCA:
+        # Lane markings only change with NUM_LANES, so they stay in one VBO
+        if lane_rings is None:
+            lane_rings = mpca_gl.CircleBatch()
+        lane_rings.set_circles([(WIDTH/2, HEIGHT/2, r) for r in radii], color, WIDTH, HEIGHT)
+        lane_rings.draw(point_size=1)
+    else:
+        for radius in radii:
             draw_circle_poly(WIDTH/2, HEIGHT/2, radius, color)
 
 # ---------------- Circle Drawing Helpers ------------------
-def draw_circle_mpca(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5)):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glPointSize(1)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(int(round(xc)), int(round(yc)), int(round(radius))):
-        glVertex2i(x, y)
-    glEnd()
-
 def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=128):
     r, g, b, a = color
     glColor4f(r, g, b, a)
@@ -131,49 +76,12 @@ def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=128):
         glVertex2f(x, y)
     glEnd()
 
-# ---------------- Draw Cars (MODIFIED) ------------------
+# ---------------- Draw Cars ------------------
 def draw_cars():
-    glLineWidth(1.0) # For drawing car outlines
-    
-    for car in cars:
-        x, y = car.position()
-        
-        # The car's direction is tangent to the circle, which is 90 degrees clockwise
-        # (or -90 degrees counter-clockwise) from its angle relative to the center.
-        # OpenGL rotation is in degrees.
-        car_rotation_angle = car.angle - 90 
-        
-        # 1. Translate to car position
-        glPushMatrix()
-        glTranslatef(x, y, 0)
-        
-        # 2. Rotate the coordinate system to align with the car's direction
-        glRotatef(car_rotation_angle, 0, 0, 1)
-        
-        # 3. Draw the rectangular car body at (0, 0) in the rotated system
-        
-        # Body Color
-        glColor3f(*car.color)
-        glBegin(GL_QUADS)
-        # Vertices relative to (0,0) center, forming a rectangle
-        glVertex2f(-CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f( CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f( CAR_LENGTH/2,  CAR_WIDTH/2)
-        glVertex2f(-CAR_LENGTH/2,  CAR_WIDTH/2)
-        glEnd()
-        
-        # Draw a small "headlight" for direction
-        glColor3f(1.0, 1.0, 0.0) # Yellow light
-        glBegin(GL_QUADS)
-        # Front of the car
-        glVertex2f(CAR_LENGTH/2 - 2, -CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2,  CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2 - 2, CAR_WIDTH/2)
-        glEnd()
-        
-        # 4. Restore the original coordinate system
-        glPopMatrix()
+    # Body and headlight quads of the whole fleet, computed at once and drawn
+    # with one vertex array
+    quads, colors = traffic_fleet.car_quads(fleet, WIDTH/2, HEIGHT/2, CAR_LENGTH, CAR_WIDTH)
+    mpca_gl.draw_vertices(GL_QUADS, quads, np.repeat(colors, 4, axis=0))
 
 # ---------------- Traffic Lights ------------------
 def draw_traffic_lights():
@@ -212,8 +120,7 @@ def display():
 
     draw_roundabout()
 
-    for car in cars:
-        car.update()
+    fleet.update(red_light=traffic_light_state == 2)
     draw_cars()
 
     draw_traffic_lights()
@@ -242,12 +149,14 @@ def reshape(w, h):
 def keyboard(key, x, y):
     global NUM_CARS, CAR_SPEED, SHOW_INSTRUCTIONS
     k = key.decode('utf-8') if isinstance(key, bytes) else key
-    if k == '+': NUM_CARS += 1; generate_cars(NUM_CARS)
-    elif k == '-': NUM_CARS = max(1, NUM_CARS - 1); generate_cars(NUM_CARS)
+    if k == '+': fleet.spawn(1, CAR_SPEED); NUM_CARS = len(fleet)
+    elif k == '-':
+        if NUM_CARS > 1: NUM_CARS -= 1; fleet.despawn(1)
     elif k in ('s', 'S'):
+        old_speed = CAR_SPEED
         if k == 's': CAR_SPEED = max(0.1, CAR_SPEED - 0.2)
         else: CAR_SPEED += 0.2
-        for car in cars: car.speed = CAR_SPEED
+        fleet.scale_speed(CAR_SPEED / old_speed)
     elif k in ('i', 'I'): SHOW_INSTRUCTIONS = not SHOW_INSTRUCTIONS
     elif k in ('q', 'Q', '\x1b'): glutLeaveMainLoop()
     glutPostRedisplay()
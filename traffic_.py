@@ -6,10 +6,10 @@ Uses the Mid-Point Circle Algorithm (MPCA) to render the roundabout and lanes.
 
 Features:
 - Animated cars moving along roundabout lanes
-- Collision avoidance using local path planning
+- Collision avoidance: IDM car-following within discrete lanes (traffic_fleet.py)
 - Adjustable traffic density and car speed
 - Keyboard controls: '+' / '-' change traffic density, 'S' / 's' speed, 'I' toggle instructions
-- Self-contained Python + PyOpenGL code, no external packages needed
+- Python + PyOpenGL + NumPy (circles rasterized by the shared mpca.py module)
 
 Run:
     python3 traffic_roundabout.py
@@ -20,7 +20,9 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
-import random
+import numpy as np
+import mpca_gl
+import traffic_fleet
 
 # ------------------------ Configuration ------------------------
 WIDTH, HEIGHT = 800, 800
@@ -29,89 +31,38 @@ MIN_RADIUS = 150
 MAX_RADIUS = 250
 CAR_SIZE = 8
 CAR_SPEED = 1.5  # degrees per frame
+NUM_LANES = 3
 SHOW_INSTRUCTIONS = True
 USE_MPCA = True
 
 # state
-cars = []
+fleet = traffic_fleet.CarFleet([], [], [], [])
 frame_counter = 0
-
-# ---------------- Mid-Point Circle Algorithm ------------------
-def midpoint_circle_points(xc, yc, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    pts = []
-    while x >= y:
-        pts.extend([
-            (xc + x, yc + y), (xc - x, yc + y),
-            (xc + x, yc - y), (xc - x, yc - y),
-            (xc + y, yc + x), (xc - y, yc + x),
-            (xc + y, yc - x), (xc - y, yc - x),
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    unique = []
-    s = set()
-    for px, py in pts:
-        ix, iy = int(round(px)), int(round(py))
-        if (ix, iy) not in s and 0 <= ix < WIDTH and 0 <= iy < HEIGHT:
-            unique.append((ix, iy))
-            s.add((ix, iy))
-    return unique
-
-# ---------------- Car Class ------------------
-class Car:
-    def __init__(self, lane_radius, angle, speed):
-        self.radius = lane_radius
-        self.angle = angle  # degrees
-        self.speed = speed  # degrees per frame
-
-    def update(self):
-        self.angle = (self.angle + self.speed) % 360
-
-    def position(self):
-        rad = math.radians(self.angle)
-        x = WIDTH/2 + self.radius * math.cos(rad)
-        y = HEIGHT/2 + self.radius * math.sin(rad)
-        return x, y
+lane_rings = None  # retained VBO for the lane markings
 
 # ---------------- Generate Cars ------------------
 def generate_cars(num=NUM_CARS):
-    global cars
-    cars = []
-    for _ in range(num):
-        lane_radius = random.uniform(MIN_RADIUS, MAX_RADIUS)
-        angle = random.uniform(0, 360)
-        speed = CAR_SPEED * random.uniform(0.8, 1.2)
-        cars.append(Car(lane_radius, angle, speed))
+    global fleet
+    # Every car drives on the centre line of one of the NUM_LANES lanes
+    radii = traffic_fleet.lane_radii(MIN_RADIUS, MAX_RADIUS, NUM_LANES)
+    fleet = traffic_fleet.CarFleet.on_lanes(num, radii, CAR_SPEED, CAR_SIZE)
 
 # ---------------- Draw Roundabout ------------------
 def draw_roundabout():
-    num_lanes = 3
-    lane_width = (MAX_RADIUS - MIN_RADIUS)/num_lanes
-    for i in range(num_lanes):
-        radius = MIN_RADIUS + (i + 0.5) * lane_width
-        color = (0.2, 0.2, 0.2, 0.8)  # lane color
-        if USE_MPCA:
-            draw_circle_mpca(WIDTH/2, HEIGHT/2, radius, color)
-        else:
+    global lane_rings
+    radii = traffic_fleet.lane_radii(MIN_RADIUS, MAX_RADIUS, NUM_LANES)
+    color = (0.2, 0.2, 0.2, 0.8)  # lane color
+    if USE_MPCA:
+        # Lane markings never change, so they are uploaded to one VBO once
+        if lane_rings is None:
+            lane_rings = mpca_gl.CircleBatch()
+        lane_rings.set_circles([(WIDTH/2, HEIGHT/2, r) for r in radii], color, WIDTH, HEIGHT)
+        lane_rings.draw(point_size=1)
+    else:
+        for radius in radii:
             draw_circle_poly(WIDTH/2, HEIGHT/2, radius, color)
 
 # ---------------- Circle Drawing Helpers ------------------
-def draw_circle_mpca(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5)):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glPointSize(1)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(int(round(xc)), int(round(yc)), int(round(radius))):
-        glVertex2i(x, y)
-    glEnd()
-
 def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=128):
     r, g, b, a = color
     glColor4f(r, g, b, a)
@@ -125,13 +76,10 @@ def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=128):
 
 # ---------------- Draw Cars ------------------
 def draw_cars():
+    # Every car position computed at once and drawn with one vertex array
+    x, y = fleet.positions(WIDTH/2, HEIGHT/2)
     glPointSize(CAR_SIZE)
-    glBegin(GL_POINTS)
-    for car in cars:
-        x, y = car.position()
-        glColor3f(1.0, 0.0, 0.0)  # car color
-        glVertex2f(x, y)
-    glEnd()
+    mpca_gl.draw_vertices(GL_POINTS, np.stack([x, y], axis=1), (1.0, 0.0, 0.0))  # car color
 
 # ---------------- Draw Instructions ------------------
 def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_12):
@@ -148,8 +96,7 @@ def display():
 
     draw_roundabout()
 
-    for car in cars:
-        car.update()
+    fleet.update()
     draw_cars()
 
     if SHOW_INSTRUCTIONS:
@@ -176,12 +123,14 @@ def reshape(w, h):
 def keyboard(key, x, y):
     global NUM_CARS, CAR_SPEED, SHOW_INSTRUCTIONS
     k = key.decode('utf-8') if isinstance(key, bytes) else key
-    if k == '+': NUM_CARS += 1; generate_cars(NUM_CARS)
-    elif k == '-': NUM_CARS = max(1, NUM_CARS - 1); generate_cars(NUM_CARS)
+    if k == '+': fleet.spawn(1, CAR_SPEED); NUM_CARS = len(fleet)
+    elif k == '-':
+        if NUM_CARS > 1: NUM_CARS -= 1; fleet.despawn(1)
     elif k in ('s', 'S'):
+        old_speed = CAR_SPEED
         if k == 's': CAR_SPEED = max(0.1, CAR_SPEED - 0.2)
         else: CAR_SPEED += 0.2
-        for car in cars: car.speed = CAR_SPEED
+        fleet.scale_speed(CAR_SPEED / old_speed)
     elif k in ('i', 'I'): SHOW_INSTRUCTIONS = not SHOW_INSTRUCTIONS
     elif k in ('q', 'Q', '\x1b'): glutLeaveMainLoop()
     glutPostRedisplay()
@@ -0,0 +1,344 @@
+"""
+traffic_fleet.py
+
+Structure-of-arrays car fleet for the roundabout simulations.
+
+The scenes used to keep one `Car` object per vehicle and call `update()` and
+`position()` on each of them every frame. `CarFleet` keeps lane, radius,
+angle, speed and colour of every car in NumPy arrays and advances the whole
+fleet in one vectorized step. The arrays double as an object pool with a free
+list, so cars can be added and removed one at a time without rebuilding the
+fleet.
+
+Cars drive on discrete lanes and keep their distance with the Intelligent
+Driver Model (IDM): each car accelerates towards its desired speed and brakes
+for the car ahead in its lane (its "leader"). Leaders come from a per-lane
+index sorted by angle; since IDM cars never overtake, the circular order of a
+lane only changes when cars are added or removed, so the index is rebuilt
+(O(n log n)) only then and merely re-validated (O(n)) on each step.
+
+The red-light stop zone of the old `Car.update` is kept: on red, cars with
+0 <= angle % 360 <= 30 wait, and the cars behind them queue up.
+
+New cars never overlap: `spawn` puts each one in the largest free gap of its
+lane and only where it keeps `length + MIN_GAP` to both neighbours. A full
+lane passes its cars on to lanes with room; when the whole roundabout is full
+the remaining cars are not spawned.
+
+Dependencies:
+- numpy
+"""
+
+import heapq
+import numpy as np
+
+STOP_ZONE = (0.0, 30.0)  # degrees in front of the entry light where cars wait on red
+
+
+def lane_radii(min_radius, max_radius, num_lanes):
+    """Centre-line radius of each of `num_lanes` equal lanes between the two radii."""
+    lane_width = (max_radius - min_radius) / num_lanes
+    return min_radius + (np.arange(num_lanes) + 0.5) * lane_width
+
+
+class CarFleet:
+    """
+    All cars of a roundabout, one array slot per car.
+
+    The arrays are an object pool: `spawn` takes slots from a free list and
+    `despawn` returns them, so density changes cost O(1) per car and leave the
+    other cars' state alone. Dead slots keep their old values and are skipped
+    via `alive`; `slots()` lists the live ones in slot order.
+    """
+
+    # IDM parameters, in pixels and frames
+    MAX_ACCEL = 0.05      # a: maximum acceleration
+    COMFORT_DECEL = 0.15  # b: comfortable deceleration
+    MIN_GAP = 4.0         # s0: bumper-to-bumper gap when stopped
+    HEADWAY = 8.0         # T: desired time gap to the leader
+    DELTA = 4             # acceleration exponent
+
+    def __init__(self, radius, angle, speed, color, lane=None, length=12.0, lane_radii=None):
+        self.radius = np.array(radius, dtype=np.float64)    # lane radius (pixels)
+        self.angle = np.array(angle, dtype=np.float64)      # degrees
+        self.speed = np.array(speed, dtype=np.float64)      # desired speed, degrees per frame
+        self.velocity = self.speed.copy()                   # current speed, degrees per frame
+        self.color = np.array(color, dtype=np.float32).reshape(-1, 3)
+        self.lane = np.zeros(len(self.angle), dtype=np.int64) if lane is None else np.array(lane, dtype=np.int64)
+        self.alive = np.ones(len(self.angle), dtype=bool)
+        self.length = length
+        self.lane_radii = None if lane_radii is None else np.asarray(lane_radii, dtype=np.float64)
+        self._free = []
+        self._slots = None
+        self._leader = None
+
+    @classmethod
+    def on_lanes(cls, count, lane_radii, base_speed, length=12.0, rng=np.random):
+        """Spawn `count` cars on random discrete lanes at random angles."""
+        fleet = cls([], [], [], [], length=length, lane_radii=lane_radii)
+        fleet.spawn(count, base_speed, rng)
+        return fleet
+
+    def __len__(self):
+        return len(self.slots())
+
+    @property
+    def capacity(self):
+        return len(self.alive)
+
+    def slots(self):
+        """Indices of the live cars, in slot order."""
+        if self._slots is None:
+            self._slots = np.flatnonzero(self.alive)
+            # Per-car constants of the live cars, gathered once per membership change
+            self._lane_live = self.lane[self._slots]
+            self._px_per_deg = np.radians(self.radius[self._slots])
+            self._lane_cars = np.bincount(self._lane_live, minlength=self._num_lanes())
+        return self._slots
+
+    def _num_lanes(self):
+        if self.lane_radii is not None:
+            return max(len(self.lane_radii), int(self.lane.max(initial=-1)) + 1)
+        return int(self.lane.max(initial=-1)) + 1
+
+    # ---------------- object pool ------------------
+    def _grow(self, capacity):
+        """Enlarge every array to `capacity` slots and put the new ones on the free list."""
+        old = self.capacity
+        extra = capacity - old
+        self.radius = np.concatenate([self.radius, np.zeros(extra)])
+        self.angle = np.concatenate([self.angle, np.zeros(extra)])
+        self.speed = np.concatenate([self.speed, np.zeros(extra)])
+        self.velocity = np.concatenate([self.velocity, np.zeros(extra)])
+        self.color = np.concatenate([self.color, np.zeros((extra, 3), dtype=np.float32)])
+        self.lane = np.concatenate([self.lane, np.zeros(extra, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        # Popped from the end, so the lowest new slots are used first
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def spawn(self, count, base_speed, rng=np.random):
+        """
+        Add up to `count` cars on random lanes, each in the largest free gap
+        of its lane; returns the slots of the cars that fit.
+        """
+        if self.lane_radii is None:
+            raise ValueError('spawn needs a fleet created with lane_radii')
+        if count <= 0:
+            return np.zeros(0, dtype=np.int64)
+        lane, angle = self._place(rng.randint(0, len(self.lane_radii), count), rng)
+        count = len(lane)
+        if not count:
+            return np.zeros(0, dtype=np.int64)
+        if len(self._free) < count:
+            self._grow(max(2 * self.capacity, self.capacity + count - len(self._free), 16))
+        slots = np.array(self._free[:-count - 1:-1], dtype=np.int64)
+        del self._free[-count:]
+
+        self.lane[slots] = lane
+        self.radius[slots] = self.lane_radii[lane]
+        self.angle[slots] = angle
+        self.speed[slots] = base_speed * rng.uniform(0.8, 1.2, count)
+        self.velocity[slots] = self.speed[slots]
+        self.color[slots] = rng.uniform(0.3, 1.0, (count, 3))
+        self.alive[slots] = True
+        self.invalidate()
+        return slots
+
+    @classmethod
+    def lane_capacity(cls, lane_radii, length=12.0):
+        """Most cars each lane of `lane_radii` holds without overlapping."""
+        circumference = 2.0 * np.pi * np.asarray(lane_radii, dtype=np.float64)
+        return np.floor(circumference / (length + cls.MIN_GAP) + 1e-9).astype(np.int64)
+
+    def _place(self, wanted, rng):
+        """
+        Lanes and angles for new cars that want the lanes in `wanted`. Cars
+        beyond a lane's free room move to lanes with room left, the rest are
+        dropped.
+        """
+        num_lanes = len(self.lane_radii)
+        # Smallest centre-to-centre distance of two cars, in degrees per lane
+        spacing = np.degrees((self.length + self.MIN_GAP) / self.lane_radii)
+        live = self.slots()
+        lane_live = self._lane_live
+        angle_live = self.angle[live]
+
+        gaps = []
+        room = self.lane_capacity(self.lane_radii, self.length)
+        for l in range(num_lanes):
+            start = np.sort(angle_live[lane_live == l])
+            if len(start):
+                gap = np.diff(np.append(start, start[0] + 360.0))
+                room[l] = np.maximum(np.floor(gap / spacing[l] + 1e-9).astype(np.int64) - 1, 0).sum()
+            else:
+                # An empty lane is one gap round the circle from a random start
+                start, gap = rng.uniform(0, 360, 1), None
+            gaps.append((start, gap))
+
+        demand = np.bincount(wanted, minlength=num_lanes)
+        take = np.minimum(demand, room)
+        overflow = demand.sum() - take.sum()
+        for l in rng.permutation(num_lanes):
+            extra = min(overflow, room[l] - take[l])
+            take[l] += extra
+            overflow -= extra
+
+        lanes, angles = [], []
+        for l in np.flatnonzero(take):
+            start, gap = gaps[l]
+            k = int(take[l])
+            if gap is None:
+                angle = start[0] + 360.0 * np.arange(k) / k
+            else:
+                # Give each car to the gap whose spacing would stay largest
+                # and spread the new cars evenly inside every gap
+                added = np.zeros(len(gap), dtype=np.int64)
+                heap = [(-g / 2.0, j) for j, g in enumerate(gap)]
+                heapq.heapify(heap)
+                for _ in range(k):
+                    _, j = heapq.heappop(heap)
+                    added[j] += 1
+                    heapq.heappush(heap, (-gap[j] / (added[j] + 2), j))
+                owner = np.repeat(np.arange(len(gap)), added)
+                rank = np.arange(k) - np.repeat(np.cumsum(added) - added, added) + 1
+                angle = start[owner] + gap[owner] * rank / (added[owner] + 1)
+            lanes.append(np.full(k, l, dtype=np.int64))
+            angles.append(angle % 360.0)
+        if not lanes:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(lanes), np.concatenate(angles)
+
+    def despawn(self, count=1, rng=np.random, slots=None):
+        """Remove the cars in `slots`, or `count` random cars; returns the freed slots."""
+        if slots is None:
+            live = self.slots()
+            slots = rng.choice(live, min(count, len(live)), replace=False)
+        slots = np.asarray(slots, dtype=np.int64)
+        slots = slots[self.alive[slots]]
+        self.alive[slots] = False
+        self._free.extend(slots.tolist())
+        self.invalidate()
+        return slots
+
+    def scale_speed(self, factor):
+        """Scale every car's desired speed, keeping their individual variation."""
+        self.speed *= factor
+
+    # ---------------- per-lane leader index ------------------
+    def _build_leaders(self):
+        """
+        Sort live cars by (lane, angle); each car's leader is the next one
+        round its lane. Returned as positions in slots(), not slots.
+        """
+        live = self.slots()
+        order = np.lexsort((self.angle[live], self._lane_live))
+        lanes = self._lane_live[order]
+        starts = np.r_[0, np.flatnonzero(lanes[1:] != lanes[:-1]) + 1]
+        ends = np.r_[starts[1:], len(order)] - 1
+        ahead = np.roll(order, -1)
+        ahead[ends] = order[starts]
+        leader = np.empty(len(live), dtype=np.int64)
+        leader[order] = ahead
+        self._alone = leader == np.arange(len(live))
+        return leader
+
+    def _leaders_valid(self, gap):
+        """
+        A lane's leader cycle is in circular order iff its forward gaps (degrees,
+        one per live car) sum to 360. Two bincounts, no sort.
+        """
+        total = np.bincount(self._lane_live, gap, minlength=len(self._lane_cars))
+        return bool(np.all(np.abs(total - np.where(self._lane_cars > 1, 360.0, 0.0)) < 1e-6))
+
+    def _leader_gaps(self, angle):
+        """Leader positions in slots() and forward gaps in degrees for the live angles `angle`."""
+        self.slots()
+        if self._leader is not None:
+            gap = (angle[self._leader] - angle) % 360
+            if self._leaders_valid(gap):
+                return self._leader, gap
+        self._leader = self._build_leaders()
+        return self._leader, (angle[self._leader] - angle) % 360
+
+    def leaders(self):
+        """Slot of the car ahead of each slot in its lane (itself if alone or dead)."""
+        live = self.slots()
+        lead, _ = self._leader_gaps(self.angle[live])
+        leader = np.arange(self.capacity)
+        leader[live] = live[lead]
+        return leader
+
+    def invalidate(self):
+        """Call after changing lanes or fleet membership outside of spawn/despawn/update."""
+        self._slots = None
+        self._leader = None
+
+    # ---------------- simulation ------------------
+    def update(self, red_light=False, dt=1.0):
+        """Advance every car one IDM step; on red, cars inside the stop zone wait."""
+        live = self.slots()
+        if not len(live):
+            return
+        angle = self.angle[live]
+        lead, gap_deg = self._leader_gaps(angle)
+        px_per_deg = self._px_per_deg
+        velocity = self.velocity[live]
+        v = velocity * px_per_deg
+        v0 = np.maximum(self.speed[live] * px_per_deg, 1e-9)
+
+        gap = gap_deg * px_per_deg - self.length
+        gap[self._alone] = np.inf   # alone in the lane
+        dv = v - velocity[lead] * px_per_deg
+
+        s_star = self.MIN_GAP + np.maximum(v * self.HEADWAY + v * dv / (2.0 * np.sqrt(self.MAX_ACCEL * self.COMFORT_DECEL)), 0.0)
+        ratio = v / v0
+        free = ratio * ratio * ratio * ratio if self.DELTA == 4 else ratio ** self.DELTA
+        accel = self.MAX_ACCEL * (1.0 - free - np.square(s_star / np.maximum(gap, 1e-3)))
+        v_new = np.maximum(v + accel * dt, 0.0)
+        # Never close more than the current gap: the leader can only move forward
+        step = np.minimum(v_new * dt, np.maximum(gap, 0.0))
+
+        if red_light:
+            waiting = (angle >= STOP_ZONE[0]) & (angle <= STOP_ZONE[1])
+            v_new[waiting] = 0.0
+            step[waiting] = 0.0
+
+        angle += step / px_per_deg
+        self.angle[live] = np.where(angle >= 360.0, angle - 360.0, angle)
+        self.velocity[live] = v_new / px_per_deg
+
+    def positions(self, xc, yc):
+        """World-space (x, y) arrays of every live car around the centre (xc, yc)."""
+        live = self.slots()
+        rad = np.radians(self.angle[live])
+        return xc + self.radius[live] * np.cos(rad), yc + self.radius[live] * np.sin(rad)
+
+
+def car_quads(fleet, xc, yc, length, width, light_length=2.0, light_color=(1.0, 1.0, 0.0)):
+    """
+    Body and headlight quads of every car in world space, computed at once.
+
+    Returns (quads, colors): quads is a (2N, 4, 2) array ordered body_0,
+    light_0, body_1, light_1, ... (the old per-car draw order) and colors holds
+    one RGB colour per quad, so the whole fleet can be drawn with one call.
+    """
+    live = fleet.slots()
+    x, y = fleet.positions(xc, yc)
+    # The car's direction is tangent to the circle, 90 degrees clockwise from
+    # its angle relative to the center
+    rad = np.radians(fleet.angle[live] - 90)
+    c, s = np.cos(rad)[:, None, None], np.sin(rad)[:, None, None]
+
+    hl, hw = length / 2.0, width / 2.0
+    local = np.array([[(-hl, -hw), (hl, -hw), (hl, hw), (-hl, hw)],
+                      [(hl - light_length, -hw), (hl, -hw), (hl, hw), (hl - light_length, hw)]])
+    u, v = local[..., 0], local[..., 1]
+
+    quads = np.empty((len(fleet), 2, 4, 2), dtype=np.float32)
+    quads[..., 0] = x[:, None, None] + u * c - v * s
+    quads[..., 1] = y[:, None, None] + u * s + v * c
+
+    colors = np.empty((len(fleet), 2, 3), dtype=np.float32)
+    colors[:, 0] = fleet.color[live]
+    colors[:, 1] = light_color
+    return quads.reshape(-1, 4, 2), colors.reshape(-1, 3)
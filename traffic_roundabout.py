@@ -4,14 +4,15 @@ Uses the Mid-Point Circle Algorithm (MPCA) to render the roundabout, lanes, and
 
 Features:
 - Animated cars moving along roundabout lanes (now drawing as car shapes)
-- Collision avoidance using local path planning
+- Collision avoidance: IDM car-following within discrete lanes
 - Adjustable traffic density and car speed
 - Traffic light simulation at entry points with changing colors
 - Keyboard controls: '+' / '-' change traffic density, 'S' / 's' speed, 'I' toggle instructions
-- Self-contained Python + PyOpenGL code, no external packages needed
+- Python + PyOpenGL + NumPy (circles rasterized by the shared mpca.py module)
 
 Run:
     python3 traffic_roundabout.py
+    python3 traffic_roundabout.py --headless 100 [--dump frames/] [--seed 1]
 
 """
 
@@ -19,7 +20,9 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
-import random
+import sys
+import render_backend
+import traffic_fleet
 
 # ------------------------ Configuration ------------------------
 WIDTH, HEIGHT = 800, 800
@@ -35,151 +38,59 @@ TRAFFIC_LIGHT_INTERVAL = 200  # frames per light change
 NUM_LANES = 5 
 
 # state
-cars = []
+fleet = traffic_fleet.CarFleet([], [], [], [])
 frame_counter = 0
+backend = None  # render_backend.GLBackend, or SoftwareBackend when run headless
 traffic_light_state = 0  # 0=green, 1=yellow, 2=red
 
-# ---------------- Mid-Point Circle Algorithm ------------------
-def midpoint_circle_points(xc, yc, radius):
-    x = radius
-    y = 0
-    p = 1 - radius
-    pts = []
-    while x >= y:
-        pts.extend([
-            (xc + x, yc + y), (xc - x, yc + y),
-            (xc + x, yc - y), (xc - x, yc - y),
-            (xc + y, yc + x), (xc - y, yc + x),
-            (xc + y, yc - x), (xc - y, yc - x),
-        ])
-        y += 1
-        if p <= 0:
-            p = p + 2 * y + 1
-        else:
-            x -= 1
-            p = p + 2 * y - 2 * x + 1
-    unique = []
-    s = set()
-    for px, py in pts:
-        ix, iy = int(round(px)), int(round(py))
-        if (ix, iy) not in s and 0 <= ix < WIDTH and 0 <= iy < HEIGHT:
-            unique.append((ix, iy))
-            s.add((ix, iy))
-    return unique
-
-# ---------------- Car Class ------------------
-class Car:
-    def __init__(self, lane_radius, angle, speed):
-        self.radius = lane_radius
-        self.angle = angle  # degrees
-        self.speed = speed  # degrees per frame
-        self.color = (random.uniform(0.3, 1.0), random.uniform(0.3, 1.0), random.uniform(0.3, 1.0)) # Random car color
-
-    def update(self):
-        global traffic_light_state
-        # Simple logic: cars slow down if red light is active at entry angle ~0 deg
-        if traffic_light_state == 2 and (0 <= self.angle % 360 <= 30):
-            pass  # stop car temporarily
-        else:
-            self.angle = (self.angle + self.speed) % 360
-
-    def position(self):
-        rad = math.radians(self.angle)
-        x = WIDTH/2 + self.radius * math.cos(rad)
-        y = HEIGHT/2 + self.radius * math.sin(rad)
-        return x, y
-
 # ---------------- Generate Cars ------------------
 def generate_cars(num=NUM_CARS):
-    global cars
-    cars = []
-    # Use the new NUM_LANES constant
-    max_lane_radius = MAX_RADIUS - CAR_WIDTH/2
-    min_lane_radius = MIN_RADIUS + CAR_WIDTH/2
-    
-    for _ in range(num):
-        # Ensure cars spawn within the defined lane structure
-        lane_radius = random.uniform(min_lane_radius, max_lane_radius)
-        angle = random.uniform(0, 360)
-        speed = CAR_SPEED * random.uniform(0.8, 1.2)
-        cars.append(Car(lane_radius, angle, speed))
+    global fleet
+    # Every car drives on the centre line of one of the NUM_LANES lanes
+    radii = traffic_fleet.lane_radii(MIN_RADIUS, MAX_RADIUS, NUM_LANES)
+    fleet = traffic_fleet.CarFleet.on_lanes(num, radii, CAR_SPEED, CAR_LENGTH)
+
+def set_car_count(num):
+    """
+    Spawn or despawn cars towards `num`, keeping the others' state. Returns
+    the new fleet size, which stays short of `num` once the lanes are full.
+    """
+    extra = num - len(fleet)
+    if extra > 0:
+        fleet.spawn(extra, CAR_SPEED)
+    elif extra < 0:
+        fleet.despawn(-extra)
+    return len(fleet)
 
 # ---------------- Draw Roundabout ------------------
 def draw_roundabout():
-    # Use the new global NUM_LANES constant
     lane_width = (MAX_RADIUS - MIN_RADIUS)/NUM_LANES
-    for i in range(NUM_LANES):
-        radius = MIN_RADIUS + (i + 0.5) * lane_width
-        color = (0.2, 0.2, 0.2, 0.8)
-        if USE_MPCA:
-            draw_circle_mpca(WIDTH/2, HEIGHT/2, radius, color)
-        else:
+    radii = [MIN_RADIUS + (i + 0.5) * lane_width for i in range(NUM_LANES)]
+    color = (0.2, 0.2, 0.2, 0.8)
+    if USE_MPCA:
+        # Lane surfaces are filled MPCA annuli of the full lane width, shaded
+        # alternately so adjacent lanes stay distinguishable
+        bands = [(WIDTH/2, HEIGHT/2, round(MIN_RADIUS + i * lane_width) + (1 if i else 0),
+                  round(MIN_RADIUS + (i + 1) * lane_width)) for i in range(NUM_LANES)]
+        shades = [(0.14, 0.14, 0.14, 0.8) if i % 2 else (0.17, 0.17, 0.17, 0.8) for i in range(NUM_LANES)]
+        backend.annuli('lane_surfaces', bands, shades, WIDTH, HEIGHT)
+
+        # Lane markings only change with NUM_LANES/radii, so they stay retained
+        backend.circles('lane_rings', [(WIDTH/2, HEIGHT/2, r) for r in radii], color, WIDTH, HEIGHT, point_size=1)
+    else:
+        for radius in radii:
             draw_circle_poly(WIDTH/2, HEIGHT/2, radius, color)
 
 # ---------------- Circle Drawing Helpers ------------------
-def draw_circle_mpca(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5)):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glPointSize(1)
-    glBegin(GL_POINTS)
-    for (x, y) in midpoint_circle_points(int(round(xc)), int(round(yc)), int(round(radius))):
-        glVertex2i(x, y)
-    glEnd()
-
 def draw_circle_poly(xc, yc, radius, color=(0.0, 1.0, 0.0, 0.5), segments=128):
-    r, g, b, a = color
-    glColor4f(r, g, b, a)
-    glBegin(GL_LINE_LOOP)
-    for i in range(segments):
-        theta = 2.0 * math.pi * float(i) / float(segments)
-        x = xc + math.cos(theta) * radius
-        y = yc + math.sin(theta) * radius
-        glVertex2f(x, y)
-    glEnd()
+    backend.line_loop(render_backend.circle_polygon(xc, yc, radius, segments), color)
 
 # ---------------- Draw Cars ------------------
 def draw_cars():
-    glLineWidth(1.0) # For drawing car outlines
-    
-    for car in cars:
-        x, y = car.position()
-        
-        # The car's direction is tangent to the circle, which is 90 degrees clockwise
-        # (or -90 degrees counter-clockwise) from its angle relative to the center.
-        # OpenGL rotation is in degrees.
-        car_rotation_angle = car.angle - 90 
-        
-        # 1. Translate to car position
-        glPushMatrix()
-        glTranslatef(x, y, 0)
-        
-        # 2. Rotate the coordinate system to align with the car's direction
-        glRotatef(car_rotation_angle, 0, 0, 1)
-        
-        # 3. Draw the rectangular car body at (0, 0) in the rotated system
-        
-        # Body Color
-        glColor3f(*car.color)
-        glBegin(GL_QUADS)
-        # Vertices relative to (0,0) center, forming a rectangle
-        glVertex2f(-CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f( CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f( CAR_LENGTH/2,  CAR_WIDTH/2)
-        glVertex2f(-CAR_LENGTH/2,  CAR_WIDTH/2)
-        glEnd()
-        
-        # Draw a small "headlight" for direction
-        glColor3f(1.0, 1.0, 0.0) # Yellow light
-        glBegin(GL_QUADS)
-        # Front of the car
-        glVertex2f(CAR_LENGTH/2 - 2, -CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2, -CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2,  CAR_WIDTH/2)
-        glVertex2f(CAR_LENGTH/2 - 2, CAR_WIDTH/2)
-        glEnd()
-        
-        # 4. Restore the original coordinate system
-        glPopMatrix()
+    # Every body and headlight corner is computed at once from the fleet arrays
+    # and the whole fleet goes out as one interleaved quad array / draw call
+    quads, colors = traffic_fleet.car_quads(fleet, WIDTH/2, HEIGHT/2, CAR_LENGTH, CAR_WIDTH)
+    backend.quads(quads, colors)
 
 # ---------------- Traffic Lights ------------------
 def draw_traffic_lights():
@@ -188,44 +99,39 @@ def draw_traffic_lights():
     entry_radius = MIN_RADIUS - 30
     light_radius = 10
     colors = [(0.0, 1.0, 0.0), (1.0, 1.0, 0.0), (1.0, 0.0, 0.0)]  # green, yellow, red
-    glColor3f(*colors[traffic_light_state])
-    glBegin(GL_POLYGON)
-    segments = 32
-    for i in range(segments):
-        theta = 2.0 * math.pi * i / segments
-        x = xc + entry_radius * math.cos(math.radians(0)) + light_radius * math.cos(theta)
-        y = yc + entry_radius * math.sin(math.radians(0)) + light_radius * math.sin(theta)
-        glVertex2f(x, y)
-    glEnd()
+    x = xc + entry_radius * math.cos(math.radians(0))
+    y = yc + entry_radius * math.sin(math.radians(0))
+    backend.polygon(render_backend.circle_polygon(x, y, light_radius, 32), colors[traffic_light_state])
 
 # ---------------- Draw Instructions ------------------
-def draw_text(x, y, text, font=GLUT_BITMAP_HELVETICA_12):
-    glRasterPos2i(x, y)
-    for ch in text:
-        glutBitmapCharacter(font, ord(ch))
+def draw_text(x, y, text, color=(1.0, 1.0, 1.0), font=GLUT_BITMAP_HELVETICA_12):
+    backend.text(x, y, text, color, font)
 
-# ---------------- Display ------------------
-def display():
+# ---------------- Simulation Step ------------------
+def step(dt=1.0):
+    """Advance the traffic light and every car by `dt` frames."""
     global frame_counter, traffic_light_state
-    frame_counter += 1
+    previous = frame_counter
+    frame_counter += dt
 
     # update traffic light every interval
-    if frame_counter % TRAFFIC_LIGHT_INTERVAL == 0:
+    if frame_counter // TRAFFIC_LIGHT_INTERVAL != previous // TRAFFIC_LIGHT_INTERVAL:
         traffic_light_state = (traffic_light_state + 1) % 3
 
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    glLoadIdentity()
+    fleet.update(red_light=traffic_light_state == 2, dt=dt)
 
-    draw_roundabout()
+# ---------------- Display ------------------
+def display():
+    step()
+
+    backend.clear((0.1, 0.1, 0.1, 1.0))
 
-    for car in cars:
-        car.update()
+    draw_roundabout()
     draw_cars()
 
     draw_traffic_lights()
 
     if SHOW_INSTRUCTIONS:
-        glColor3f(1.0, 1.0, 1.0)
         lines = [
             f"Traffic Density: {NUM_CARS} cars (use '+' / '-' to change)",
             f"Car Speed: {CAR_SPEED:.1f} degrees/frame (use S/s to change)",
@@ -236,7 +142,7 @@ def display():
             draw_text(10, y, ln)
             y += 16
 
-    glutSwapBuffers()
+    backend.present()
 
 def reshape(w, h):
     glViewport(0, 0, w, h)
@@ -249,13 +155,14 @@ def reshape(w, h):
 def keyboard(key, x, y):
     global NUM_CARS, CAR_SPEED, SHOW_INSTRUCTIONS
     k = key.decode('utf-8') if isinstance(key, bytes) else key
-    if k == '+': NUM_CARS += 1; generate_cars(NUM_CARS)
-    elif k == '-': NUM_CARS = max(1, NUM_CARS - 1); generate_cars(NUM_CARS)
+    if k == '+': NUM_CARS = set_car_count(NUM_CARS + 1)
+    elif k == '-': NUM_CARS = set_car_count(max(1, NUM_CARS - 1))
     elif k in ('s', 'S'):
+        old_speed = CAR_SPEED
         if k == 's': CAR_SPEED = max(0.1, CAR_SPEED - 0.2)
         else: CAR_SPEED += 0.2
-        # Update speed for all existing cars
-        for car in cars: car.speed = CAR_SPEED * random.uniform(0.8, 1.2)
+        # Rescale existing cars' speeds, keeping each car's own variation
+        fleet.scale_speed(CAR_SPEED / old_speed)
     elif k in ('i', 'I'): SHOW_INSTRUCTIONS = not SHOW_INSTRUCTIONS
     elif k in ('q', 'Q', '\x1b'): glutLeaveMainLoop()
     glutPostRedisplay()
@@ -265,8 +172,17 @@ def timer(value):
     glutPostRedisplay()
     glutTimerFunc(33, timer, 0)
 
+# ---------------- Headless ------------------
+def run_headless(frames, dump_dir=None):
+    """Run the simulation offscreen into a software framebuffer."""
+    global backend
+    backend = render_backend.SoftwareBackend(WIDTH, HEIGHT)
+    generate_cars(NUM_CARS)
+    render_backend.run_frames(backend, display, frames, dump_dir)
+
 # ---------------- Main (MODIFIED for Centering) ------------------
 def main():
+    global backend
     glutInit()
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGBA | GLUT_ALPHA)
     
@@ -287,6 +203,7 @@ def main():
     # --- End new code ---
     
     glutCreateWindow(b"Advanced Traffic Roundabout Simulation with Traffic Lights")
+    backend = render_backend.GLBackend()
 
     glClearColor(0.1, 0.1, 0.1, 1.0)
     glEnable(GL_BLEND)
@@ -302,4 +219,8 @@ def main():
     glutMainLoop()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    args = render_backend.parse_headless_args(sys.argv)
+    if args:
+        run_headless(args.headless, args.dump)
+    else:
+        main()
\ No newline at end of file